@@ -1,10 +1,19 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from apps.db.sharding import assign_shard
 from .managers import CustomUserManager
 
 class CustomUser(AbstractUser):
     username = None
     email = models.EmailField('email address', unique=True)
+    # Database alias holding this user's wallet, ledger and bets (blank: default)
+    shard = models.CharField(max_length=64, blank=True, default='', editable=False)
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
-    objects = CustomUserManager()
\ No newline at end of file
+    objects = CustomUserManager()
+
+    def save(self, *args, **kwargs):
+        """Place new users on the least loaded shard"""
+        if self._state.adding and not self.shard:
+            self.shard = assign_shard()
+        super().save(*args, **kwargs)
@@ -1,13 +1,22 @@
-import random
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from apps.wallet.models import Wallet
+from django.db import transaction
+from apps.db.sharding import on_shard, shard_for_user
+from apps.wallet.models import Wallet, Transaction
+from apps.metrics import coin_flips
+from apps.rng import outcome_pool
+from apps.fairness.services import ProvablyFairService
+
+# Even money: a win credits the stake, a loss deducts it
+COIN_FLIP_SIDES = ['Heads', 'Tails']
+
 
 @login_required
 def home_view(request):
     # Get the user's wallet
-    user_wallet, created = Wallet.objects.get_or_create(user=request.user)
+    user_wallet, created = Wallet.objects.for_user(request.user).get_or_create(user=request.user)
     result_msg = None
+    proof = None
     
     if request.method == 'POST':
         try:
@@ -15,17 +24,32 @@ def home_view(request):
             side = request.POST.get('side')
             
             if 0 < amount <= user_wallet.balance:
-                outcome = random.choice(['Heads', 'Tails'])
-                if side == outcome:
-                    user_wallet.balance += amount
-                    result_msg = f"WIN! The coin landed on {outcome}. You won IDR {amount}!"
-                else:
-                    user_wallet.balance -= amount
-                    result_msg = f"LOSS! The coin landed on {outcome}. You lost IDR {amount}."
-                user_wallet.save()
+                try:
+                    # The round (on default) and its wallet entry (on the user's shard)
+                    # commit together, so a failed flip releases the round
+                    using = shard_for_user(request.user)
+                    with on_shard(using), transaction.atomic(using=using), transaction.atomic():
+                        if ProvablyFairService.enabled():
+                            side_index, proof = ProvablyFairService.draw('coin', request.POST.get('client_seed', '')[:64])
+                        else:
+                            side_index = outcome_pool(len(COIN_FLIP_SIDES)).draw()
+                        outcome = COIN_FLIP_SIDES[side_index]
+                        if side == outcome:
+                            user_wallet.credit(amount, f"Coin flip win - {outcome}", Transaction.GAME_PAYOUT)
+                            result_msg = f"WIN! The coin landed on {outcome}. You won IDR {amount}!"
+                            coin_flips.inc(outcome='win')
+                        else:
+                            user_wallet.deduct(amount, f"Coin flip loss - {outcome}", Transaction.GAME_STAKE)
+                            result_msg = f"LOSS! The coin landed on {outcome}. You lost IDR {amount}."
+                            coin_flips.inc(outcome='loss')
+                except ValueError:
+                    proof = None
+                    result_msg = "Invalid amount or insufficient funds."
+                    coin_flips.inc(outcome='rejected')
             else:
                 result_msg = "Invalid amount or insufficient funds."
+                coin_flips.inc(outcome='rejected')
         except (ValueError, TypeError):
             result_msg = "Please enter a valid number."
             
-    return render(request, 'home.html', {'result_msg': result_msg, 'balance': user_wallet.balance})
\ No newline at end of file
+    return render(request, 'home.html', {'result_msg': result_msg, 'balance': user_wallet.balance, 'proof': proof})
\ No newline at end of file
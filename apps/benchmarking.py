@@ -0,0 +1,29 @@
+import math
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize_latencies(latencies, elapsed, errors=0):
+    """
+    Throughput and latency percentiles for one benchmark run
+    latencies: per-request/operation seconds; elapsed: wall-clock seconds for the run
+    Returns: dict with counts, requests_per_second and millisecond p50/p95/p99/max
+    """
+    ordered = sorted(latencies)
+    return {
+        'count': len(ordered),
+        'errors': errors,
+        'elapsed_seconds': round(elapsed, 4),
+        'requests_per_second': round(len(ordered) / elapsed, 2) if elapsed > 0 else 0.0,
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
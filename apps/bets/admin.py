@@ -1,10 +1,11 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Bet
+from apps.db.routers import ReplicaChangeListMixin
+from .models import Bet, UserBetStats
 
 
 @admin.register(Bet)  
-class BetAdmin(admin.ModelAdmin):
+class BetAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     """
     Admin interface for managing bets
     """
@@ -133,3 +134,11 @@ class BetAdmin(admin.ModelAdmin):
     mark_as_cancelled.short_description = "Cancel selected bets"
 
 
+@admin.register(UserBetStats)
+class UserBetStatsAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    """
+    Read-only view of the denormalized per-user stats
+    """
+    list_display = ['user', 'total_bets', 'pending_bets', 'won_bets', 'lost_bets', 'total_staked', 'total_won', 'updated_at']
+    search_fields = ['user__email']
+    readonly_fields = [field.name for field in UserBetStats._meta.fields]
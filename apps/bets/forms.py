@@ -125,3 +125,23 @@ class BetFilterForm(forms.Form):
         }),
         label='To Date'
     )
+    
+    def filter_queryset(self, bets):
+        """Narrow a Bet queryset by the submitted filters (unfiltered if invalid)"""
+        if not self.is_valid():
+            return bets
+        
+        status = self.cleaned_data.get('status')
+        bet_type = self.cleaned_data.get('bet_type')
+        date_from = self.cleaned_data.get('date_from')
+        date_to = self.cleaned_data.get('date_to')
+        
+        if status:
+            bets = bets.filter(status=status)
+        if bet_type:
+            bets = bets.filter(bet_type=bet_type)
+        if date_from:
+            bets = bets.filter(placed_at__gte=date_from)
+        if date_to:
+            bets = bets.filter(placed_at__lte=date_to)
+        return bets
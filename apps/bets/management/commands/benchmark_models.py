@@ -0,0 +1,258 @@
+import json
+import platform
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from apps.benchmarking import summarize_latencies
+from apps.events.models import Event
+from apps.game.services import DiceGameService
+from apps.wallet.models import Wallet, Transaction, WalletManager
+from apps.bets.models import Bet, UserBetStats
+
+
+OPERATIONS = [
+    'bet_save',
+    'bet_get_user_stats',
+    'wallet_deduct',
+    'wallet_credit',
+    'wallet_get_summary',
+    'dice_place_bet',
+    'dice_get_leaderboard',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed bets/transactions at several table sizes and time the hot model "
+        "operations at each size. Writes JSON results; with --baseline, fails "
+        "when an operation's median got slower than --max-regression percent. "
+        "Seeded rows stay in the database for reuse; run against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000', help="Comma-separated row counts to seed")
+        parser.add_argument('--iterations', type=int, default=50, help="Timed calls per operation")
+        parser.add_argument('--warmup', type=int, default=5, help="Untimed calls per operation")
+        parser.add_argument('--hot-share', type=float, default=0.1, help="Share of rows owned by the benchmarked user")
+        parser.add_argument('--only', help=f"Comma-separated subset of: {', '.join(OPERATIONS)}")
+        parser.add_argument('--output', help="Write JSON results to this file")
+        parser.add_argument('--baseline', help="Earlier --output file to compare medians against")
+        parser.add_argument('--max-regression', type=float, default=20.0, help="Allowed median slowdown in percent")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError("--sizes must be comma-separated integers")
+        if any(size < 100 for size in sizes):
+            raise CommandError("Sizes must be at least 100 rows")
+        if not 0 < options['hot_share'] <= 1:
+            raise CommandError("--hot-share must be in (0, 1]")
+
+        operations = OPERATIONS
+        if options['only']:
+            operations = [name.strip() for name in options['only'].split(',')]
+            unknown = set(operations) - set(OPERATIONS)
+            if unknown:
+                raise CommandError(f"Unknown operations: {', '.join(sorted(unknown))}")
+
+        random.seed(options['seed'])
+
+        results = {}
+        for size in sizes:
+            user = self._seed(size, options['hot_share'])
+            results[str(size)] = {}
+            for name in operations:
+                operation = self._operation(name, user)
+                results[str(size)][name] = self._time(operation, options['iterations'], options['warmup'])
+                self._report_line(size, name, results[str(size)][name])
+
+        output = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'iterations': options['iterations'],
+                'hot_share': options['hot_share'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(output, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(json.dumps(output, indent=2))
+
+        if options['baseline']:
+            self._check_regressions(results, options['baseline'], options['max_regression'])
+
+    # Seeding
+
+    def _seed(self, size, hot_share):
+        """
+        Seed `size` bets and `size` transactions spread over size // 1000 users
+        (at least 10), the first of which owns `hot_share` of the rows
+        Returns: the benchmarked user; reuses an earlier seed of the same size
+        """
+        User = get_user_model()
+        prefix = f'bench{size}-'
+        user_count = max(10, size // 1000)
+
+        hot_user = User.objects.filter(email=f'{prefix}0@example.com').first()
+        if hot_user is not None and Bet.objects.filter(user=hot_user).exists():
+            self.stdout.write(f"Reusing seeded data for {size} rows")
+            return hot_user
+
+        self.stdout.write(f"Seeding {size} bets and {size} transactions over {user_count} users...")
+        started = time.perf_counter()
+
+        User.objects.bulk_create(
+            [User(email=f'{prefix}{i}@example.com', password='!') for i in range(user_count)],
+            ignore_conflicts=True
+        )
+        users = list(User.objects.filter(email__startswith=prefix).order_by('pk').values_list('pk', flat=True))
+        Wallet.objects.bulk_create(
+            [Wallet(user_id=user_id, balance=Decimal('1000000.00')) for user_id in users],
+            ignore_conflicts=True
+        )
+        wallets = dict(Wallet.objects.filter(user_id__in=users).values_list('user_id', 'pk'))
+
+        start_time = timezone.now() + timedelta(days=7)
+        events = [
+            Event.objects.create(name=f"Benchmark event {size}-{i}", start_time=start_time).pk
+            for i in range(20)
+        ]
+
+        hot_rows = int(size * hot_share)
+        owners = [users[0]] * hot_rows + [random.choice(users[1:]) for _ in range(size - hot_rows)]
+
+        statuses = [Bet.PENDING, Bet.WON, Bet.LOST]
+        bet_types = [Bet.TEAM_A_WIN, Bet.TEAM_B_WIN, Bet.DRAW]
+        categories = [
+            (Transaction.DEBIT, Transaction.BET_STAKE),
+            (Transaction.CREDIT, Transaction.BET_PAYOUT),
+            (Transaction.CREDIT, Transaction.DEPOSIT),
+            (Transaction.DEBIT, Transaction.GAME_STAKE),
+        ]
+        batch_size = 5000
+        for offset in range(0, size, batch_size):
+            batch = owners[offset:offset + batch_size]
+            bets = []
+            ledger = []
+            for user_id in batch:
+                stake = Decimal(random.randint(1, 100))
+                status = random.choice(statuses)
+                bets.append(Bet(
+                    user_id=user_id,
+                    event_id=random.choice(events),
+                    bet_type=random.choice(bet_types),
+                    stake=stake,
+                    odds=Decimal('2.00'),
+                    potential_payout=stake * 2,
+                    actual_payout=stake * 2 if status == Bet.WON else Decimal('0.00'),
+                    status=status,
+                ))
+                transaction_type, category = random.choice(categories)
+                ledger.append(Transaction(
+                    wallet_id=wallets[user_id],
+                    transaction_type=transaction_type,
+                    category=category,
+                    amount=stake,
+                    balance_after=Decimal('1000000.00'),
+                    description="Benchmark seed",
+                ))
+            Bet.objects.bulk_create(bets)
+            Transaction.objects.bulk_create(ledger)
+
+        UserBetStats.objects.filter(user_id__in=users).delete()
+        UserBetStats.objects.bulk_create(
+            [UserBetStats(user_id=user_id, **values) for user_id, values in UserBetStats.compute(users).items()]
+        )
+
+        self.stdout.write(f"Seeded {size} rows in {time.perf_counter() - started:.1f}s")
+        return User.objects.get(pk=users[0])
+
+    # Operations
+
+    def _operation(self, name, user):
+        event = Event.objects.filter(name__startswith='Benchmark event').order_by('-pk').first()
+        wallet = Wallet.objects.get(user=user)
+
+        def bet_save():
+            Bet(
+                user=user,
+                event=event,
+                bet_type=Bet.TEAM_A_WIN,
+                stake=Decimal('1.00'),
+                odds=Decimal('2.00'),
+                potential_payout=Decimal('2.00'),
+            ).save()
+
+        operations = {
+            'bet_save': bet_save,
+            'bet_get_user_stats': lambda: Bet.get_user_stats(user),
+            'wallet_deduct': lambda: wallet.deduct(Decimal('1.00'), "Benchmark debit"),
+            'wallet_credit': lambda: wallet.credit(Decimal('1.00'), "Benchmark credit", Transaction.DEPOSIT),
+            'wallet_get_summary': lambda: WalletManager.get_wallet_summary(user),
+            'dice_place_bet': lambda: DiceGameService.place_bet(user, Decimal('1.00'), 'HIGH'),
+            'dice_get_leaderboard': lambda: list(DiceGameService.get_leaderboard(limit=10)),
+        }
+        return operations[name]
+
+    @staticmethod
+    def _time(operation, iterations, warmup):
+        for _ in range(warmup):
+            operation()
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(iterations):
+            call_started = time.perf_counter()
+            operation()
+            latencies.append(time.perf_counter() - call_started)
+        summary = summarize_latencies(latencies, time.perf_counter() - started)
+        summary['ops_per_second'] = summary.pop('requests_per_second')
+        return summary
+
+    def _report_line(self, size, name, summary):
+        self.stderr.write(
+            f"{size:>8} {name:<22} p50 {summary['p50_ms']:>9.3f} ms  "
+            f"p99 {summary['p99_ms']:>9.3f} ms  {summary['ops_per_second']:>9.1f} ops/s"
+        )
+
+    # Regression mode
+
+    def _check_regressions(self, results, baseline_path, max_regression):
+        try:
+            with open(baseline_path) as f:
+                baseline = json.load(f)['results']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Could not read baseline {baseline_path}: {e}")
+
+        regressions = []
+        for size, operations in results.items():
+            for name, summary in operations.items():
+                before = baseline.get(size, {}).get(name, {})
+                if 'p50_ms' not in summary or not before.get('p50_ms'):
+                    continue
+                change = (summary['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+                line = f"{size:>8} {name:<22} {before['p50_ms']:>9.3f} -> {summary['p50_ms']:>9.3f} ms ({change:+.1f}%)"
+                if change > max_regression:
+                    regressions.append(line)
+                    self.stdout.write(self.style.ERROR(line))
+                else:
+                    self.stdout.write(line)
+
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} operation(s) regressed by more than {max_regression:.0f}%"
+            )
+        self.stdout.write(self.style.SUCCESS(f"No regressions beyond {max_regression:.0f}%"))
@@ -0,0 +1,54 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from apps.exports import EXPORT_FORMATS, BET_EXPORT_FIELDS, export_sharded_lines
+from apps.bets.forms import BetFilterForm
+from apps.bets.models import Bet
+
+
+class Command(BaseCommand):
+    help = "Stream bets to CSV or NDJSON, optionally for one user and filtered like the history page"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Email of the user to export (default: all users)")
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', help="File to write (default: stdout)")
+        parser.add_argument('--status')
+        parser.add_argument('--bet-type')
+        parser.add_argument('--date-from', help="YYYY-MM-DD")
+        parser.add_argument('--date-to', help="YYYY-MM-DD")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        filter_form = BetFilterForm({
+            'status': options['status'] or '',
+            'bet_type': options['bet_type'] or '',
+            'date_from': options['date_from'] or '',
+            'date_to': options['date_to'] or '',
+        })
+        if not filter_form.is_valid():
+            raise CommandError(filter_form.errors.as_text())
+
+        bets = filter_form.filter_queryset(Bet.objects.all())
+        if options['user']:
+            bets = bets.filter(user__email=options['user'])
+
+        lines = export_sharded_lines(
+            bets.order_by('-placed_at', '-id').on_each_shard(),
+            BET_EXPORT_FIELDS,
+            options['format'],
+            options['chunk_size']
+        )
+
+        output = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            count = 0
+            for line in lines:
+                output.write(line)
+                count += 1
+        finally:
+            if options['output']:
+                output.close()
+
+        if options['output']:
+            rows = count - 1 if options['format'] == 'csv' else count
+            self.stderr.write(self.style.SUCCESS(f"Exported {rows} bets to {options['output']}"))
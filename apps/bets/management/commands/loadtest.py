@@ -0,0 +1,380 @@
+import http.client
+import http.cookies
+import json
+import random
+import re
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from urllib.parse import urlencode, urlsplit
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpRequest
+from django.middleware.csrf import _get_new_csrf_string
+from django.test import Client
+from django.utils import timezone
+from apps.benchmarking import summarize_latencies
+from apps.events.models import Event
+from apps.wallet.models import Wallet, Transaction
+from apps.bets.models import Bet
+
+
+LOCKED = 'database is locked'
+DETAIL_URL = re.compile(r'/bets/detail/(\d+)/')
+
+# Relative weight of each action in the simulated traffic
+DEFAULT_MIX = {
+    'place_bet': 30,
+    'cancel_bet': 5,
+    'quote': 25,
+    'batch_quotes': 5,
+    'add_funds': 5,
+    'withdraw': 5,
+    'bet_history': 10,
+    'bet_history_api': 10,
+    'transactions': 5,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the bets and wallet URLs of a running server with simulated "
+        "logged-in users and report throughput, latency and lock errors per endpoint. "
+        "Run with the same settings (database) as the server under test."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--users', type=int, default=20, help="Concurrent simulated users (one thread each)")
+        parser.add_argument('--duration', type=float, default=30.0, help="Seconds to run")
+        parser.add_argument('--think-time', type=float, default=0.0, help="Seconds each user pauses between requests")
+        parser.add_argument('--events', type=int, default=3, help="Bettable load-test events to create")
+        parser.add_argument(
+            '--mix',
+            help="Comma-separated action=weight overrides, e.g. place_bet=50,quote=0 "
+                 f"(actions: {', '.join(DEFAULT_MIX)})"
+        )
+        parser.add_argument('--seed', type=int, help="Random seed for a repeatable request mix")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        target = urlsplit(options['base_url'])
+        if target.scheme != 'http' or not target.hostname:
+            raise CommandError("--base-url must be an http:// URL")
+        if options['users'] < 1 or options['duration'] <= 0:
+            raise CommandError("--users and --duration must be positive")
+
+        mix = self._parse_mix(options['mix'])
+        event_ids = self._create_events(options['events'])
+        sessions = self._create_sessions(options['users'])
+
+        recorder = Recorder()
+        deadline = time.monotonic() + options['duration']
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+
+        workers = [
+            SimulatedUser(
+                target, cookie, event_ids, mix, recorder, deadline,
+                options['think_time'], random.Random(seed + i)
+            )
+            for i, cookie in enumerate(sessions)
+        ]
+
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - started
+
+        report = recorder.report(elapsed)
+        report['settings'] = {
+            'base_url': options['base_url'],
+            'users': options['users'],
+            'duration': options['duration'],
+            'seed': seed,
+            'mix': mix,
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print_report(report)
+
+    def _parse_mix(self, value):
+        mix = dict(DEFAULT_MIX)
+        if value:
+            for part in value.split(','):
+                action, _, weight = part.partition('=')
+                action = action.strip()
+                if action not in mix:
+                    raise CommandError(f"Unknown action in --mix: {action}")
+                try:
+                    mix[action] = max(0, int(weight))
+                except ValueError:
+                    raise CommandError(f"Invalid weight for {action}: {weight}")
+        if not any(mix.values()):
+            raise CommandError("--mix leaves no actions to run")
+        return mix
+
+    def _create_events(self, count):
+        start_time = timezone.now() + timedelta(days=1)
+        return [
+            Event.objects.create(
+                name=f"Load test event {i + 1}",
+                start_time=start_time,
+                odds_team_a=Decimal('1.90'),
+                odds_team_b=Decimal('2.10'),
+                odds_draw=Decimal('3.20'),
+            ).pk
+            for i in range(max(1, count))
+        ]
+
+    def _create_sessions(self, count):
+        """Log in `count` load-test users directly and return their Cookie headers"""
+        User = get_user_model()
+        cookies = []
+        for i in range(count):
+            user, created = User.objects.get_or_create(email=f'loadtest{i}@example.com')
+            if created:
+                user.set_unusable_password()
+                user.save()
+            wallet, created = Wallet.objects.get_or_create(user=user)
+            top_up = Decimal('5000.00') - Decimal(str(wallet.balance))
+            if top_up > 0:
+                Wallet.apply_credit(
+                    top_up,
+                    "Load test top-up",
+                    Transaction.DEPOSIT,
+                    user=user
+                )
+
+            client = Client()
+            client.force_login(user)
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+            # An unmasked CSRF secret is accepted as both cookie and header value
+            csrf = _get_new_csrf_string()
+            cookies.append((
+                f"{settings.SESSION_COOKIE_NAME}={session}; {settings.CSRF_COOKIE_NAME}={csrf}",
+                csrf
+            ))
+        return cookies
+
+    def _print_report(self, report):
+        self.stdout.write(
+            f"{'endpoint':<16} {'count':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'errors':>7} {'err %':>6} {'locked':>7}"
+        )
+        rows = list(report['endpoints'].items()) + [('TOTAL', report['total'])]
+        for name, summary in rows:
+            self.stdout.write(
+                f"{name:<16} {summary['count']:>7} {summary['requests_per_second']:>8.1f} "
+                f"{summary['p50_ms']:>8.1f} {summary['p95_ms']:>8.1f} {summary['p99_ms']:>8.1f} "
+                f"{summary['errors']:>7} {summary['error_rate']:>6.1f} {summary['locked']:>7}"
+            )
+        if report['bets_placed']:
+            self.stdout.write(self.style.SUCCESS(
+                f"{report['bets_placed']} bets placed - {report['bets_per_second']:.1f} bets/sec"
+            ))
+
+
+class Recorder:
+    """Thread-safe per-endpoint latency, error and lock counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._errors = {}
+        self._locked = {}
+        self.bets_placed = 0
+
+    def record(self, endpoint, latency, ok, locked=False):
+        with self._lock:
+            self._latencies.setdefault(endpoint, []).append(latency)
+            if not ok:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+            if locked:
+                self._locked[endpoint] = self._locked.get(endpoint, 0) + 1
+            if endpoint == 'place_bet' and ok:
+                self.bets_placed += 1
+
+    def report(self, elapsed):
+        with self._lock:
+            endpoints = {}
+            for endpoint in sorted(self._latencies):
+                endpoints[endpoint] = self._summary(
+                    self._latencies[endpoint], elapsed,
+                    self._errors.get(endpoint, 0), self._locked.get(endpoint, 0)
+                )
+            everything = [latency for latencies in self._latencies.values() for latency in latencies]
+            return {
+                'endpoints': endpoints,
+                'total': self._summary(
+                    everything, elapsed, sum(self._errors.values()), sum(self._locked.values())
+                ),
+                'bets_placed': self.bets_placed,
+                'bets_per_second': round(self.bets_placed / elapsed, 2) if elapsed > 0 else 0.0,
+            }
+
+    @staticmethod
+    def _summary(latencies, elapsed, errors, locked):
+        summary = summarize_latencies(latencies, elapsed, errors)
+        summary['error_rate'] = round(errors / len(latencies) * 100, 2) if latencies else 0.0
+        summary['locked'] = locked
+        return summary
+
+
+class SimulatedUser(threading.Thread):
+    """
+    One logged-in user issuing a weighted random mix of requests over a
+    keep-alive connection until the deadline
+    """
+
+    def __init__(self, target, cookie, event_ids, mix, recorder, deadline, think_time, rng):
+        super().__init__(daemon=True)
+        self.target = target
+        self.cookie, self.csrf_token = cookie
+        self.event_ids = event_ids
+        self.actions = [action for action, weight in mix.items() if weight]
+        self.weights = [mix[action] for action in self.actions]
+        self.recorder = recorder
+        self.deadline = deadline
+        self.think_time = think_time
+        self.rng = rng
+        self.pending_bets = []
+        self.connection = None
+        self.messages = CookieStorage(HttpRequest())
+
+    def run(self):
+        try:
+            while time.monotonic() < self.deadline:
+                action = self.rng.choices(self.actions, self.weights)[0]
+                if action == 'cancel_bet' and not self.pending_bets:
+                    action = 'place_bet'
+                getattr(self, action)()
+                if self.think_time:
+                    time.sleep(self.think_time)
+        finally:
+            if self.connection is not None:
+                self.connection.close()
+
+    # Actions
+
+    def place_bet(self):
+        event_id = self.rng.choice(self.event_ids)
+        response = self.request('POST', f'/bets/place/{event_id}/', {
+            'bet_type': self.rng.choice([Bet.TEAM_A_WIN, Bet.TEAM_B_WIN, Bet.DRAW]),
+            'stake': str(self.rng.randint(1, 20)),
+        })
+        match = DETAIL_URL.search(response['location'] or '')
+        if match:
+            self.pending_bets.append(int(match.group(1)))
+        self.finish('place_bet', response, ok=bool(match))
+
+    def cancel_bet(self):
+        bet_id = self.pending_bets.pop(self.rng.randrange(len(self.pending_bets)))
+        response = self.request('POST', f'/bets/cancel/{bet_id}/')
+        failed = any(message.level_tag == 'error' for message in response['messages'])
+        self.finish('cancel_bet', response, ok=response['status'] == 302 and not failed)
+
+    def quote(self):
+        response = self.request('GET', '/bets/api/calculate-payout/', {
+            'event_id': self.rng.choice(self.event_ids),
+            'bet_type': Bet.TEAM_A_WIN,
+            'stake': str(self.rng.randint(1, 100)),
+        })
+        self.finish_json('quote', response)
+
+    def batch_quotes(self):
+        response = self.request('GET', '/bets/api/quotes/', {
+            'event_ids': ','.join(map(str, self.event_ids)),
+            'bet_types': f'{Bet.TEAM_A_WIN},{Bet.TEAM_B_WIN},{Bet.DRAW}',
+            'stakes': '5,10,25',
+        })
+        self.finish_json('batch_quotes', response)
+
+    def add_funds(self):
+        response = self.request('POST', '/wallet/add-funds/', {'amount': str(self.rng.randint(10, 100))})
+        self.finish_json('add_funds', response)
+
+    def withdraw(self):
+        response = self.request('POST', '/wallet/withdraw/', {'amount': str(self.rng.randint(10, 100))})
+        self.finish_json('withdraw', response)
+
+    def bet_history(self):
+        response = self.request('GET', '/bets/history/')
+        self.finish('bet_history', response, ok=response['status'] == 200)
+
+    def bet_history_api(self):
+        response = self.request('GET', '/bets/api/history/', {'limit': '25'})
+        self.finish_json('bet_history_api', response)
+
+    def transactions(self):
+        response = self.request('GET', '/wallet/transactions/recent/', {'limit': '25'})
+        self.finish_json('transactions', response)
+
+    # Plumbing
+
+    def finish(self, endpoint, response, ok):
+        locked = LOCKED in response['body'] or any(LOCKED in str(m) for m in response['messages'])
+        self.recorder.record(endpoint, response['latency'], ok and response['status'] < 400, locked)
+
+    def finish_json(self, endpoint, response):
+        try:
+            ok = json.loads(response['body']).get('success', False)
+        except ValueError:
+            ok = False
+        self.finish(endpoint, response, ok)
+
+    def request(self, method, path, params=None):
+        """
+        Issue one request without following redirects
+        Returns: dict with status, location, body text, flash messages and latency
+        """
+        headers = {'Cookie': self.cookie}
+        body = None
+        if method == 'GET' and params:
+            path = f"{path}?{urlencode(params)}"
+        elif method == 'POST':
+            body = urlencode(params or {})
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.csrf_token
+
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(
+                    self.target.hostname, self.target.port or 80, timeout=30
+                )
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            text = response.read().decode('utf-8', 'replace')
+            result = {
+                'status': response.status,
+                'location': response.getheader('Location'),
+                'body': text,
+                'messages': self._flash_messages(response),
+            }
+            if response.getheader('Connection', '').lower() == 'close':
+                self._reset()
+        except (OSError, http.client.HTTPException) as e:
+            self._reset()
+            result = {'status': 599, 'location': None, 'body': str(e), 'messages': []}
+        result['latency'] = time.perf_counter() - started
+        return result
+
+    def _flash_messages(self, response):
+        """Decode the messages cookie so errors swallowed into flash messages are counted"""
+        for header in response.msg.get_all('Set-Cookie') or []:
+            cookie = http.cookies.SimpleCookie(header)
+            if CookieStorage.cookie_name in cookie:
+                return self.messages._decode(cookie[CookieStorage.cookie_name].value) or []
+        return []
+
+    def _reset(self):
+        if self.connection is not None:
+            self.connection.close()
+        self.connection = None
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from apps.bets.models import UserBetStats
+from apps.db.sharding import on_shard, shard_aliases
+
+
+class Command(BaseCommand):
+    help = "Rebuild the UserBetStats table from the bets table, or check it for drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Only report rows that differ from the bets table; write nothing"
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            count = UserBetStats.rebuild_all()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt bet stats for {count} users"))
+            return
+
+        empty = UserBetStats.empty_values()
+        mismatches = 0
+        checked = 0
+        for alias in shard_aliases():
+            with on_shard(alias):
+                computed = UserBetStats.compute()
+                stored = {stats.user_id: stats for stats in UserBetStats.objects.all()}
+            mismatches += self._report_drift(computed, stored, empty)
+            checked += len(stored)
+
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f"{mismatches} stats rows out of sync"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"All {checked} stats rows in sync"))
+
+    def _report_drift(self, computed, stored, empty):
+        """Print each stored row that differs from the bets table; returns how many"""
+        mismatches = 0
+        for user_id in computed.keys() | stored.keys():
+            expected = computed.get(user_id, empty)
+            stats = stored.get(user_id)
+            if stats is None:
+                if expected != empty:
+                    mismatches += 1
+                    self.stdout.write(f"User {user_id}: missing stats row")
+                continue
+
+            drift = {
+                field: (getattr(stats, field), value)
+                for field, value in expected.items()
+                if getattr(stats, field) != value
+            }
+            if drift:
+                mismatches += 1
+                details = ', '.join(
+                    f"{field}={actual} (expected {value})"
+                    for field, (actual, value) in drift.items()
+                )
+                self.stdout.write(f"User {user_id}: {details}")
+        return mismatches
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.events.models import Event
+from apps.bets.services import BetSettlementService
+
+
+class Command(BaseCommand):
+    help = "Settle all pending bets on an event and report bets/sec"
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument(
+            'result',
+            nargs='?',
+            help="Winning bet type (defaults to the event's stored result)"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(id=options['event_id'])
+        except Event.DoesNotExist:
+            raise CommandError(f"Event {options['event_id']} not found")
+
+        try:
+            summary = BetSettlementService.settle_event(event, options['result'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Settled {summary['settled_bets']} bets "
+            f"({summary['won_bets']} won, {summary['lost_bets']} lost) "
+            f"for {event} in {summary['elapsed_seconds']:.3f}s "
+            f"- {summary['bets_per_second']:.0f} bets/sec, "
+            f"${summary['total_payout']} paid to {summary['wallets_credited']} wallets"
+        ))
@@ -0,0 +1,219 @@
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from apps.accounts.views import COIN_FLIP_SIDES
+from apps.events.models import Event
+from apps.game.services import DiceGameService
+
+GAMES = ['dice', 'coin', 'events']
+
+# Rounds simulated per task; bounds each worker's memory to a few tens of MB
+CHUNK_ROUNDS = 2 ** 21
+
+PERCENTILES = [1, 5, 25, 50, 75, 95, 99]
+
+
+def simulate_chunk(task):
+    """
+    Play sessions of one bet in a worker process
+    task: (net, probabilities, sessions, session_rounds, bankroll, seed) where
+    net[i] is the result per unit stake of outcome i and probabilities is None
+    when all outcomes are equally likely
+    Returns: (outcome counts, sessions ruined, final bankrolls)
+    """
+    import numpy as np
+
+    net, probabilities, sessions, session_rounds, bankroll, seed = task
+    rng = np.random.default_rng(seed)
+    net = np.asarray(net, dtype=np.float64)
+    if probabilities is None:
+        outcomes = rng.integers(0, len(net), size=(sessions, session_rounds), dtype=np.uint8)
+    else:
+        outcomes = np.searchsorted(np.cumsum(probabilities), rng.random((sessions, session_rounds)), side='right')
+        outcomes = np.minimum(outcomes, len(net) - 1)
+
+    counts = np.bincount(outcomes.ravel(), minlength=len(net))
+    paths = np.cumsum(net[outcomes], axis=1)
+    # A session is ruined once the bankroll can't cover another unit stake
+    broke = paths < 1 - bankroll
+    ruined = broke.any(axis=1)
+    stopped_at = np.where(ruined, broke.argmax(axis=1), session_rounds - 1)
+    finals = bankroll + paths[np.arange(sessions), stopped_at]
+    return counts, int(ruined.sum()), finals.astype(np.float32)
+
+
+class Command(BaseCommand):
+    help = (
+        "Monte Carlo check of the house edge of the dice payouts, the home page coin "
+        "flip and the odds of upcoming events: RTP, volatility, risk of ruin and the "
+        "distribution of final bankrolls per bet type, simulated with NumPy across "
+        "a process pool. Event outcomes are drawn from the odds' implied probabilities, "
+        "so for events this measures the bookmaker margin built into the odds"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=10 ** 8, help="Rounds per bet type")
+        parser.add_argument('--session-rounds', type=int, default=1000, help="Rounds in one player session")
+        parser.add_argument('--bankroll', type=float, default=100, help="Starting bankroll per session, in stakes")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Processes; 1 runs inline")
+        parser.add_argument('--games', default=','.join(GAMES), help=f"Comma-separated subset of: {', '.join(GAMES)}")
+        parser.add_argument('--max-events', type=int, default=10, help="Upcoming events to include")
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+        except ImportError:
+            raise CommandError("simulate_house_edge needs NumPy (pip install numpy)")
+
+        games = [name.strip() for name in options['games'].split(',')]
+        unknown = set(games) - set(GAMES)
+        if unknown:
+            raise CommandError(f"Unknown games: {', '.join(sorted(unknown))}")
+        if options['rounds'] < 1 or options['session_rounds'] < 1 or options['bankroll'] < 1 or options['workers'] < 1:
+            raise CommandError("--rounds, --session-rounds, --bankroll and --workers must be positive")
+        if options['session_rounds'] > CHUNK_ROUNDS:
+            # A session is simulated within one chunk, so longer ones would break the memory bound
+            raise CommandError(f"--session-rounds can be at most {CHUNK_ROUNDS:,}")
+
+        bets = []
+        for game in games:
+            bets.extend(getattr(self, f'_{game}_bets')(options))
+        if not bets:
+            raise CommandError("Nothing to simulate")
+
+        session_rounds = options['session_rounds']
+        sessions = math.ceil(options['rounds'] / session_rounds)
+        per_chunk = CHUNK_ROUNDS // session_rounds
+        chunks = [min(per_chunk, sessions - start) for start in range(0, sessions, per_chunk)]
+        seeds = np.random.SeedSequence(options['seed']).spawn(len(bets) * len(chunks))
+        tasks = [
+            (bet['net'], bet['probabilities'], size, session_rounds, options['bankroll'], seeds[index * len(chunks) + chunk])
+            for index, bet in enumerate(bets)
+            for chunk, size in enumerate(chunks)
+        ]
+
+        started = time.perf_counter()
+        if options['workers'] == 1:
+            outputs = list(map(simulate_chunk, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                outputs = list(executor.map(simulate_chunk, tasks))
+        elapsed = time.perf_counter() - started
+
+        results = []
+        for index, bet in enumerate(bets):
+            parts = outputs[index * len(chunks):(index + 1) * len(chunks)]
+            results.append(self._summarize(bet, parts, options['bankroll']))
+
+        total_rounds = sum(result['rounds'] for result in results)
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'results': results,
+                'seconds': round(elapsed, 2),
+                'rounds_per_second': round(total_rounds / elapsed),
+            }, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'game':<8} {'bet':<28} {'RTP':>8} {'sim RTP':>8} {'+/-':>7} {'edge':>7} "
+            f"{'vol':>6} {'ruin':>7} {'p5':>7} {'p50':>7} {'p95':>7}"
+        )
+        for result in results:
+            bankrolls = result['final_bankroll']
+            self.stdout.write(
+                f"{result['game']:<8} {result['bet'][:28]:<28} {result['expected_rtp']:>7.3%} "
+                f"{result['rtp']:>7.3%} {result['rtp_ci95']:>6.3%} {result['house_edge']:>6.2%} "
+                f"{result['volatility']:>6.3f} {result['risk_of_ruin']:>6.2%} "
+                f"{bankrolls['p5']:>7.1f} {bankrolls['p50']:>7.1f} {bankrolls['p95']:>7.1f}"
+            )
+        self.stdout.write(
+            f"{total_rounds:,} rounds in {elapsed:.1f}s ({total_rounds / elapsed:,.0f} rounds/s, "
+            f"{options['workers']} workers); sessions of {session_rounds} rounds from {options['bankroll']:g} stakes"
+        )
+
+    @staticmethod
+    def _summarize(bet, parts, bankroll):
+        import numpy as np
+
+        counts = sum(part[0] for part in parts)
+        finals = np.concatenate([part[2] for part in parts])
+        net = np.asarray(bet['net'], dtype=np.float64)
+        rounds = int(counts.sum())
+        mean = float(counts @ net) / rounds
+        variance = max(float(counts @ net ** 2) / rounds - mean ** 2, 0.0)
+        if bet['probabilities'] is None:
+            expected = float(net.mean())
+        else:
+            expected = float(np.asarray(bet['probabilities']) @ net)
+        return {
+            'game': bet['game'],
+            'bet': bet['bet'],
+            'rounds': rounds,
+            'expected_rtp': 1 + expected,
+            'rtp': 1 + mean,
+            'rtp_ci95': 1.96 * math.sqrt(variance / rounds),
+            'house_edge': -mean,
+            'volatility': math.sqrt(variance),
+            'risk_of_ruin': sum(part[1] for part in parts) / len(finals),
+            'final_bankroll': {
+                f'p{q}': float(value) for q, value in zip(PERCENTILES, np.percentile(finals, PERCENTILES))
+            },
+            'bankroll': bankroll,
+        }
+
+    # Bet definitions: result per unit stake of every equally likely outcome,
+    # or of each outcome with the given probabilities
+
+    def _dice_bets(self, options):
+        import numpy as np
+
+        faces = np.arange(1, 7)
+        bets = []
+        for bet_type, multiplier in DiceGameService.PAYOUTS.items():
+            bet_value = 1 if bet_type == 'SINGLE' else None
+            wins = DiceGameService.check_win(bet_type, bet_value, faces)
+            bets.append({
+                'game': 'dice',
+                'bet': f'{bet_type} x{multiplier}',
+                'net': np.where(wins, float(multiplier) - 1, -1.0).tolist(),
+                'probabilities': None,
+            })
+        return bets
+
+    def _coin_bets(self, options):
+        # The player's side wins on one of the sides; a win pays the stake, a loss takes it
+        return [{
+            'game': 'coin',
+            'bet': 'even money',
+            'net': [1.0] + [-1.0] * (len(COIN_FLIP_SIDES) - 1),
+            'probabilities': None,
+        }]
+
+    def _events_bets(self, options):
+        # One bet per possible result; over/under have no odds on Event yet
+        bet_types = [result for result, label in Event._meta.get_field('result').choices]
+        bets = []
+        for event in Event.objects.filter(status='upcoming').order_by('start_time')[:options['max_events']]:
+            odds = [float(event.get_odds_for_bet_type(bet_type)) for bet_type in bet_types]
+            if min(odds) <= 1:
+                # No implied probability, and a bet there could never win anything
+                self.stderr.write(
+                    f"Skipping event #{event.pk}: every result needs odds above 1, got "
+                    + ', '.join(f'{bet_type} @{value:g}' for bet_type, value in zip(bet_types, odds))
+                )
+                continue
+            overround = sum(1 / value for value in odds)
+            probabilities = [1 / value / overround for value in odds]
+            for chosen, bet_type in enumerate(bet_types):
+                bets.append({
+                    'game': 'events',
+                    'bet': f'#{event.pk} {bet_type} @{odds[chosen]:g}',
+                    'net': [odds[chosen] - 1 if outcome == chosen else -1.0 for outcome in range(len(odds))],
+                    'probabilities': probabilities,
+                })
+        return bets
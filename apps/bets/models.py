@@ -1,8 +1,12 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.db import models, router, transaction
+from django.db.models import F, Q, Sum, Count
 from django.conf import settings  
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from decimal import Decimal
+from apps.db.routers import use_replica
+from apps.db.sharding import ShardedManager, on_shard, shard_aliases
 from apps.events.models import Event
 
 
@@ -99,6 +103,8 @@ class Bet(models.Model):
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     notes = models.TextField(blank=True, help_text="Admin notes or bet details")
     
+    objects = ShardedManager()
+    
     class Meta:
         db_table = 'bets'
         ordering = ['-placed_at']
@@ -117,7 +123,20 @@ class Bet(models.Model):
         """Override save to auto-calculate potential payout if not set"""
         if not self.potential_payout:
             self.potential_payout = self.stake * self.odds
-        super().save(*args, **kwargs)
+        
+        is_new = self._state.adding
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with on_shard(using), transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            if is_new:
+                UserBetStats.record_bet_placed(self)
+    
+    def _save_status_change(self, previous_status, previous_payout):
+        """Save a status change and keep the user's stats row in step"""
+        using = router.db_for_write(type(self), instance=self)
+        with on_shard(using), transaction.atomic(using=using):
+            self.save()
+            UserBetStats.record_status_change(self, previous_status, previous_payout)
     
     # Status Check Methods
     def is_pending(self):
@@ -148,38 +167,54 @@ class Bet(models.Model):
         if not self.is_pending():
             raise ValueError("Only pending bets can be marked as won")
         
+        previous_status, previous_payout = self.status, self.actual_payout
         self.status = self.WON
         self.actual_payout = payout_amount or self.potential_payout
         self.settled_at = timezone.now()
-        self.save()
+        self._save_status_change(previous_status, previous_payout)
     
     def mark_as_lost(self):
         """Mark bet as lost"""
         if not self.is_pending():
             raise ValueError("Only pending bets can be marked as lost")
         
+        previous_status, previous_payout = self.status, self.actual_payout
         self.status = self.LOST
         self.actual_payout = Decimal('0.00')
         self.settled_at = timezone.now()
-        self.save()
+        self._save_status_change(previous_status, previous_payout)
     
     def mark_as_cancelled(self):
-        """Mark bet as cancelled"""
+        """
+        Mark bet as cancelled
+        A conditional UPDATE on the pending status, so of two concurrent
+        cancellations only one succeeds; the other raises ValueError
+        """
         if not self.can_be_cancelled():
             raise ValueError("This bet cannot be cancelled")
         
-        self.status = self.CANCELLED
-        self.settled_at = timezone.now()
-        self.save()
+        now = timezone.now()
+        using = router.db_for_write(type(self), instance=self)
+        with on_shard(using), transaction.atomic(using=using):
+            cancelled = type(self).objects.using(using).filter(pk=self.pk, status=self.PENDING).update(
+                status=self.CANCELLED, settled_at=now, updated_at=now
+            )
+            if not cancelled:
+                raise ValueError("This bet cannot be cancelled")
+            self.status = self.CANCELLED
+            self.settled_at = now
+            self.updated_at = now
+            UserBetStats.record_status_change(self, self.PENDING, self.actual_payout)
     
     def mark_as_void(self, reason=""):
         """Mark bet as void (refund stake)"""
+        previous_status, previous_payout = self.status, self.actual_payout
         self.status = self.VOID
         self.actual_payout = self.stake  # Refund stake
         self.settled_at = timezone.now()
         if reason:
             self.notes = f"Voided: {reason}"
-        self.save()
+        self._save_status_change(previous_status, previous_payout)
     
     # Calculation Methods
     def calculate_profit(self):
@@ -219,47 +254,14 @@ class Bet(models.Model):
     
     # Class Methods for Statistics
     @classmethod
+    @use_replica
     def get_user_stats(cls, user):
         """
         Get comprehensive betting statistics for a user
+        Reads the user's UserBetStats row instead of scanning the bets table
         Returns dict with various stats
         """
-        from django.db.models import Sum, Count, Avg, Q
-        
-        bets = cls.objects.filter(user=user)
-        
-        total_bets = bets.count()
-        pending_bets = bets.filter(status=cls.PENDING).count()
-        won_bets = bets.filter(status=cls.WON).count()
-        lost_bets = bets.filter(status=cls.LOST).count()
-        
-        # Financial stats
-        total_staked = bets.aggregate(total=Sum('stake'))['total'] or Decimal('0.00')
-        total_won = bets.filter(status=cls.WON).aggregate(total=Sum('actual_payout'))['total'] or Decimal('0.00')
-        total_pending_stake = bets.filter(status=cls.PENDING).aggregate(total=Sum('stake'))['total'] or Decimal('0.00')
-        
-        # Calculate net profit/loss
-        net_profit = total_won - (total_staked - total_pending_stake)
-        
-        # Win rate
-        settled_bets = won_bets + lost_bets
-        win_rate = (won_bets / settled_bets * 100) if settled_bets > 0 else Decimal('0.00')
-        
-        # Average odds
-        avg_odds = bets.aggregate(avg=Avg('odds'))['avg'] or Decimal('0.00')
-        
-        return {
-            'total_bets': total_bets,
-            'pending_bets': pending_bets,
-            'won_bets': won_bets,
-            'lost_bets': lost_bets,
-            'total_staked': total_staked,
-            'total_won': total_won,
-            'total_pending_stake': total_pending_stake,
-            'net_profit': net_profit,
-            'win_rate': round(win_rate, 2),
-            'avg_odds': round(avg_odds, 2),
-        }
+        return UserBetStats.get_for_user(user).as_dict()
     
     @classmethod
     def get_pending_bets_for_event(cls, event):
@@ -273,3 +275,215 @@ class Bet(models.Model):
             user=user, 
             status=cls.WON
         ).order_by('-settled_at')[:limit]
+
+
+class UserBetStats(models.Model):
+    """
+    Denormalized betting statistics for a user
+    Updated atomically whenever one of the user's bets is placed or changes status
+    """
+    
+    # Maps bet status to the counter that tracks it
+    STATUS_COUNTERS = {
+        Bet.PENDING: 'pending_bets',
+        Bet.WON: 'won_bets',
+        Bet.LOST: 'lost_bets',
+        Bet.CANCELLED: 'cancelled_bets',
+        Bet.VOID: 'void_bets',
+    }
+    
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='bet_stats'
+    )
+    
+    # Counters
+    total_bets = models.IntegerField(default=0)
+    pending_bets = models.IntegerField(default=0)
+    won_bets = models.IntegerField(default=0)
+    lost_bets = models.IntegerField(default=0)
+    cancelled_bets = models.IntegerField(default=0)
+    void_bets = models.IntegerField(default=0)
+    
+    # Running totals
+    total_staked = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_won = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_pending_stake = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_odds = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text="Sum of odds over all bets, used for the average"
+    )
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = ShardedManager()
+    
+    class Meta:
+        db_table = 'user_bet_stats'
+        verbose_name = 'User Bet Stats'
+        verbose_name_plural = 'User Bet Stats'
+    
+    def __str__(self):
+        return f"{self.user}'s Bet Stats"
+    
+    def as_dict(self):
+        """Return stats in the shape of Bet.get_user_stats"""
+        net_profit = self.total_won - (self.total_staked - self.total_pending_stake)
+        
+        settled_bets = self.won_bets + self.lost_bets
+        win_rate = (self.won_bets / settled_bets * 100) if settled_bets > 0 else Decimal('0.00')
+        
+        avg_odds = (self.total_odds / self.total_bets) if self.total_bets > 0 else Decimal('0.00')
+        
+        return {
+            'total_bets': self.total_bets,
+            'pending_bets': self.pending_bets,
+            'won_bets': self.won_bets,
+            'lost_bets': self.lost_bets,
+            'total_staked': self.total_staked,
+            'total_won': self.total_won,
+            'total_pending_stake': self.total_pending_stake,
+            'net_profit': net_profit,
+            'win_rate': round(win_rate, 2),
+            'avg_odds': round(avg_odds, 2),
+        }
+    
+    @classmethod
+    def get_for_user(cls, user):
+        """Get the user's stats row, building it from the bets table if missing"""
+        stats = cls.objects.filter(user=user).first()
+        if stats is None:
+            stats = cls.rebuild_for_user(user.pk)
+        return stats
+    
+    @classmethod
+    async def aget_for_user(cls, user):
+        """Async get_for_user; the rare rebuild runs in the sync ORM"""
+        stats = await cls.objects.filter(user_id=user.pk).afirst()
+        if stats is None:
+            stats = await sync_to_async(cls.rebuild_for_user)(user.pk)
+        return stats
+    
+    @classmethod
+    def apply_deltas(cls, user_id, **deltas):
+        """
+        Apply counter/total deltas to a user's row in a single UPDATE
+        Must run after the bet rows it describes are written, so a missing
+        row can be rebuilt from the bets table instead
+        """
+        updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if not updates:
+            return
+        updates['updated_at'] = timezone.now()
+        
+        if not cls.objects.filter(user_id=user_id).update(**updates):
+            cls.rebuild_for_user(user_id)
+    
+    @classmethod
+    def record_bet_placed(cls, bet):
+        """Count a newly placed bet"""
+        deltas = {
+            'total_bets': 1,
+            'total_staked': bet.stake,
+            'total_odds': bet.odds,
+            cls.STATUS_COUNTERS[bet.status]: 1,
+        }
+        if bet.status == Bet.PENDING:
+            deltas['total_pending_stake'] = bet.stake
+        if bet.status == Bet.WON:
+            deltas['total_won'] = bet.actual_payout
+        cls.apply_deltas(bet.user_id, **deltas)
+    
+    @classmethod
+    def record_status_change(cls, bet, previous_status, previous_payout):
+        """Move a bet between status counters (settled, cancelled or voided)"""
+        deltas = {}
+        if previous_status != bet.status:
+            deltas[cls.STATUS_COUNTERS[previous_status]] = -1
+            deltas[cls.STATUS_COUNTERS[bet.status]] = 1
+        
+        pending_stake = Decimal('0.00')
+        if previous_status == Bet.PENDING:
+            pending_stake -= bet.stake
+        if bet.status == Bet.PENDING:
+            pending_stake += bet.stake
+        deltas['total_pending_stake'] = pending_stake
+        
+        won = Decimal('0.00')
+        if previous_status == Bet.WON:
+            won -= previous_payout
+        if bet.status == Bet.WON:
+            won += bet.actual_payout
+        deltas['total_won'] = won
+        
+        cls.apply_deltas(bet.user_id, **deltas)
+    
+    @classmethod
+    def compute(cls, user_ids=None):
+        """
+        Compute stats straight from the bets table in one grouped query
+        Returns: {user_id: {field: value}}
+        """
+        bets = Bet.objects.all()
+        if user_ids is not None:
+            bets = bets.filter(user_id__in=user_ids)
+        
+        zero = Decimal('0.00')
+        rows = bets.order_by().values('user_id').annotate(
+            total_bets=Count('id'),
+            pending_bets=Count('id', filter=Q(status=Bet.PENDING)),
+            won_bets=Count('id', filter=Q(status=Bet.WON)),
+            lost_bets=Count('id', filter=Q(status=Bet.LOST)),
+            cancelled_bets=Count('id', filter=Q(status=Bet.CANCELLED)),
+            void_bets=Count('id', filter=Q(status=Bet.VOID)),
+            total_staked=Sum('stake'),
+            total_won=Sum('actual_payout', filter=Q(status=Bet.WON)),
+            total_pending_stake=Sum('stake', filter=Q(status=Bet.PENDING)),
+            total_odds=Sum('odds'),
+        )
+        
+        return {
+            row.pop('user_id'): {
+                field: zero if value is None else value
+                for field, value in row.items()
+            }
+            for row in rows
+        }
+    
+    @classmethod
+    def empty_values(cls):
+        """Field values for a user with no bets"""
+        values = dict.fromkeys(['total_bets', *cls.STATUS_COUNTERS.values()], 0)
+        values.update(dict.fromkeys(
+            ['total_staked', 'total_won', 'total_pending_stake', 'total_odds'],
+            Decimal('0.00')
+        ))
+        return values
+    
+    @classmethod
+    def rebuild_for_user(cls, user_id):
+        """Recompute a single user's row from the bets table"""
+        values = cls.compute([user_id]).get(user_id) or cls.empty_values()
+        stats, created = cls.objects.update_or_create(user_id=user_id, defaults=values)
+        return stats
+    
+    @classmethod
+    def rebuild_all(cls, batch_size=1000):
+        """
+        Rebuild every row from scratch, one shard at a time
+        Returns: number of rows written
+        """
+        count = 0
+        for alias in shard_aliases():
+            with on_shard(alias), transaction.atomic(using=alias):
+                computed = cls.compute()
+                cls.objects.all().delete()
+                cls.objects.bulk_create(
+                    [cls(user_id=user_id, **values) for user_id, values in computed.items()],
+                    batch_size=batch_size
+                )
+            count += len(computed)
+        return count
@@ -0,0 +1,397 @@
+import logging
+import time
+from decimal import Decimal
+from functools import partial
+from django.db import transaction
+from django.db.models import F, Sum, Count
+from django.utils import timezone
+from apps.events.models import Event
+from apps.db.sharding import mirror_rows, on_shard, shard_aliases, shard_for_user
+from apps.events.services import odds_cache
+from apps.wallet.ledger import write_ledger
+from apps.wallet.models import Wallet, Transaction
+from apps.wallet.notifications import publish_on_commit
+from .models import Bet, UserBetStats
+
+logger = logging.getLogger(__name__)
+
+
+class BetSettlementService:
+    """
+    Settles every pending bet on a finished event with set-based statements
+    instead of one save() and one wallet lock per bet, one shard at a time
+    """
+
+    # Rows per bulk INSERT and per IN (...) lookup; stays under SQLite's variable limit
+    BATCH_SIZE = 900
+
+    @staticmethod
+    def settle_event(event, result=None):
+        """
+        Settle all pending bets for an event against its result
+        Returns: dict with settlement counts, payout total and bets/sec
+        """
+        result = result or event.result
+        if result not in dict(Bet.BET_TYPE_CHOICES):
+            raise ValueError(f"Invalid event result: {result}")
+
+        started = time.perf_counter()
+        now = timezone.now()
+
+        # Each shard settles in its own transaction; only pending bets are touched,
+        # so re-running after a failure finishes the shards that did not commit
+        won_count = lost_count = 0
+        winners = []
+        wallets_credited = 0
+        for alias in shard_aliases():
+            with on_shard(alias), transaction.atomic(using=alias):
+                won, lost, shard_winners, credited = BetSettlementService._settle_shard(event, result, now, alias)
+            won_count += won
+            lost_count += lost
+            winners.extend(shard_winners)
+            wallets_credited += credited
+
+        with transaction.atomic():
+            if event.result != result or event.status != 'finished':
+                type(event).objects.filter(pk=event.pk).update(
+                    result=result,
+                    status='finished',
+                    odds_version=F('odds_version') + 1,
+                )
+                event.result = result
+                event.status = 'finished'
+                event.refresh_from_db(fields=['odds_version'])
+                transaction.on_commit(partial(odds_cache.invalidate, event.pk, event.odds_version))
+                mirror_rows(type(event), [event.pk])
+
+        elapsed = time.perf_counter() - started
+        settled = won_count + lost_count
+        summary = {
+            'event_id': event.pk,
+            'result': result,
+            'settled_bets': settled,
+            'won_bets': won_count,
+            'lost_bets': lost_count,
+            'wallets_credited': wallets_credited,
+            'total_payout': sum((payout for _, _, payout, _ in winners), Decimal('0.00')),
+            'elapsed_seconds': elapsed,
+            'bets_per_second': settled / elapsed if elapsed > 0 else 0.0,
+        }
+        logger.info(
+            "Settled %s bets for event %s in %.3fs (%.0f bets/sec)",
+            settled, event.pk, elapsed, summary['bets_per_second']
+        )
+        return summary
+
+    @staticmethod
+    def _settle_shard(event, result, now, using):
+        """
+        Settle the event's pending bets stored on one database
+        Returns: (won_count, lost_count, winners, wallets credited)
+        """
+        winner_ids, loser_ids = BetSettlementService._pending_ids(event, result)
+
+        # Only bets still pending when their own UPDATE runs are settled, so a bet
+        # cancelled or placed since the read is neither paid nor marked
+        won_count = BetSettlementService._mark(winner_ids, using, now, status=Bet.WON, actual_payout=F('potential_payout'))
+        lost_count = BetSettlementService._mark(loser_ids, using, now, status=Bet.LOST, actual_payout=Decimal('0.00'))
+
+        # Rows this settlement changed carry its settled_at: (bet_id, user_id, payout, stake)
+        settled = Bet.objects.using(using).filter(event=event, settled_at=now)
+        winners = list(
+            settled.filter(status=Bet.WON)
+            .order_by('user_id', 'id')
+            .values_list('id', 'user_id', 'actual_payout', 'stake')
+            .iterator(chunk_size=BetSettlementService.BATCH_SIZE)
+        )
+        losers = list(
+            settled.filter(status=Bet.LOST)
+            .order_by()
+            .values('user_id')
+            .annotate(count=Count('id'), stake=Sum('stake'))
+        )
+
+        # One balance update per affected wallet
+        totals = {}
+        for bet_id, user_id, payout, stake in winners:
+            totals[user_id] = totals.get(user_id, Decimal('0.00')) + payout
+
+        for user_id, total in totals.items():
+            Wallet.objects.filter(user_id=user_id).update(
+                balance=F('balance') + total,
+                updated_at=now,
+            )
+
+        balances = BetSettlementService._get_wallet_balances(totals.keys())
+        for user_id in totals.keys() - balances.keys():
+            logger.error(
+                "Event %s: user %s won %s but has no wallet; bets %s are marked won but unpaid",
+                event.pk, user_id, totals[user_id],
+                [bet_id for bet_id, winner_id, payout, stake in winners if winner_id == user_id]
+            )
+
+        # Rebuild each wallet's running balance so every ledger row has a correct balance_after
+        running = {
+            user_id: balances[user_id][1] - totals[user_id]
+            for user_id in totals
+            if user_id in balances
+        }
+        ledger = []
+        for bet_id, user_id, payout, stake in winners:
+            if user_id not in balances:
+                continue
+            running[user_id] += payout
+            ledger.append(Transaction(
+                wallet_id=balances[user_id][0],
+                transaction_type=Transaction.CREDIT,
+                category=Transaction.BET_PAYOUT,
+                amount=payout,
+                balance_after=running[user_id],
+                description=f"Bet winning - {payout} (Bet #{bet_id})",
+            ))
+        ledger = write_ledger(ledger, using)
+
+        # Push the new balance to any open wallet streams once the settlement commits
+        credited = {}
+        for entry in ledger:
+            credited.setdefault(entry.wallet_id, []).append(entry)
+        for user_id, (wallet_id, balance) in balances.items():
+            publish_on_commit(user_id, balance, credited.get(wallet_id, []), using)
+
+        BetSettlementService._update_user_stats(winners, losers)
+
+        return won_count, lost_count, winners, len(running)
+
+    @staticmethod
+    def _pending_ids(event, result):
+        """Ids of the event's pending bets: (winning, losing)"""
+        pending = Bet.get_pending_bets_for_event(event).order_by('id')
+        return (
+            list(pending.filter(bet_type=result).values_list('id', flat=True)),
+            list(pending.exclude(bet_type=result).values_list('id', flat=True)),
+        )
+
+    @staticmethod
+    def _mark(bet_ids, using, now, **changes):
+        """Settle those of bet_ids that are still pending; Returns: number of bets updated"""
+        count = 0
+        for i in range(0, len(bet_ids), BetSettlementService.BATCH_SIZE):
+            count += Bet.objects.using(using).filter(
+                pk__in=bet_ids[i:i + BetSettlementService.BATCH_SIZE], status=Bet.PENDING
+            ).update(settled_at=now, updated_at=now, **changes)
+        return count
+
+    @staticmethod
+    def _update_user_stats(winners, losers):
+        """Apply one UserBetStats delta per affected user"""
+        deltas = {}
+
+        def user_deltas(user_id):
+            return deltas.setdefault(user_id, {
+                'pending_bets': 0,
+                'won_bets': 0,
+                'lost_bets': 0,
+                'total_won': Decimal('0.00'),
+                'total_pending_stake': Decimal('0.00'),
+            })
+
+        for bet_id, user_id, payout, stake in winners:
+            user = user_deltas(user_id)
+            user['pending_bets'] -= 1
+            user['won_bets'] += 1
+            user['total_won'] += payout
+            user['total_pending_stake'] -= stake
+        for row in losers:
+            user = user_deltas(row['user_id'])
+            user['pending_bets'] -= row['count']
+            user['lost_bets'] += row['count']
+            user['total_pending_stake'] -= row['stake']
+
+        for user_id, user in deltas.items():
+            UserBetStats.apply_deltas(user_id, **user)
+
+    @staticmethod
+    def _get_wallet_balances(user_ids):
+        """Fetch {user_id: (wallet_id, balance)} in IN-list sized chunks"""
+        user_ids = list(user_ids)
+        balances = {}
+        for i in range(0, len(user_ids), BetSettlementService.BATCH_SIZE):
+            chunk = user_ids[i:i + BetSettlementService.BATCH_SIZE]
+            for wallet_id, user_id, balance in Wallet.objects.filter(
+                user_id__in=chunk
+            ).values_list('id', 'user_id', 'balance'):
+                balances[user_id] = (wallet_id, balance)
+        return balances
+
+
+class BetSlipService:
+    """
+    Places several bets in one request: one Event query for all odds,
+    one wallet debit for the total stake and bulk inserts for bets and ledger rows
+    """
+
+    MIN_STAKE = Decimal('1.00')
+    MAX_STAKE = Decimal('10000.00')
+    MAX_SELECTIONS = 50
+    MIN_ODDS = Decimal('1.01')
+
+    @staticmethod
+    def clean_stake(stake):
+        """
+        Round a stake to cents and hold it to MIN_STAKE..MAX_STAKE
+        Returns: the stake as a Decimal, raises ValueError if it is out of range
+        """
+        stake = Decimal(str(stake)).quantize(Decimal('0.01'))
+        if stake < BetSlipService.MIN_STAKE:
+            raise ValueError(f"minimum stake is ${BetSlipService.MIN_STAKE}")
+        if stake > BetSlipService.MAX_STAKE:
+            raise ValueError(f"maximum stake is ${BetSlipService.MAX_STAKE:,}")
+        return stake
+
+    @staticmethod
+    def place_slip(user, selections, ip_address=None):
+        """
+        Place every selection or none of them
+        selections: iterable of dicts with event_id, bet_type and stake
+        Returns: list of created Bet objects, raises ValueError on any invalid selection
+        """
+        selections = list(selections)
+        if not selections:
+            raise ValueError("Bet slip is empty")
+        if len(selections) > BetSlipService.MAX_SELECTIONS:
+            raise ValueError(f"A bet slip can hold at most {BetSlipService.MAX_SELECTIONS} selections")
+
+        parsed = []
+        for index, selection in enumerate(selections, start=1):
+            try:
+                event_id = int(selection['event_id'])
+                bet_type = selection['bet_type']
+                stake = Decimal(str(selection['stake']))
+            except (KeyError, TypeError, ValueError, ArithmeticError):
+                raise ValueError(f"Selection {index}: event_id, bet_type and stake are required")
+
+            if bet_type not in dict(Bet.BET_TYPE_CHOICES):
+                raise ValueError(f"Selection {index}: invalid bet type {bet_type}")
+            try:
+                stake = BetSlipService.clean_stake(stake)
+            except ArithmeticError:
+                raise ValueError(f"Selection {index}: event_id, bet_type and stake are required")
+            except ValueError as e:
+                raise ValueError(f"Selection {index}: {e}")
+            parsed.append((event_id, bet_type, stake))
+
+        # All odds in one query
+        events = Event.objects.in_bulk({event_id for event_id, bet_type, stake in parsed})
+
+        bets = []
+        for index, (event_id, bet_type, stake) in enumerate(parsed, start=1):
+            event = events.get(event_id)
+            if event is None:
+                raise ValueError(f"Selection {index}: event not found")
+            if not event.is_bettable():
+                raise ValueError(f"Selection {index}: {event} is no longer accepting bets")
+
+            odds = Decimal(str(event.get_odds_for_bet_type(bet_type)))
+            if odds < BetSlipService.MIN_ODDS:
+                raise ValueError(f"Selection {index}: no odds available for {bet_type} on {event}")
+
+            bets.append(Bet(
+                user=user,
+                event=event,
+                bet_type=bet_type,
+                stake=stake,
+                odds=odds,
+                potential_payout=(stake * odds).quantize(Decimal('0.01')),
+                ip_address=ip_address,
+            ))
+
+        using = shard_for_user(user)
+        with on_shard(using), transaction.atomic(using=using):
+            bets = Bet.objects.bulk_create(bets)
+
+            Wallet.apply_batch_debit(
+                [(bet.stake, f"Bet placed - {bet.stake} (Bet #{bet.pk})") for bet in bets],
+                Transaction.BET_STAKE,
+                user=user
+            )
+
+            # bulk_create skips Bet.save, so count the whole slip in one stats update
+            total_stake = sum((bet.stake for bet in bets), Decimal('0.00'))
+            UserBetStats.apply_deltas(
+                user.pk,
+                total_bets=len(bets),
+                pending_bets=len(bets),
+                total_staked=total_stake,
+                total_pending_stake=total_stake,
+                total_odds=sum((bet.odds for bet in bets), Decimal('0.00')),
+            )
+
+        return bets
+
+
+class PayoutQuoteService:
+    """
+    Prices every event x bet type x stake combination in one pass from cached odds
+    Only quotes what BetSlipService.place_slip would accept
+    """
+
+    MAX_QUOTES = 1000
+    QUOTE_COLUMNS = ['event_id', 'bet_type', 'stake', 'odds', 'potential_payout', 'profit']
+
+    @staticmethod
+    def quote(event_ids, bet_types, stakes):
+        """
+        Stakes are rounded to cents and held to BetSlipService's limits like
+        place_slip; out-of-range stakes are reported instead of quoted
+        Returns: (rows, missing_event_ids, closed_event_ids, stake_errors) where
+        each row follows QUOTE_COLUMNS and stake_errors are {'stake', 'error'}
+        dicts; bet types without odds of at least BetSlipService.MIN_ODDS are left out
+        Raises ValueError for invalid bet types or stakes, or too many combinations
+        """
+        event_ids = list(dict.fromkeys(int(event_id) for event_id in event_ids))
+        bet_types = list(dict.fromkeys(bet_types))
+        stakes = list(dict.fromkeys(stakes))
+
+        if not (event_ids and bet_types and stakes):
+            raise ValueError("event_ids, bet_types and stakes are all required")
+        if len(event_ids) * len(bet_types) * len(stakes) > PayoutQuoteService.MAX_QUOTES:
+            raise ValueError(f"At most {PayoutQuoteService.MAX_QUOTES} quotes per request")
+
+        valid_bet_types = dict(Bet.BET_TYPE_CHOICES)
+        for bet_type in bet_types:
+            if bet_type not in valid_bet_types:
+                raise ValueError(f"Invalid bet type: {bet_type}")
+        valid_stakes = []
+        stake_errors = []
+        for stake in stakes:
+            try:
+                stake_value = BetSlipService.clean_stake(stake)
+            except ArithmeticError:
+                raise ValueError(f"Invalid stake: {stake}")
+            except ValueError as e:
+                stake_errors.append({'stake': stake, 'error': f"Stake {stake}: {e}"})
+                continue
+            if stake_value not in valid_stakes:
+                valid_stakes.append(stake_value)
+
+        events = odds_cache.get_many(event_ids)
+
+        rows = []
+        closed = []
+        for event_id in event_ids:
+            event = events.get(event_id)
+            if event is None:
+                continue
+            if not event.is_bettable():
+                closed.append(event_id)
+                continue
+            for bet_type in bet_types:
+                odds = Decimal(str(event.get_odds_for_bet_type(bet_type)))
+                if odds < BetSlipService.MIN_ODDS:
+                    continue
+                for stake in valid_stakes:
+                    payout = (stake * odds).quantize(Decimal('0.01'))
+                    rows.append([event_id, bet_type, float(stake), float(odds), float(payout), float(payout - stake)])
+
+        missing = [event_id for event_id in event_ids if event_id not in events]
+        return rows, missing, closed, stake_errors
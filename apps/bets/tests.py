@@ -0,0 +1,550 @@
+from unittest import mock
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from apps.events.models import Event
+from apps.events.services import odds_cache
+from apps.wallet.models import Wallet, Transaction
+from .models import Bet, UserBetStats
+from .services import BetSettlementService, BetSlipService
+
+
+User = get_user_model()
+
+
+class BetSettlementServiceTest(TestCase):
+    """Test cases for bulk event settlement"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.event = Event.objects.create(
+            name='Team A vs Team B',
+            start_time=timezone.now() - timedelta(hours=2),
+            odds_team_a=Decimal('2.00'),
+            odds_team_b=Decimal('3.00'),
+        )
+        self.alice = User.objects.create_user(email='alice@example.com', password='testpass123')
+        self.bob = User.objects.create_user(email='bob@example.com', password='testpass123')
+        self.alice_wallet = Wallet.objects.create(user=self.alice, balance=Decimal('1000.00'))
+        self.bob_wallet = Wallet.objects.create(user=self.bob, balance=Decimal('1000.00'))
+
+    def _bet(self, user, bet_type, stake, odds):
+        return Bet.objects.create(
+            user=user,
+            event=self.event,
+            bet_type=bet_type,
+            stake=Decimal(stake),
+            odds=Decimal(odds),
+        )
+
+    def test_settle_event(self):
+        """Test winners are paid and losers marked in bulk"""
+        win_1 = self._bet(self.alice, Bet.TEAM_A_WIN, '100.00', '2.00')
+        win_2 = self._bet(self.alice, Bet.TEAM_A_WIN, '50.00', '2.00')
+        lose = self._bet(self.bob, Bet.TEAM_B_WIN, '100.00', '3.00')
+
+        summary = BetSettlementService.settle_event(self.event, Bet.TEAM_A_WIN)
+
+        self.assertEqual(summary['settled_bets'], 3)
+        self.assertEqual(summary['won_bets'], 2)
+        self.assertEqual(summary['lost_bets'], 1)
+        self.assertEqual(summary['total_payout'], Decimal('300.00'))
+
+        win_1.refresh_from_db()
+        lose.refresh_from_db()
+        self.assertEqual(win_1.status, Bet.WON)
+        self.assertEqual(win_1.actual_payout, Decimal('200.00'))
+        self.assertIsNotNone(win_1.settled_at)
+        self.assertEqual(lose.status, Bet.LOST)
+        self.assertEqual(lose.actual_payout, Decimal('0.00'))
+
+        self.alice_wallet.refresh_from_db()
+        self.bob_wallet.refresh_from_db()
+        self.assertEqual(self.alice_wallet.balance, Decimal('1300.00'))
+        self.assertEqual(self.bob_wallet.balance, Decimal('1000.00'))
+
+        ledger = list(self.alice_wallet.transactions.order_by('balance_after'))
+        self.assertEqual(len(ledger), 2)
+        self.assertEqual(ledger[-1].balance_after, Decimal('1300.00'))
+        self.assertIn(f"Bet #{win_2.id}", ledger[-1].description)
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.status, 'finished')
+        self.assertEqual(self.event.result, Bet.TEAM_A_WIN)
+
+    def test_settle_event_skips_settled_bets(self):
+        """Test settling twice does not pay out twice"""
+        self._bet(self.alice, Bet.TEAM_A_WIN, '100.00', '2.00')
+
+        BetSettlementService.settle_event(self.event, Bet.TEAM_A_WIN)
+        summary = BetSettlementService.settle_event(self.event, Bet.TEAM_A_WIN)
+
+        self.assertEqual(summary['settled_bets'], 0)
+        self.alice_wallet.refresh_from_db()
+        self.assertEqual(self.alice_wallet.balance, Decimal('1200.00'))
+        self.assertEqual(Transaction.objects.filter(wallet=self.alice_wallet).count(), 1)
+
+    def test_settle_event_skips_bets_changed_after_read(self):
+        """Test a bet cancelled or placed between reading and settling is neither paid nor marked"""
+        cancelled = self._bet(self.alice, Bet.TEAM_A_WIN, '100.00', '2.00')
+        kept = self._bet(self.alice, Bet.TEAM_A_WIN, '50.00', '2.00')
+        late = []
+        pending_ids = BetSettlementService._pending_ids
+
+        def race(event, result):
+            ids = pending_ids(event, result)
+            Bet.objects.filter(pk=cancelled.pk).update(status=Bet.CANCELLED)
+            late.append(self._bet(self.bob, Bet.TEAM_A_WIN, '10.00', '2.00'))
+            return ids
+
+        with mock.patch.object(BetSettlementService, '_pending_ids', side_effect=race):
+            summary = BetSettlementService.settle_event(self.event, Bet.TEAM_A_WIN)
+
+        self.assertEqual(summary['won_bets'], 1)
+        self.assertEqual(summary['total_payout'], Decimal('100.00'))
+        self.assertEqual(Bet.objects.get(pk=cancelled.pk).status, Bet.CANCELLED)
+        self.assertEqual(Bet.objects.get(pk=kept.pk).status, Bet.WON)
+        self.assertEqual(Bet.objects.get(pk=late[0].pk).status, Bet.PENDING)
+        self.alice_wallet.refresh_from_db()
+        self.bob_wallet.refresh_from_db()
+        self.assertEqual(self.alice_wallet.balance, Decimal('1100.00'))
+        self.assertEqual(self.bob_wallet.balance, Decimal('1000.00'))
+
+    def test_settle_event_logs_winner_without_wallet(self):
+        """Test a winner with no wallet is reported instead of skipped silently"""
+        bet = self._bet(self.bob, Bet.TEAM_A_WIN, '100.00', '2.00')
+        self.bob_wallet.delete()
+
+        with self.assertLogs('apps.bets.services', level='ERROR') as logs:
+            BetSettlementService.settle_event(self.event, Bet.TEAM_A_WIN)
+
+        self.assertIn(f"[{bet.pk}]", logs.output[0])
+
+    def test_settle_event_invalid_result(self):
+        """Test an unknown result is rejected"""
+        with self.assertRaises(ValueError):
+            BetSettlementService.settle_event(self.event, 'nobody')
+
+
+class UserBetStatsTest(TestCase):
+    """Test cases for the incrementally maintained stats row"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.event = Event.objects.create(
+            name='Team A vs Team B',
+            start_time=timezone.now() + timedelta(hours=2),
+        )
+        self.user = User.objects.create_user(email='alice@example.com', password='testpass123')
+        Wallet.objects.create(user=self.user, balance=Decimal('1000.00'))
+
+    def _bet(self, bet_type=Bet.TEAM_A_WIN, stake='100.00', odds='2.00'):
+        return Bet.objects.create(
+            user=self.user,
+            event=self.event,
+            bet_type=bet_type,
+            stake=Decimal(stake),
+            odds=Decimal(odds),
+        )
+
+    def assertStatsMatchBetsTable(self):
+        stats = UserBetStats.objects.get(user=self.user)
+        expected = UserBetStats.compute([self.user.pk])[self.user.pk]
+        for field, value in expected.items():
+            self.assertEqual(getattr(stats, field), value, field)
+
+    def test_stats_follow_bet_lifecycle(self):
+        """Test placing, settling, cancelling and voiding update the row"""
+        won = self._bet()
+        lost = self._bet(stake='50.00')
+        cancelled = self._bet(stake='20.00')
+        voided = self._bet(stake='10.00')
+
+        won.mark_as_won()
+        lost.mark_as_lost()
+        cancelled.mark_as_cancelled()
+        voided.mark_as_void("Event abandoned")
+
+        self.assertStatsMatchBetsTable()
+        stats = Bet.get_user_stats(self.user)
+        self.assertEqual(stats['total_bets'], 4)
+        self.assertEqual(stats['pending_bets'], 0)
+        self.assertEqual(stats['won_bets'], 1)
+        self.assertEqual(stats['lost_bets'], 1)
+        self.assertEqual(stats['total_won'], Decimal('200.00'))
+        self.assertEqual(stats['win_rate'], 50.0)
+
+    def test_cancel_only_once(self):
+        """Test a second cancellation of the same bet fails and refunds nothing"""
+        bet = self._bet()
+        stale = Bet.objects.get(pk=bet.pk)
+        self.client.force_login(self.user)
+
+        self.client.post(f'/bets/cancel/{bet.pk}/')
+        with self.assertRaises(ValueError):
+            stale.mark_as_cancelled()
+        self.client.post(f'/bets/cancel/{bet.pk}/')
+
+        wallet = Wallet.objects.get(user=self.user)
+        refunds = wallet.transactions.filter(category=Transaction.REFUND)
+        self.assertEqual(Bet.objects.get(pk=bet.pk).status, Bet.CANCELLED)
+        self.assertEqual(refunds.count(), 1)
+        self.assertEqual(wallet.balance, Decimal('1100.00'))
+        self.assertStatsMatchBetsTable()
+
+    def test_stats_follow_bulk_settlement(self):
+        """Test bulk settlement applies the same deltas"""
+        self._bet()
+        self._bet(bet_type=Bet.DRAW, stake='30.00', odds='3.00')
+
+        BetSettlementService.settle_event(self.event, Bet.TEAM_A_WIN)
+
+        self.assertStatsMatchBetsTable()
+
+    def test_missing_row_is_rebuilt(self):
+        """Test stats are rebuilt from the bets table when the row is missing"""
+        self._bet()
+        UserBetStats.objects.all().delete()
+
+        stats = Bet.get_user_stats(self.user)
+
+        self.assertEqual(stats['total_bets'], 1)
+        self.assertEqual(stats['total_pending_stake'], Decimal('100.00'))
+
+
+class BetHistoryPaginationTest(TestCase):
+    """Test cases for keyset-paginated bet history"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(email='alice@example.com', password='testpass123')
+        Wallet.objects.create(user=self.user, balance=Decimal('1000.00'))
+        event = Event.objects.create(name='Team A vs Team B', start_time=timezone.now() + timedelta(hours=2))
+        self.bets = [
+            Bet.objects.create(
+                user=self.user,
+                event=event,
+                bet_type=Bet.TEAM_A_WIN,
+                stake=Decimal('10.00'),
+                odds=Decimal('2.00'),
+            )
+            for i in range(5)
+        ]
+        # Identical timestamps must still page in a stable order
+        Bet.objects.filter(pk__in=[bet.pk for bet in self.bets[1:4]]).update(placed_at=self.bets[0].placed_at)
+        self.client.force_login(self.user)
+
+    def test_pages_cover_every_bet_once(self):
+        """Test following next_cursor visits each bet exactly once, newest first"""
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get('/bets/api/history/', params).json()
+            self.assertTrue(data['success'])
+            seen.extend(bet['id'] for bet in data['bets'])
+            cursor = data['next_cursor']
+            if not data['has_next']:
+                break
+
+        expected = list(Bet.objects.filter(user=self.user).order_by('-placed_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is rejected"""
+        response = self.client.get('/bets/api/history/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_streams_filtered_rows(self):
+        """Test the export honours the history filters and streams NDJSON"""
+        Bet.objects.filter(pk=self.bets[0].pk).update(status=Bet.LOST)
+
+        response = self.client.get('/bets/history/export/', {'format': 'ndjson', 'status': Bet.LOST})
+
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn(f'"id": {self.bets[0].pk}', lines[0])
+
+
+class BetSlipServiceTest(TestCase):
+    """Test cases for placing a multi-bet slip"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(email='alice@example.com', password='testpass123')
+        self.wallet = Wallet.objects.create(user=self.user, balance=Decimal('100.00'))
+        start_time = timezone.now() + timedelta(hours=2)
+        self.event_1 = Event.objects.create(name='A vs B', start_time=start_time, odds_team_a=Decimal('2.50'))
+        self.event_2 = Event.objects.create(name='C vs D', start_time=start_time, odds_draw=Decimal('3.20'))
+        UserBetStats.rebuild_for_user(self.user.pk)
+
+    def test_place_slip(self):
+        """Test every selection is placed with one debit of the total stake"""
+        # Event lookup, bet insert, wallet update, ledger insert, stats update + savepoints
+        with self.assertNumQueries(9):
+            bets = BetSlipService.place_slip(self.user, [
+                {'event_id': self.event_1.pk, 'bet_type': Bet.TEAM_A_WIN, 'stake': '20.00'},
+                {'event_id': self.event_2.pk, 'bet_type': Bet.DRAW, 'stake': '30'},
+            ])
+
+        self.assertEqual(len(bets), 2)
+        self.assertEqual(bets[0].potential_payout, Decimal('50.00'))
+        self.assertEqual(bets[1].odds, Decimal('3.20'))
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('50.00'))
+        ledger = list(self.wallet.transactions.order_by('id'))
+        self.assertEqual([t.balance_after for t in ledger], [Decimal('80.00'), Decimal('50.00')])
+        self.assertEqual(Bet.get_user_stats(self.user)['pending_bets'], 2)
+
+    def test_slip_is_all_or_nothing(self):
+        """Test an unaffordable slip places nothing"""
+        with self.assertRaises(ValueError):
+            BetSlipService.place_slip(self.user, [
+                {'event_id': self.event_1.pk, 'bet_type': Bet.TEAM_A_WIN, 'stake': '60.00'},
+                {'event_id': self.event_2.pk, 'bet_type': Bet.DRAW, 'stake': '60.00'},
+            ])
+
+        self.assertFalse(Bet.objects.exists())
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('100.00'))
+
+    def test_slip_rejects_closed_event(self):
+        """Test a selection on a started event fails the whole slip"""
+        Event.objects.filter(pk=self.event_2.pk).update(status='live')
+
+        with self.assertRaisesMessage(ValueError, "Selection 2"):
+            BetSlipService.place_slip(self.user, [
+                {'event_id': self.event_1.pk, 'bet_type': Bet.TEAM_A_WIN, 'stake': '10.00'},
+                {'event_id': self.event_2.pk, 'bet_type': Bet.DRAW, 'stake': '10.00'},
+            ])
+
+
+class OddsCacheTest(TestCase):
+    """Test cases for cached payout quotes"""
+
+    def setUp(self):
+        """Set up test data"""
+        odds_cache.clear()
+        self.user = User.objects.create_user(email='alice@example.com', password='testpass123')
+        self.event = Event.objects.create(
+            name='Team A vs Team B',
+            start_time=timezone.now() + timedelta(hours=2),
+            odds_team_a=Decimal('2.00'),
+        )
+        self.client.force_login(self.user)
+
+    def _quote(self):
+        return self.client.get('/bets/api/calculate-payout/', {
+            'event_id': self.event.pk,
+            'bet_type': Bet.TEAM_A_WIN,
+            'stake': '10',
+        }).json()
+
+    def test_quotes_served_from_cache(self):
+        """Test repeat quotes do not query the events table"""
+        self._quote()
+        misses = odds_cache.stats()['misses']
+
+        with self.assertNumQueries(0):
+            cached = odds_cache.get(self.event.pk)
+        self.assertEqual(cached.odds_team_a, Decimal('2.00'))
+
+        data = self._quote()
+        self.assertEqual(data['potential_payout'], 20.0)
+        self.assertEqual(odds_cache.stats()['misses'], misses)
+
+    def test_save_invalidates_cached_odds(self):
+        """Test saving an event serves the new odds and version"""
+        first = self._quote()
+
+        self.event.odds_team_a = Decimal('3.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.save()
+
+        data = self._quote()
+        self.assertEqual(data['potential_payout'], 30.0)
+        self.assertEqual(data['odds_version'], first['odds_version'] + 1)
+
+    def test_save_bumps_version_in_sql(self):
+        """Test two saves from stale copies each get their own odds_version"""
+        other = Event.objects.get(pk=self.event.pk)
+
+        self.event.save()
+        other.save(update_fields=['odds_team_a'])
+
+        self.assertEqual(self.event.odds_version, 2)
+        self.assertEqual(other.odds_version, 3)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).odds_version, 3)
+
+    def test_invalidate_waits_for_commit(self):
+        """Test the cached entry survives until the save commits"""
+        odds_cache.get(self.event.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.event.save()
+            self.assertEqual(odds_cache.get(self.event.pk).odds_version, 1)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(odds_cache.get(self.event.pk).odds_version, 2)
+
+    def test_stale_read_not_cached_after_invalidate(self):
+        """Test a row read before a committed save is not stored again"""
+        stale = Event.objects.get(pk=self.event.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.save()
+
+        odds_cache.put(stale)
+
+        self.assertEqual(odds_cache.get(self.event.pk).odds_version, 2)
+
+    async def test_async_eligibility_and_stats(self):
+        """Test the async read endpoints under the async client"""
+        await Wallet.objects.acreate(user=self.user, balance=Decimal('75.00'))
+        await self.async_client.aforce_login(self.user)
+
+        data = (await self.async_client.get(f'/bets/api/check-eligibility/{self.event.pk}/')).json()
+        self.assertTrue(data['is_bettable'])
+        self.assertEqual(data['wallet_balance'], 75.0)
+
+        response = await self.async_client.get('/bets/api/check-eligibility/999999/')
+        self.assertEqual(response.status_code, 404)
+
+        data = (await self.async_client.get('/bets/api/stats/')).json()
+        self.assertEqual(data['stats']['total_bets'], 0)
+
+    def test_batch_quotes(self):
+        """Test every event x bet type x stake combination is priced in one call"""
+        other = Event.objects.create(
+            name='Team C vs Team D',
+            start_time=timezone.now() + timedelta(hours=2),
+            odds_draw=Decimal('3.50'),
+        )
+
+        data = self.client.get('/bets/api/quotes/', {
+            'event_ids': f'{self.event.pk},{other.pk},999999',
+            'bet_types': 'team_a_win,draw',
+            'stakes': '10,20.50',
+        }).json()
+
+        self.assertTrue(data['success'])
+        self.assertEqual(len(data['quotes']), 2 * 2 * 2)
+        self.assertEqual(data['missing_events'], [999999])
+        quotes = {tuple(row[:3]): row for row in data['quotes']}
+        self.assertEqual(quotes[(other.pk, 'draw', 20.5)][4], 71.75)
+        self.assertEqual(quotes[(self.event.pk, 'team_a_win', 10.0)][5], 10.0)
+
+    def test_batch_quotes_match_slip_checks(self):
+        """Test events closed to betting and odds below the minimum are not quoted"""
+        started = Event.objects.create(
+            name='Team E vs Team F',
+            start_time=timezone.now() - timedelta(minutes=5),
+        )
+        Event.objects.filter(pk=self.event.pk).update(odds_draw=Decimal('1.00'))
+
+        data = self.client.get('/bets/api/quotes/', {
+            'event_ids': f'{self.event.pk},{started.pk}',
+            'bet_types': 'team_a_win,draw',
+            'stakes': '10',
+        }).json()
+
+        self.assertEqual(data['quotes'], [[self.event.pk, 'team_a_win', 10.0, 2.0, 20.0, 10.0]])
+        self.assertEqual(data['closed_events'], [started.pk])
+        self.assertEqual(data['missing_events'], [])
+
+    def test_batch_quotes_clean_stakes(self):
+        """Test stakes are rounded to cents and out-of-range stakes are reported, not quoted"""
+        data = self.client.get('/bets/api/quotes/', {
+            'event_ids': str(self.event.pk),
+            'bet_types': 'team_a_win',
+            'stakes': '10.004,0.5,20000',
+        }).json()
+
+        self.assertTrue(data['success'])
+        self.assertEqual(data['quotes'], [[self.event.pk, 'team_a_win', 10.0, 2.0, 20.0, 10.0]])
+        self.assertEqual([error['stake'] for error in data['stake_errors']], ['0.5', '20000'])
+        self.assertIn('minimum stake is $1.00', data['stake_errors'][0]['error'])
+        self.assertIn('maximum stake is $10,000.00', data['stake_errors'][1]['error'])
+
+
+class HouseEdgeSimulationTest(TestCase):
+    """Test cases for the Monte Carlo house-edge command"""
+
+    def _simulate(self, **options):
+        import json
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command(
+            'simulate_house_edge', rounds=200000, workers=1, seed=1, json=True,
+            stdout=out, stderr=StringIO(), **options
+        )
+        return {result['bet']: result for result in json.loads(out.getvalue())['results']}
+
+    def test_event_margin(self):
+        """Test each selection returns one over the odds' overround"""
+        event = Event.objects.create(
+            name='Team A vs Team B',
+            start_time=timezone.now() + timedelta(hours=2),
+            odds_team_a=Decimal('1.90'),
+            odds_team_b=Decimal('4.20'),
+            odds_draw=Decimal('3.40'),
+        )
+
+        results = self._simulate(games='events')
+
+        expected = 1 / (1 / 1.90 + 1 / 4.20 + 1 / 3.40)
+        self.assertEqual(len(results), 3)
+        for result in results.values():
+            self.assertAlmostEqual(result['expected_rtp'], expected)
+            self.assertLess(abs(result['rtp'] - expected), 3 * result['rtp_ci95'])
+        self.assertIn(f'#{event.pk} team_a_win @1.9', results)
+
+    def test_events_without_odds_skipped(self):
+        """Test events with odds of 1 or less are skipped instead of dividing by zero"""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        event = Event.objects.create(
+            name='Team A vs Team B',
+            start_time=timezone.now() + timedelta(hours=2),
+            odds_draw=Decimal('0.00'),
+        )
+        err = StringIO()
+
+        with self.assertRaisesMessage(CommandError, "Nothing to simulate"):
+            call_command('simulate_house_edge', games='events', workers=1, json=True, stdout=StringIO(), stderr=err)
+        self.assertIn(f"Skipping event #{event.pk}", err.getvalue())
+
+    def test_session_rounds_capped(self):
+        """Test sessions longer than one chunk are refused"""
+        from django.core.management.base import CommandError
+        from apps.bets.management.commands.simulate_house_edge import CHUNK_ROUNDS
+
+        with self.assertRaisesMessage(CommandError, "--session-rounds can be at most"):
+            self._simulate(games='coin', session_rounds=CHUNK_ROUNDS + 1)
+
+    def test_coin_flip(self):
+        """Test the even-money coin flip has no edge and a ruin rate inside [0, 1]"""
+        result = self._simulate(games='coin', bankroll=10)['even money']
+
+        self.assertEqual(result['expected_rtp'], 1.0)
+        self.assertLess(abs(result['rtp'] - 1), 3 * result['rtp_ci95'])
+        self.assertAlmostEqual(result['volatility'], 1.0, places=3)
+        self.assertGreater(result['risk_of_ruin'], 0)
+        self.assertLess(result['final_bankroll']['p5'], result['final_bankroll']['p95'])
+
+    def test_dice_payouts(self):
+        """Test every dice bet type is simulated from the game's own payouts"""
+        results = self._simulate(games='dice')
+
+        self.assertEqual(set(results), {'SINGLE x6.00', 'EVEN x2.00', 'ODD x2.00', 'HIGH x2.00', 'LOW x2.00'})
+        for result in results.values():
+            self.assertAlmostEqual(result['expected_rtp'], 1.0)
+            self.assertLess(abs(result['rtp'] - 1), 3 * result['rtp_ci95'])
@@ -6,7 +6,9 @@ app_name = 'bets'
 urlpatterns = [
     # Main betting views
     path('place/<int:event_id>/', views.place_bet, name='place_bet'),
+    path('slip/', views.place_bet_slip, name='place_bet_slip'),
     path('history/', views.bet_history, name='history'),
+    path('history/export/', views.export_bets, name='export'),
     path('active/', views.active_bets, name='active_bets'),
     path('detail/<int:bet_id>/', views.bet_detail, name='detail'),
     
@@ -15,6 +17,9 @@ urlpatterns = [
     
     # API endpoints (for AJAX)
     path('api/calculate-payout/', views.calculate_payout_api, name='calculate_payout_api'),
+    path('api/quotes/', views.quote_payouts_api, name='quote_payouts_api'),
+    path('api/history/', views.bet_history_api, name='history_api'),
     path('api/stats/', views.bet_stats_api, name='stats_api'),
     path('api/check-eligibility/<int:event_id>/', views.check_bet_eligibility, name='check_eligibility'),
+    path('api/odds-cache/', views.odds_cache_stats_api, name='odds_cache_stats'),
 ]
@@ -1,24 +1,46 @@
+import json
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.db import transaction
+from django.views.decorators.http import require_http_methods
+from django.db import router, transaction
 from django.db.models import Sum, Q
 from decimal import Decimal
 from apps.events.models import Event
+from apps.events.services import odds_cache
+from apps.pagination import paginate_keyset, get_page_size, next_page_url
+from apps.db.routers import use_replica
+from apps.db.sharding import shard_for_user
+from apps.profiling import query_budget
+from apps.exports import EXPORT_FORMATS, BET_EXPORT_FIELDS, streaming_export_response
 from apps.wallet.models import Wallet, WalletManager
-from .models import Bet
+from .models import Bet, UserBetStats
 from .forms import PlaceBetForm, BetFilterForm
+from .services import BetSlipService, PayoutQuoteService
 
 
+def _get_client_ip(request):
+    """Client IP, preferring the first X-Forwarded-For hop"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0]
+    return request.META.get('REMOTE_ADDR')
+
+
+# First bet of a user also builds their UserBetStats row (~7 extra queries)
+@query_budget(22)
 @login_required
 def place_bet(request, event_id):
     """
     View for placing a bet on an event
     Integrates with Wallet app to deduct stake
     """
-    # Get the event
+    # Get the event; the fresh row also refreshes the odds cache
     event = get_object_or_404(Event, id=event_id)
+    odds_cache.put(event)
     
     # Get user's wallet
     wallet, created = Wallet.objects.get_or_create(user=request.user)
@@ -34,7 +56,7 @@ def place_bet(request, event_id):
         if form.is_valid():
             # Use atomic transaction to ensure wallet and bet are updated together
             try:
-                with transaction.atomic():
+                with transaction.atomic(using=router.db_for_write(Bet)):
                     # Get form data
                     bet_type = form.cleaned_data['bet_type']
                     stake = form.cleaned_data['stake']
@@ -60,11 +82,7 @@ def place_bet(request, event_id):
                     bet.potential_payout = stake * odds
                     
                     # Get user's IP address
-                    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-                    if x_forwarded_for:
-                        bet.ip_address = x_forwarded_for.split(',')[0]
-                    else:
-                        bet.ip_address = request.META.get('REMOTE_ADDR')
+                    bet.ip_address = _get_client_ip(request)
                     
                     bet.save()
                     
@@ -89,39 +107,88 @@ def place_bet(request, event_id):
     return render(request, 'bets/place_bet.html', context)
 
 
+def _filtered_user_bets(request):
+    """
+    User's bets narrowed by BetFilterForm
+    Returns: (queryset, filter_form)
+    """
+    bets = Bet.objects.filter(user=request.user).select_related('event')
+    
+    filter_form = BetFilterForm(request.GET)
+    return filter_form.filter_queryset(bets), filter_form
+
+
 @login_required
+@require_http_methods(["POST"])
+def place_bet_slip(request):
+    """
+    Place several bets in one request
+    Body: {"selections": [{"event_id": 1, "bet_type": "team_a_win", "stake": "10.00"}, ...]}
+    Either every selection is placed or none is
+    """
+    try:
+        selections = json.loads(request.body)['selections']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({
+            'success': False,
+            'error': 'Request body must be JSON with a "selections" list'
+        }, status=400)
+    
+    try:
+        bets = BetSlipService.place_slip(request.user, selections, _get_client_ip(request))
+    except Wallet.DoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'error': 'Wallet not found'
+        }, status=404)
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+    
+    total_stake = sum((bet.stake for bet in bets), Decimal('0.00'))
+    return JsonResponse({
+        'success': True,
+        'message': f'{len(bets)} bets placed for ${total_stake}',
+        'total_stake': float(total_stake),
+        'bets': [
+            {
+                'id': bet.id,
+                'event_id': bet.event_id,
+                'bet_type': bet.bet_type,
+                'stake': float(bet.stake),
+                'odds': float(bet.odds),
+                'potential_payout': float(bet.potential_payout),
+            }
+            for bet in bets
+        ],
+    })
+
+
+@login_required
+@use_replica
 def bet_history(request):
     """
-    Display user's betting history with filters
+    Display user's betting history with filters, one keyset page at a time
     """
     # Get user's wallet for stats
     wallet = get_object_or_404(Wallet, user=request.user)
     
-    # Get all user's bets
-    bets = Bet.objects.filter(user=request.user).select_related('event')
-    
-    # Apply filters
-    filter_form = BetFilterForm(request.GET)
-    if filter_form.is_valid():
-        status = filter_form.cleaned_data.get('status')
-        bet_type = filter_form.cleaned_data.get('bet_type')
-        date_from = filter_form.cleaned_data.get('date_from')
-        date_to = filter_form.cleaned_data.get('date_to')
-        
-        if status:
-            bets = bets.filter(status=status)
-        if bet_type:
-            bets = bets.filter(bet_type=bet_type)
-        if date_from:
-            bets = bets.filter(placed_at__gte=date_from)
-        if date_to:
-            bets = bets.filter(placed_at__lte=date_to)
+    # Get the requested page of the user's bets
+    bets, filter_form = _filtered_user_bets(request)
+    try:
+        page = paginate_keyset(bets, 'placed_at', request.GET.get('cursor'), get_page_size(request))
+    except ValueError:
+        page = paginate_keyset(bets, 'placed_at', None, get_page_size(request))
     
     # Get statistics
     stats = Bet.get_user_stats(request.user)
     
     context = {
-        'bets': bets,
+        'bets': page.items,
+        'page': page,
+        'next_page_url': next_page_url(request, page),
         'wallet': wallet,
         'filter_form': filter_form,
         'stats': stats,
@@ -130,6 +197,30 @@ def bet_history(request):
     return render(request, 'bets/bet_history.html', context)
 
 
+@login_required
+def export_bets(request):
+    """
+    Stream the user's bet history as CSV or NDJSON (?format=csv|ndjson)
+    Accepts the same filters as the history page
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({
+            'success': False,
+            'error': f'Unsupported export format: {export_format}'
+        }, status=400)
+    
+    bets, filter_form = _filtered_user_bets(request)
+    # The rows are read while streaming, after UserShardMiddleware has returned,
+    # so the queryset has to name the user's database itself
+    return streaming_export_response(
+        bets.using(shard_for_user(request.user)).order_by('-placed_at', '-id'),
+        BET_EXPORT_FIELDS,
+        export_format,
+        'bet-history'
+    )
+
+
 @login_required
 def bet_detail(request, bet_id):
     """
@@ -145,6 +236,7 @@ def bet_detail(request, bet_id):
     return render(request, 'bets/bet_detail.html', context)
 
 
+@query_budget(16)
 @login_required
 def cancel_bet(request, bet_id):
     """
@@ -161,21 +253,26 @@ def cancel_bet(request, bet_id):
         return redirect('bets:detail', bet_id=bet_id)
     
     try:
-        with transaction.atomic():
+        with transaction.atomic(using=router.db_for_write(Bet)):
+            # Mark bet as cancelled first: only one of two concurrent requests
+            # gets past the conditional UPDATE, so the stake is refunded once
+            bet.mark_as_cancelled()
+            
             # Refund the stake to wallet
-            success, message, wallet_transaction = WalletManager.process_bet_winning(
+            success, message, wallet_transaction = WalletManager.process_bet_refund(
                 user=request.user,
-                winning_amount=bet.stake,
+                refund_amount=bet.stake,
                 bet_id=bet.id
             )
             
-            if success:
-                # Mark bet as cancelled
-                bet.mark_as_cancelled()
-                messages.success(request, f'Bet cancelled. ${bet.stake} has been refunded to your wallet.')
-            else:
-                messages.error(request, f'Error refunding bet: {message}')
-                
+            if not success:
+                # Roll the cancellation back with the failed refund
+                raise RuntimeError(message)
+        
+        messages.success(request, f'Bet cancelled. ${bet.stake} has been refunded to your wallet.')
+    
+    except RuntimeError as e:
+        messages.error(request, f'Error refunding bet: {str(e)}')
     except Exception as e:
         messages.error(request, f'Error cancelling bet: {str(e)}')
     
@@ -213,7 +310,8 @@ def calculate_payout_api(request):
         bet_type = request.GET.get('bet_type')
         stake = Decimal(request.GET.get('stake', '0'))
         
-        event = Event.objects.get(id=event_id)
+        # Served from the odds cache; only a miss reaches the database
+        event = odds_cache.get(event_id)
         odds = event.get_odds_for_bet_type(bet_type) if hasattr(event, 'get_odds_for_bet_type') else Decimal('2.00')
         
         potential_payout = stake * odds
@@ -223,6 +321,7 @@ def calculate_payout_api(request):
             'success': True,
             'stake': float(stake),
             'odds': float(odds),
+            'odds_version': event.odds_version,
             'potential_payout': float(potential_payout),
             'profit': float(profit),
         })
@@ -234,12 +333,81 @@ def calculate_payout_api(request):
 
 
 @login_required
-def bet_stats_api(request):
+def bet_history_api(request):
+    """
+    API endpoint for paginated bet history
+    Pass the returned next_cursor back as ?cursor= to get the following page
+    """
+    bets, filter_form = _filtered_user_bets(request)
+    try:
+        page = paginate_keyset(bets, 'placed_at', request.GET.get('cursor'), get_page_size(request))
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+    
+    bets_data = []
+    for bet in page:
+        bets_data.append({
+            'id': bet.id,
+            'event': str(bet.event),
+            'event_id': bet.event_id,
+            'bet_type': bet.bet_type,
+            'stake': float(bet.stake),
+            'odds': float(bet.odds),
+            'potential_payout': float(bet.potential_payout),
+            'actual_payout': float(bet.actual_payout),
+            'status': bet.status,
+            'placed_at': bet.placed_at.isoformat(),
+            'settled_at': bet.settled_at.isoformat() if bet.settled_at else None,
+        })
+    
+    return JsonResponse({
+        'success': True,
+        'bets': bets_data,
+        'next_cursor': page.next_cursor,
+        'has_next': page.has_next,
+    })
+
+
+@login_required
+def quote_payouts_api(request):
+    """
+    API endpoint pricing many event x bet type x stake combinations at once
+    GET: ?event_ids=1,2&bet_types=team_a_win,draw&stakes=10,25
+    Returns quotes as compact rows described by 'columns'
+    """
+    def split(name):
+        return [value for value in request.GET.get(name, '').split(',') if value]
+    
+    try:
+        rows, missing, closed, stake_errors = PayoutQuoteService.quote(split('event_ids'), split('bet_types'), split('stakes'))
+    except (ValueError, ArithmeticError) as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'columns': PayoutQuoteService.QUOTE_COLUMNS,
+        'quotes': rows,
+        'missing_events': missing,
+        'closed_events': closed,
+        'stake_errors': stake_errors,
+    })
+
+
+@login_required
+async def bet_stats_api(request):
     """
     API endpoint to get user's betting statistics
+    Async view: reads the user's UserBetStats row without holding a worker thread
     """
     try:
-        stats = Bet.get_user_stats(request.user)
+        user = await request.auser()
+        stats = (await UserBetStats.aget_for_user(user)).as_dict()
         
         # Convert Decimal to float for JSON
         stats_json = {
@@ -259,13 +427,17 @@ def bet_stats_api(request):
 
 
 @login_required
-def check_bet_eligibility(request, event_id):
+async def check_bet_eligibility(request, event_id):
     """
     API endpoint to check if user can bet on an event
+    Async view: the event is usually an odds cache hit, then the wallet row is read
     """
     try:
-        event = Event.objects.get(id=event_id)
-        wallet = Wallet.objects.get(user=request.user)
+        user = await request.auser()
+        event = await sync_to_async(odds_cache.get)(event_id)
+        wallet = await Wallet.objects.filter(user_id=user.pk).afirst()
+        if wallet is None:
+            raise Wallet.DoesNotExist
         
         is_bettable = event.is_bettable() if hasattr(event, 'is_bettable') else True
         
@@ -285,3 +457,14 @@ def check_bet_eligibility(request, event_id):
             'success': False,
             'error': 'Wallet not found'
         }, status=404)
+
+
+@staff_member_required
+def odds_cache_stats_api(request):
+    """
+    API endpoint exposing odds cache hit/miss counters for this worker process
+    """
+    return JsonResponse({
+        'success': True,
+        'odds_cache': odds_cache.stats(),
+    })
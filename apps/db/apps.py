@@ -0,0 +1,20 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+
+class DbConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.db'
+
+    def ready(self):
+        from .sharding import catalog_models, mirror_deleted, mirror_saved, reserve_id_ranges
+
+        for model in catalog_models():
+            post_save.connect(mirror_saved, sender=model, dispatch_uid=f'shard_mirror_save_{model._meta.label_lower}')
+            post_delete.connect(mirror_deleted, sender=model, dispatch_uid=f'shard_mirror_delete_{model._meta.label_lower}')
+        post_migrate.connect(reserve_id_ranges, dispatch_uid='shard_reserve_id_ranges')
+
+        # Per-request SQL profiling, in every thread that opens a connection
+        from apps.profiling import install_query_recorder
+        connection_created.connect(install_query_recorder, dispatch_uid='sql_profiling_recorder')
@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from apps.db.sharding import catalog_models, mirror_rows, move_user, shard_databases
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy users and events to every shard, then move users off default and any "
+        "--drain alias and even out the number of users per shard. "
+        "With --user and --to, move a single user instead"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drain', action='append', default=[], help="Alias to empty (repeatable)")
+        parser.add_argument('--user', help="Email of a single user to move")
+        parser.add_argument('--to', help="Target alias for --user")
+        parser.add_argument('--tolerance', type=int, default=1, help="Allowed difference in users per shard")
+        parser.add_argument('--limit', type=int, help="Move at most this many users")
+        parser.add_argument('--skip-catalog', action='store_true', help="Do not re-copy users and events first")
+        parser.add_argument('--dry-run', action='store_true', help="Print the moves without making them")
+
+    def handle(self, *args, **options):
+        aliases = shard_databases()
+        if not aliases:
+            raise CommandError("SHARD_DATABASES is empty; there is nothing to rebalance")
+        unknown = [alias for alias in aliases + options['drain'] if alias not in settings.DATABASES]
+        if unknown:
+            raise CommandError(f"Unknown database aliases: {', '.join(unknown)}")
+
+        if not options['skip_catalog'] and not options['dry_run']:
+            for model in catalog_models():
+                count = mirror_rows(model)
+                self.stdout.write(f"Copied {count} {model._meta.verbose_name_plural} to every shard")
+
+        if options['user']:
+            if options['to'] not in aliases:
+                raise CommandError("--user needs --to with one of: " + ', '.join(aliases))
+            try:
+                user = get_user_model()._base_manager.get(email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user with email {options['user']}")
+            moves = [(user, options['to'])]
+        else:
+            targets = [alias for alias in aliases if alias not in options['drain']]
+            if not targets:
+                raise CommandError("Every shard is being drained")
+            moves = self._plan(targets, options['tolerance'])
+
+        if options['limit'] is not None:
+            moves = moves[:options['limit']]
+
+        for user, target in moves:
+            source = user.shard or DEFAULT_DB_ALIAS
+            if options['dry_run']:
+                self.stdout.write(f"Would move {user.email} from {source} to {target}")
+                continue
+            moved = move_user(user, target)
+            details = ', '.join(f"{count} {label}" for label, count in moved.items()) or "no rows"
+            self.stdout.write(f"Moved {user.email} from {source} to {target} ({details})")
+
+        action = "Would move" if options['dry_run'] else "Moved"
+        self.stdout.write(self.style.SUCCESS(f"{action} {len(moves)} users"))
+
+    def _plan(self, targets, tolerance):
+        """
+        Returns: [(user, target alias)] placing users who are not on a target,
+        then shifting the newest users from the fullest to the emptiest shard
+        """
+        counts = dict.fromkeys(targets, 0)
+        on_shard = {alias: [] for alias in targets}
+        homeless = []
+        users = get_user_model()._base_manager.order_by('pk')
+        for user in users.iterator():
+            if user.shard in counts:
+                counts[user.shard] += 1
+                on_shard[user.shard].append(user)
+            elif (user.shard or DEFAULT_DB_ALIAS) in settings.DATABASES:
+                homeless.append(user)
+            else:
+                self.stderr.write(self.style.WARNING(
+                    f"Skipping {user.email}: its shard {user.shard} is no longer configured"
+                ))
+
+        moves = []
+        for user in homeless:
+            target = min(targets, key=counts.get)
+            counts[target] += 1
+            moves.append((user, target))
+
+        while True:
+            fullest = max(targets, key=counts.get)
+            emptiest = min(targets, key=counts.get)
+            if counts[fullest] - counts[emptiest] <= max(tolerance, 1) or not on_shard[fullest]:
+                break
+            user = on_shard[fullest].pop()
+            counts[fullest] -= 1
+            counts[emptiest] += 1
+            moves.append((user, emptiest))
+        return moves
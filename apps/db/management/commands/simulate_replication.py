@@ -0,0 +1,76 @@
+import collections
+import os
+import sqlite3
+import tempfile
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Feed a local SQLite replica from the primary with a configurable lag. "
+        "Every --interval seconds the primary is snapshotted with the SQLite "
+        "backup API; each snapshot is copied over the replica --lag seconds later"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--replica', default=None, help="Replica alias (defaults to REPLICA_DATABASE)")
+        parser.add_argument('--lag', type=float, default=2.0, help="Seconds a snapshot waits before it is applied")
+        parser.add_argument('--interval', type=float, default=0.5, help="Seconds between snapshots")
+        parser.add_argument('--once', action='store_true', help="Copy the primary once, with no lag, and exit")
+
+    def handle(self, *args, **options):
+        alias = options['replica'] or getattr(settings, 'REPLICA_DATABASE', None) or 'replica'
+        if alias not in settings.DATABASES:
+            raise CommandError(f"Database alias '{alias}' is not configured")
+
+        primary = self._sqlite_path(DEFAULT_DB_ALIAS)
+        replica = self._sqlite_path(alias)
+        if primary == replica:
+            raise CommandError("Primary and replica point at the same file")
+
+        if options['once']:
+            self._copy(primary, replica)
+            self.stdout.write(self.style.SUCCESS(f"Copied {primary} to {replica}"))
+            return
+
+        pending = collections.deque()
+        directory = tempfile.mkdtemp(prefix='replica-')
+        self.stdout.write(f"Replicating {primary} -> {replica} with {options['lag']}s lag (Ctrl+C to stop)")
+        try:
+            while True:
+                snapshot = os.path.join(directory, f'{time.monotonic_ns()}.sqlite3')
+                self._copy(primary, snapshot)
+                pending.append((time.monotonic() + options['lag'], snapshot))
+
+                while pending and pending[0][0] <= time.monotonic():
+                    due, path = pending.popleft()
+                    self._copy(path, replica)
+                    os.remove(path)
+
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped")
+        finally:
+            for due, path in pending:
+                os.remove(path)
+            os.rmdir(directory)
+
+    def _sqlite_path(self, alias):
+        database = settings.DATABASES[alias]
+        if 'sqlite3' not in database['ENGINE']:
+            raise CommandError(f"'{alias}' is not a SQLite database; use real replication instead")
+        return str(database['NAME'])
+
+    @staticmethod
+    def _copy(source, target):
+        """Consistent page-level copy; readers of the target just see the old or new state"""
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(target, timeout=30)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
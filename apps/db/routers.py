@@ -0,0 +1,223 @@
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpRequest
+from .sharding import ShardRoutingError, current_shard, is_sharded, on_shard, shard_for_user, sharding_enabled
+
+# Cookie holding the time until which a client's reads stay on the primary
+PIN_COOKIE = 'primary_pin'
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def replica_alias():
+    """Configured replica alias, or None when reporting reads should stay on the primary"""
+    alias = getattr(settings, 'REPLICA_DATABASE', None)
+    if alias and alias in settings.DATABASES:
+        return alias
+    return None
+
+
+@contextmanager
+def replica_reads():
+    """Send reads made inside the block to the replica"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def use_replica(func):
+    """
+    Run a view or function with replica_reads
+    Views skip the replica for clients whose primary_pin cookie is still
+    valid, so a user who just placed a bet sees it in their history despite
+    replication lag
+    """
+    def pinned(args):
+        request = next((arg for arg in args if isinstance(arg, HttpRequest)), None)
+        return request is not None and is_pinned(request)
+
+    if iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if pinned(args):
+                return await func(*args, **kwargs)
+            with replica_reads():
+                return await func(*args, **kwargs)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if pinned(args):
+                return func(*args, **kwargs)
+            with replica_reads():
+                return func(*args, **kwargs)
+    return wrapper
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReplicaRouter:
+    """
+    Reads inside replica_reads go to settings.REPLICA_DATABASE; everything
+    else, every write, and any read inside a primary transaction stays on
+    the default database
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in (DEFAULT_DB_ALIAS, alias):
+            # Related rows come from where the instance came from, unless it lives on a shard
+            return instance._state.db
+        if alias is None or not _replica_reads.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Read-after-write inside a transaction must see its own rows
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == replica_alias():
+            # The replica receives its schema from the primary
+            return False
+        return None
+
+
+class ShardRouter:
+    """
+    Sends the rows in apps.db.sharding.SHARDED_MODELS to their user's shard:
+    the database of an instance hint, the shard of a user hint (user.bets,
+    user.wallet), or else the shard set by on_shard() / UserShardMiddleware.
+    Returns None for everything else, and for everything while sharding is
+    off, so list it before ReplicaRouter
+    """
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def _route(self, model, hints):
+        if not sharding_enabled() or not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        if instance is not None:
+            if is_sharded(instance.__class__) and instance._state.db:
+                return instance._state.db
+            if isinstance(instance, get_user_model()):
+                return shard_for_user(instance)
+        alias = current_shard()
+        if alias is None:
+            raise ShardRoutingError(
+                f"No shard to route {model._meta.label} to; use "
+                f"{model.__name__}.objects.for_user(user) or wrap the code in on_shard(alias)"
+            )
+        return alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not sharding_enabled():
+            return None
+        sharded1, sharded2 = is_sharded(obj1.__class__), is_sharded(obj2.__class__)
+        if sharded1 and sharded2:
+            return obj1._state.db == obj2._state.db
+        if sharded1 or sharded2:
+            # Users and events are mirrored to every shard
+            return True
+        return None
+
+
+class UserShardMiddleware:
+    """
+    Route the request's sharded queries to the logged-in user's shard
+    Place after AuthenticationMiddleware; request.user is only loaded if a
+    sharded model is actually used
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with on_shard(lambda: self._shard(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with on_shard(lambda: self._shard(request)):
+            return await self.get_response(request)
+
+    @staticmethod
+    def _shard(request):
+        user = request.user
+        return shard_for_user(user) if user.is_authenticated else None
+
+
+class ReadAfterWriteMiddleware:
+    """
+    After any unsafe request, pin the client to the primary for
+    REPLICA_PIN_SECONDS via a cookie, so its next reads can't hit a replica
+    that hasn't caught up yet
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self._pin(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._pin(request, await self.get_response(request))
+
+    def _pin(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and replica_alias():
+            seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+            response.set_cookie(PIN_COOKIE, f"{time.time() + seconds:.3f}", max_age=seconds, httponly=True)
+        return response
+
+
+class ReplicaChangeListMixin:
+    """ModelAdmin mixin that serves changelist pages from the replica"""
+
+    def changelist_view(self, request, extra_context=None):
+        with replica_reads():
+            response = super().changelist_view(request, extra_context)
+            # Render now so queries made by the template also hit the replica
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            return response
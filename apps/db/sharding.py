@@ -0,0 +1,263 @@
+"""
+User sharding across several database aliases
+
+Every row that belongs to one user (wallet, ledger, bets, stats) lives on the
+alias named by that user's CustomUser.shard. Users and events are the catalog:
+default is authoritative for them and every save is mirrored to each shard, so
+shard-local joins such as bet -> event or transaction -> user keep working.
+With settings.SHARD_DATABASES empty nothing is sharded and all rows stay on
+default, which is also where users registered before sharding keep their data
+until rebalance_shards moves them.
+"""
+import contextvars
+from contextlib import contextmanager
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models import Count
+
+# Models whose rows follow their user, with the lookup from each to that user.
+SHARDED_MODELS = {
+    'wallet.wallet': 'user',
+    'wallet.transaction': 'wallet__user',
+    'bets.bet': 'user',
+    'bets.userbetstats': 'user',
+    'game.dicegame': 'user',
+    'game.gamestats': 'user',
+}
+
+# Models kept on default and mirrored to every shard
+CATALOG_MODELS = (settings.AUTH_USER_MODEL, 'events.Event')
+
+# Each shard allocates primary keys from its own block, so ids stay unique
+# across shards and move_user can copy rows without renumbering them
+ID_RANGE = 2 ** 40
+
+_current_shard = contextvars.ContextVar('current_shard', default=None)
+
+
+class ShardRoutingError(Exception):
+    """A sharded model was used with no user, instance or on_shard() to route it by"""
+
+
+def shard_databases():
+    """Aliases new users are spread over; empty means sharding is off"""
+    return list(getattr(settings, 'SHARD_DATABASES', None) or [])
+
+
+def sharding_enabled():
+    return bool(shard_databases())
+
+
+def shard_aliases():
+    """Every alias that may hold sharded rows, default included"""
+    return list(dict.fromkeys([DEFAULT_DB_ALIAS, *shard_databases()]))
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def sharded_models():
+    """Installed sharded models, parents before children (INSTALLED_APPS order)"""
+    return [model for model in apps.get_models() if is_sharded(model)]
+
+
+def catalog_models():
+    return [apps.get_model(label) for label in CATALOG_MODELS]
+
+
+def shard_for_user(user):
+    """Alias holding the user's rows"""
+    if not sharding_enabled():
+        return DEFAULT_DB_ALIAS
+    alias = getattr(user, 'shard', '') or DEFAULT_DB_ALIAS
+    if alias not in settings.DATABASES:
+        raise ShardRoutingError(f"User {user.pk} is on unknown database {alias!r}")
+    return alias
+
+
+def assign_shard():
+    """
+    Shard for a newly registered user
+    Returns: the alias with the fewest users, or '' while sharding is off
+    """
+    aliases = shard_databases()
+    if not aliases:
+        return ''
+    user_model = apps.get_model(settings.AUTH_USER_MODEL)
+    counts = dict(
+        user_model._base_manager.using(DEFAULT_DB_ALIAS)
+        .filter(shard__in=aliases)
+        .order_by()
+        .values_list('shard')
+        .annotate(count=Count('pk'))
+    )
+    return min(aliases, key=lambda alias: counts.get(alias, 0))
+
+
+@contextmanager
+def on_shard(alias):
+    """
+    Route sharded queries that carry no user or instance hint to alias
+    alias may also be a callable, resolved on each query; UserShardMiddleware
+    passes one so request.user is only loaded if a sharded model is used
+    """
+    token = _current_shard.set(alias)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+def current_shard():
+    """Alias set by the innermost on_shard(), or None"""
+    alias = _current_shard.get()
+    return alias() if callable(alias) else alias
+
+
+class ShardedQuerySet(models.QuerySet):
+
+    def for_user(self, user):
+        """The user's rows, read from the user's shard"""
+        lookup = SHARDED_MODELS[self.model._meta.label_lower]
+        return self.using(shard_for_user(user)).filter(**{lookup: user})
+
+    def on_each_shard(self):
+        """This queryset once per alias in shard_aliases(), for reports and maintenance"""
+        return [self.using(alias) for alias in shard_aliases()]
+
+
+class ShardedManager(models.Manager.from_queryset(ShardedQuerySet)):
+    """Default manager of the models in SHARDED_MODELS"""
+
+
+# Catalog mirroring
+
+def mirror_instance(instance):
+    """Upsert a saved catalog row into every shard"""
+    for alias in shard_databases():
+        if alias == DEFAULT_DB_ALIAS:
+            continue
+        # raw keeps auto_now timestamps and skips save() overrides such as Event's odds bump
+        type(instance).save_base(type(instance)(**_field_values(instance)), using=alias, raw=True)
+
+
+def mirror_rows(model, pks=None):
+    """
+    Copy catalog rows from default to every shard, e.g. after a queryset
+    update() that bypassed save(), or to fill a newly added shard
+    Returns: number of rows copied
+    """
+    if not [alias for alias in shard_databases() if alias != DEFAULT_DB_ALIAS]:
+        return 0
+    rows = model._base_manager.using(DEFAULT_DB_ALIAS).order_by('pk')
+    if pks is not None:
+        rows = rows.filter(pk__in=pks)
+    count = 0
+    for instance in rows.iterator(chunk_size=2000):
+        mirror_instance(instance)
+        count += 1
+    return count
+
+
+def _field_values(instance):
+    return {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+
+
+def mirror_saved(sender, instance, using, **kwargs):
+    """post_save receiver for CATALOG_MODELS"""
+    # Saves made by the mirror itself arrive with using set to a shard
+    if using == DEFAULT_DB_ALIAS and sharding_enabled():
+        if any(hasattr(value, 'resolve_expression') for value in _field_values(instance).values()):
+            # Saved with F() expressions, e.g. Event's odds bump; copy the stored row instead
+            instance = sender._base_manager.using(DEFAULT_DB_ALIAS).get(pk=instance.pk)
+        mirror_instance(instance)
+
+
+def mirror_deleted(sender, instance, using, **kwargs):
+    """post_delete receiver for CATALOG_MODELS; the delete cascades to the user's rows on each shard"""
+    if using != DEFAULT_DB_ALIAS or not sharding_enabled():
+        return
+    for alias in shard_databases():
+        if alias != DEFAULT_DB_ALIAS:
+            sender._base_manager.using(alias).filter(pk=instance.pk).delete()
+
+
+def reserve_id_range(alias):
+    """
+    Start the sharded tables on alias at its own ID_RANGE block
+    Uses SQLite's AUTOINCREMENT counters, so it only raises them; safe to
+    run after every migrate. Aliases must keep their position in SHARD_DATABASES
+    """
+    aliases = shard_databases()
+    if alias not in aliases or alias == DEFAULT_DB_ALIAS:
+        return
+    connection = connections[alias]
+    if connection.vendor != 'sqlite':
+        return
+    start = (aliases.index(alias) + 1) * ID_RANGE
+    existing = set(connection.introspection.table_names())
+    with connection.cursor() as cursor:
+        for model in sharded_models():
+            table = model._meta.db_table
+            if table not in existing:
+                continue
+            cursor.execute(
+                "UPDATE sqlite_sequence SET seq = %s WHERE name = %s AND seq < %s",
+                [start, table, start]
+            )
+            cursor.execute(
+                "INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s "
+                "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)",
+                [table, start, table]
+            )
+
+
+def reserve_id_ranges(sender, using, **kwargs):
+    """post_migrate receiver"""
+    reserve_id_range(using)
+
+
+# Rebalancing
+
+def move_user(user, target):
+    """
+    Move every sharded row of a user to target and point user.shard at it
+    The source is write-locked from the copy until the old rows are deleted,
+    so no write can land there mid-move; rows left on target by an
+    interrupted move are cleared first, so a failed move can simply be retried
+    Returns: {model label: rows moved}
+    """
+    source = shard_for_user(user)
+    if target == source:
+        if user.shard != target:
+            # Pre-sharding user whose rows are already on target (default)
+            user.shard = target
+            user.save(update_fields=['shard'])
+        return {}
+    if target not in shard_aliases():
+        raise ShardRoutingError(f"{target!r} is not in SHARD_DATABASES")
+
+    models_to_move = sharded_models()
+    moved = {}
+    with transaction.atomic(using=source):
+        with transaction.atomic(using=target):
+            for model in reversed(models_to_move):
+                _user_rows(model, target, user).delete()
+            for model in models_to_move:
+                rows = list(_user_rows(model, source, user))
+                for row in rows:
+                    model.save_base(row, using=target, raw=True, force_insert=True)
+                moved[model._meta.label] = len(rows)
+
+        user.shard = target
+        user.save(update_fields=['shard'])
+
+        for model in reversed(models_to_move):
+            _user_rows(model, source, user).delete()
+    return moved
+
+
+def _user_rows(model, alias, user):
+    return model._base_manager.using(alias).filter(**{SHARDED_MODELS[model._meta.label_lower]: user.pk}).order_by('pk')
@@ -0,0 +1,164 @@
+"""
+SQLite backend tuned for concurrent web traffic
+
+Use it as the ENGINE `apps.db.sqlite3`. Extra OPTIONS, on top of everything
+the stock backend accepts:
+
+    journal_mode      PRAGMA journal_mode, default 'WAL' (readers never block the writer)
+    synchronous       PRAGMA synchronous, default 'NORMAL' (safe with WAL, far fewer fsyncs)
+    busy_timeout      PRAGMA busy_timeout in ms, default 5000
+    lock_retries      extra attempts with backoff after SQLite gives up on a lock, default 5
+    serialize_writes  funnel this process's write transactions through one lock, default False
+
+Transactions (atomic blocks) start with BEGIN IMMEDIATE, so each one takes
+the write lock up front. A deferred transaction that reads first and writes
+later fails with "database is locked" without waiting whenever another
+connection got there first. That is the read-then-write pattern behind
+get_or_create and select_for_update, which SQLite silently ignores.
+"""
+import random
+import threading
+import time
+from django.db.backends.sqlite3 import base
+
+Database = base.Database
+
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+# One lock per database file, shared by every connection in the process
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+
+
+def _write_lock(name):
+    with _write_locks_guard:
+        return _write_locks.setdefault(str(name), threading.Lock())
+
+
+def is_locked_error(error):
+    message = str(error)
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    custom_options = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'lock_retries': 5,
+        'serialize_writes': False,
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._holds_write_lock = False
+
+    def get_connection_params(self):
+        options = self.settings_dict['OPTIONS']
+        self.tuning = {
+            key: options.get(key, default) for key, default in self.custom_options.items()
+        }
+        self.write_lock = _write_lock(self.settings_dict['NAME']) if self.tuning['serialize_writes'] else None
+
+        kwargs = super().get_connection_params()
+        for key in self.custom_options:
+            kwargs.pop(key, None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.tuning['busy_timeout'])}")
+        if not self.is_in_memory_db():
+            conn.execute(f"PRAGMA journal_mode = {self.tuning['journal_mode']}")
+        conn.execute(f"PRAGMA synchronous = {self.tuning['synchronous']}")
+        return conn
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=RetryingCursorWrapper)
+        cursor.connection_wrapper = self
+        return cursor
+
+    def with_lock_retries(self, func, *args):
+        """
+        Call func, retrying with jittered exponential backoff while SQLite
+        reports the database as locked. Only call this for statements that are
+        safe to repeat: BEGIN, or a single statement in autocommit mode
+        """
+        delay = 0.01
+        for attempt in range(int(self.tuning['lock_retries']) + 1):
+            try:
+                return func(*args)
+            except Database.OperationalError as e:
+                if not is_locked_error(e) or attempt == self.tuning['lock_retries']:
+                    raise
+            time.sleep(delay * (1 + random.random()))
+            delay = min(delay * 2, 0.5)
+
+    def acquire_write_lock(self):
+        if self.write_lock is not None and not self._holds_write_lock:
+            self.write_lock.acquire()
+            self._holds_write_lock = True
+
+    def release_write_lock(self):
+        if self._holds_write_lock:
+            self._holds_write_lock = False
+            self.write_lock.release()
+
+    def _start_transaction_under_autocommit(self):
+        """BEGIN IMMEDIATE (unless OPTIONS['transaction_mode'] says otherwise), retried while locked"""
+        mode = self.transaction_mode or 'IMMEDIATE'
+        self.acquire_write_lock()
+        try:
+            self.with_lock_retries(self.connection.execute, f"BEGIN {mode}")
+        except Exception:
+            self.release_write_lock()
+            raise
+
+    def _commit(self):
+        try:
+            super()._commit()
+        finally:
+            if self.connection is None or not self.connection.in_transaction:
+                self.release_write_lock()
+
+    def _rollback(self):
+        try:
+            super()._rollback()
+        finally:
+            self.release_write_lock()
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.release_write_lock()
+
+
+class RetryingCursorWrapper(base.SQLiteCursorWrapper):
+    """
+    Retries locked autocommit writes and, with serialize_writes, runs them
+    under the process-wide write lock. Statements inside a transaction are
+    never retried here: the transaction already holds the write lock from
+    BEGIN IMMEDIATE
+    """
+
+    def execute(self, query, params=None):
+        return self._run(super().execute, query, params)
+
+    def executemany(self, query, param_list):
+        return self._run(super().executemany, query, param_list)
+
+    def _run(self, method, query, params):
+        wrapper = self.connection_wrapper
+        if not wrapper.autocommit or wrapper.in_atomic_block:
+            return method(query, params)
+        if not query.lstrip()[:7].upper().startswith(WRITE_PREFIXES):
+            return method(query, params)
+
+        if wrapper.write_lock is None or wrapper._holds_write_lock:
+            return wrapper.with_lock_retries(method, query, params)
+        wrapper.acquire_write_lock()
+        try:
+            return wrapper.with_lock_retries(method, query, params)
+        finally:
+            wrapper.release_write_lock()
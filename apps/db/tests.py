@@ -0,0 +1,302 @@
+import copy
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from apps.bets.models import Bet, UserBetStats
+from apps.bets.services import BetSettlementService, BetSlipService
+from apps.events.models import Event
+from apps.game.models import DiceGame, GameStats
+from apps.wallet.models import Wallet, Transaction
+from .routers import PIN_COOKIE, ReadAfterWriteMiddleware, ReplicaRouter, replica_reads, use_replica
+from .sharding import ID_RANGE, ShardRoutingError, move_user, reserve_id_range
+
+
+class TunedSQLiteBackendTest(unittest.TestCase):
+    """Test cases for the apps.db.sqlite3 backend on a scratch database file"""
+    
+    alias = 'tuned_sqlite_test'
+    
+    def setUp(self):
+        """Point a throwaway alias at a temporary file"""
+        self.directory = tempfile.TemporaryDirectory()
+        settings_dict = copy.deepcopy(connections.settings['default'])
+        settings_dict.update({
+            'ENGINE': 'apps.db.sqlite3',
+            'NAME': os.path.join(self.directory.name, 'test.sqlite3'),
+            'OPTIONS': {'serialize_writes': True},
+        })
+        connections.settings[self.alias] = settings_dict
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute("CREATE TABLE counters (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)")
+            cursor.execute("INSERT INTO counters (id, value) VALUES (1, 0)")
+    
+    def tearDown(self):
+        connections[self.alias].close()
+        del connections[self.alias]
+        del connections.settings[self.alias]
+        self.directory.cleanup()
+    
+    def test_pragmas(self):
+        """Test WAL and the busy timeout are set on new connections"""
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+    
+    def test_concurrent_read_then_write(self):
+        """Test read-then-write transactions from many threads neither fail nor lose updates"""
+        errors = []
+        
+        def increment():
+            connection = connections[self.alias]
+            try:
+                for _ in range(20):
+                    with transaction.atomic(using=self.alias):
+                        with connection.cursor() as cursor:
+                            cursor.execute("SELECT value FROM counters WHERE id = 1")
+                            value = cursor.fetchone()[0]
+                            cursor.execute("UPDATE counters SET value = %s WHERE id = 1", [value + 1])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=increment) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute("SELECT value FROM counters WHERE id = 1")
+            self.assertEqual(cursor.fetchone()[0], 160)
+        self.assertFalse(connections[self.alias].write_lock.locked())
+
+
+@override_settings(REPLICA_DATABASE='replica')
+class ReplicaRouterTest(TestCase):
+    """Test cases for routing reporting reads to the replica"""
+    
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.model = get_user_model()
+    
+    def test_reads_default_outside_replica_context(self):
+        """Test ordinary reads stay on the primary"""
+        self.assertEqual(self.router.db_for_read(self.model), 'default')
+    
+    def test_reads_replica_inside_context(self):
+        """Test reads inside replica_reads go to the replica, writes never do"""
+        # TestCase wraps each test in a transaction; read outside it
+        connection = connections['default']
+        in_atomic = connection.in_atomic_block
+        connection.in_atomic_block = False
+        try:
+            with replica_reads():
+                self.assertEqual(self.router.db_for_read(self.model), 'replica')
+                self.assertEqual(self.router.db_for_write(self.model), 'default')
+        finally:
+            connection.in_atomic_block = in_atomic
+    
+    def test_reads_primary_inside_transaction(self):
+        """Test a read inside a primary transaction sees its own writes"""
+        with transaction.atomic(), replica_reads():
+            self.assertEqual(self.router.db_for_read(self.model), 'default')
+    
+    @override_settings(REPLICA_DATABASE=None)
+    def test_disabled_without_replica(self):
+        """Test nothing is routed to the replica when none is configured"""
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(self.model), 'default')
+    
+    def test_replica_not_migrated(self):
+        """Test migrations skip the replica"""
+        self.assertFalse(self.router.allow_migrate('replica', 'bets'))
+        self.assertIsNone(self.router.allow_migrate('default', 'bets'))
+
+
+@override_settings(REPLICA_DATABASE='replica', REPLICA_PIN_SECONDS=5)
+class ReadAfterWriteTest(SimpleTestCase):
+    """Test cases for pinning clients to the primary after a write"""
+    
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = ReadAfterWriteMiddleware(lambda request: self._response())
+    
+    def _response(self):
+        from django.http import HttpResponse
+        return HttpResponse()
+    
+    def test_write_sets_pin_cookie(self):
+        """Test a POST pins the client and a GET does not"""
+        response = self.middleware(self.factory.post('/bets/place/1/'))
+        self.assertGreater(float(response.cookies[PIN_COOKIE].value), time.time())
+        response = self.middleware(self.factory.get('/bets/history/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+    
+    def test_pinned_request_skips_replica(self):
+        """Test use_replica only routes reads for unpinned clients"""
+        from apps.db.routers import _replica_reads
+        
+        @use_replica
+        def view(request):
+            return _replica_reads.get()
+        
+        self.assertTrue(view(self.factory.get('/')))
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = str(time.time() + 5)
+        self.assertFalse(view(request))
+
+
+class ShardingTest(unittest.TestCase):
+    """
+    Test cases for user sharding over two scratch SQLite shards
+    Django's TestCase only allows aliases known at class setup, so default is
+    rolled back by hand instead
+    """
+    
+    aliases = ['shard_test_0', 'shard_test_1']
+    
+    def setUp(self):
+        """Give each shard a temporary file with the full schema"""
+        shard_settings = override_settings(SHARD_DATABASES=self.aliases)
+        shard_settings.enable()
+        self.addCleanup(shard_settings.disable)
+        self.atomic = transaction.atomic()
+        self.atomic.__enter__()
+        self.directory = tempfile.TemporaryDirectory()
+        for alias in self.aliases:
+            settings_dict = copy.deepcopy(connections.settings['default'])
+            settings_dict.update({
+                'ENGINE': 'apps.db.sqlite3',
+                'NAME': os.path.join(self.directory.name, f'{alias}.sqlite3'),
+                'TEST': {'NAME': os.path.join(self.directory.name, f'{alias}.sqlite3')},
+            })
+            connections.settings[alias] = settings_dict
+            with connections[alias].schema_editor() as editor:
+                for model in (get_user_model(), Event, Wallet, Transaction, Bet, UserBetStats, DiceGame, GameStats):
+                    editor.create_model(model)
+            reserve_id_range(alias)
+        
+        self.event = Event.objects.create(
+            name='Test Match',
+            start_time=timezone.now() + timedelta(days=1)
+        )
+        self.users = [
+            get_user_model().objects.create_user(email=f'shard{i}@example.com', password='testpass123')
+            for i in range(2)
+        ]
+        for user in self.users:
+            Wallet.objects.for_user(user).create(user=user)
+    
+    def tearDown(self):
+        transaction.set_rollback(True)
+        self.atomic.__exit__(None, None, None)
+        for alias in self.aliases:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        self.directory.cleanup()
+    
+    def test_users_spread_over_shards(self):
+        """Test new users go to the emptiest shard and their rows follow them"""
+        self.assertEqual([user.shard for user in self.users], self.aliases)
+        for user in self.users:
+            wallet = Wallet.objects.for_user(user).get()
+            self.assertEqual(wallet._state.db, user.shard)
+            self.assertGreaterEqual(wallet.pk, ID_RANGE)
+            # Users and events are mirrored so shard-local joins work
+            self.assertTrue(Event.objects.using(user.shard).filter(pk=self.event.pk).exists())
+            # Created at signup, next to the user's wallet
+            self.assertTrue(GameStats.objects.for_user(user).exists())
+        self.assertFalse(Wallet.objects.using('default').exists())
+        self.assertFalse(GameStats.objects.using('default').exists())
+    
+    def test_unrouted_query_raises(self):
+        """Test a sharded query with no user or shard to route by is refused"""
+        with self.assertRaises(ShardRoutingError):
+            Wallet.objects.count()
+    
+    def test_settlement_spans_shards(self):
+        """Test an event's bets are settled and paid out on every shard"""
+        for user in self.users:
+            BetSlipService.place_slip(user, [
+                {'event_id': self.event.pk, 'bet_type': Bet.TEAM_A_WIN, 'stake': '10.00'}
+            ])
+        
+        summary = BetSettlementService.settle_event(self.event, Bet.TEAM_A_WIN)
+        
+        self.assertEqual(summary['won_bets'], 2)
+        self.assertEqual(summary['wallets_credited'], 2)
+        for user in self.users:
+            bet = Bet.objects.for_user(user).get()
+            self.assertEqual(bet.status, Bet.WON)
+            self.assertEqual(Wallet.objects.for_user(user).get().balance, Decimal('1010.00'))
+            self.assertEqual(
+                Event.objects.using(user.shard).get(pk=self.event.pk).status, 'finished'
+            )
+    
+    def test_exports_stream_from_user_shard(self):
+        """Test exports read from the user's shard after the middleware has returned"""
+        user = self.users[1]
+        BetSlipService.place_slip(user, [
+            {'event_id': self.event.pk, 'bet_type': Bet.DRAW, 'stake': '5.00'}
+        ])
+        client = Client()
+        client.force_login(user)
+        
+        for url in ('/bets/history/export/?format=ndjson', '/wallet/transactions/export/?format=ndjson'):
+            response = client.get(url)
+            lines = b''.join(response.streaming_content).decode().splitlines()
+            self.assertEqual(len(lines), 1, url)
+            self.assertIn(user.email, lines[0])
+    
+    def test_coin_flip_rolls_back_on_shard(self):
+        """Test a coin flip that fails after its wallet entry leaves the shard's wallet untouched"""
+        from unittest import mock
+        from apps.accounts.views import home_view
+        user = self.users[1]
+        Wallet.objects.for_user(user).update(balance=Decimal('10.00'))
+        request = RequestFactory().post('/', {'amount': '5', 'side': 'Heads'})
+        request.user = user
+        
+        with mock.patch('apps.accounts.views.outcome_pool') as pool, \
+                mock.patch('apps.accounts.views.coin_flips') as flips, \
+                mock.patch('apps.accounts.views.render') as render:
+            pool.return_value.draw.return_value = 0
+            flips.inc.side_effect = [ValueError, None]
+            home_view(request)
+        
+        self.assertEqual(render.call_args.args[2]['result_msg'], "Invalid amount or insufficient funds.")
+        wallet = Wallet.objects.using('shard_test_1').get(user=user)
+        self.assertEqual(wallet.balance, Decimal('10.00'))
+        self.assertFalse(wallet.transactions.exists())
+    
+    def test_move_user(self):
+        """Test rebalancing moves every row and keeps primary keys"""
+        user = self.users[0]
+        bets = BetSlipService.place_slip(user, [
+            {'event_id': self.event.pk, 'bet_type': Bet.DRAW, 'stake': '5.00'}
+        ])
+        wallet = Wallet.objects.for_user(user).get()
+        
+        moved = move_user(user, 'shard_test_1')
+        
+        self.assertEqual(moved['wallet.Wallet'], 1)
+        self.assertEqual(moved['wallet.Transaction'], 1)
+        self.assertEqual(moved['bets.Bet'], 1)
+        self.assertEqual(get_user_model().objects.get(pk=user.pk).shard, 'shard_test_1')
+        self.assertEqual(Wallet.objects.for_user(user).get().pk, wallet.pk)
+        self.assertEqual(Bet.objects.for_user(user).get().pk, bets[0].pk)
+        self.assertFalse(Bet.objects.using('shard_test_0').filter(user=user).exists())
+        self.assertEqual(UserBetStats.objects.for_user(user).get().total_bets, 1)
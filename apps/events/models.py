@@ -1,4 +1,6 @@
-from django.db import models
+from functools import partial
+from django.db import models, transaction
+from django.db.models import F
 from django.utils import timezone
 
 
@@ -41,6 +43,9 @@ class Event(models.Model):
         ]
     )
     
+    # Bumped on every save so cached odds can be told apart from current ones
+    odds_version = models.PositiveIntegerField(default=1, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -49,6 +54,31 @@ class Event(models.Model):
     def __str__(self):
         return f"{self.team_a} vs {self.team_b} - {self.start_time.strftime('%Y-%m-%d')}"
     
+    def save(self, *args, **kwargs):
+        """Bump odds_version and drop this event from the odds cache once committed"""
+        from .services import odds_cache
+        
+        if not self._state.adding:
+            # Bumped in SQL so concurrent saves never share a version
+            self.odds_version = F('odds_version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'odds_version'}
+        super().save(*args, **kwargs)
+        if not isinstance(self.odds_version, int):
+            self.refresh_from_db(using=self._state.db, fields=['odds_version'])
+        transaction.on_commit(
+            partial(odds_cache.invalidate, self.pk, self.odds_version), using=self._state.db
+        )
+    
+    def delete(self, *args, **kwargs):
+        from .services import odds_cache
+        
+        using = kwargs.get('using') or self._state.db
+        event_id = self.pk
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(partial(odds_cache.invalidate, event_id), using=using)
+        return result
+    
     def is_bettable(self):
         """Check if event is still open for betting"""
         return self.status == 'upcoming' and self.start_time > timezone.now()
@@ -1,2 +1,124 @@
-from apps.wallet.services import WalletService
-from apps.wallet.models import Wallet
\ No newline at end of file
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from .models import Event
+
+
+class OddsCache:
+    """
+    In-process cache of Event rows for payout quotes and eligibility checks
+    Entries are keyed by event id and carry the event's odds_version. A
+    committed save drops the entry and records its version, so a read that
+    raced the save cannot put the older row back; the TTL bounds how long
+    other worker processes can keep serving an older version
+    """
+
+    def __init__(self, ttl=None, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _get_ttl(self):
+        if self.ttl is not None:
+            return self.ttl
+        return getattr(settings, 'ODDS_CACHE_TTL', 5)
+
+    def get(self, event_id):
+        """
+        Get a read-only Event snapshot, hitting the database only on a miss
+        Raises: Event.DoesNotExist
+        """
+        event_id = int(event_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(event_id)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        event = Event.objects.get(pk=event_id)
+        self._store(event)
+        return event
+
+    def get_many(self, event_ids):
+        """
+        Get snapshots for several events, loading all misses in one query
+        Returns: {event_id: Event}; unknown ids are left out
+        """
+        event_ids = {int(event_id) for event_id in event_ids}
+        now = time.monotonic()
+        found = {}
+        missing = []
+        with self._lock:
+            for event_id in event_ids:
+                entry = self._entries.get(event_id)
+                if entry is not None and entry[1] > now:
+                    self.hits += 1
+                    found[event_id] = entry[0]
+                else:
+                    self.misses += 1
+                    missing.append(event_id)
+
+        if missing:
+            for event_id, event in Event.objects.in_bulk(missing).items():
+                self._store(event)
+                found[event_id] = event
+        return found
+
+    def put(self, event):
+        """Prime the cache with an Event the caller already loaded"""
+        self._store(event)
+
+    def _store(self, event):
+        with self._lock:
+            # Skip rows read before a save that has since committed
+            if event.odds_version < self._versions.get(event.pk, 0):
+                return
+            self._entries[event.pk] = (copy.copy(event), time.monotonic() + self._get_ttl())
+            self._entries.move_to_end(event.pk)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, event_id, odds_version=None):
+        """
+        Drop an event's entry after its odds, status or start time change
+        Call once the change has committed (see transaction.on_commit), passing
+        the new odds_version so older rows are not cached again
+        """
+        with self._lock:
+            self._entries.pop(event_id, None)
+            if odds_version is not None:
+                self._versions[event_id] = max(odds_version, self._versions.get(event_id, 0))
+                self._versions.move_to_end(event_id)
+                while len(self._versions) > self.max_entries:
+                    self._versions.popitem(last=False)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def stats(self):
+        """Hit/miss counters for verifying how much quote traffic reaches the database"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups * 100, 2) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'ttl_seconds': self._get_ttl(),
+            }
+
+
+odds_cache = OddsCache()
@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import HashChain
+
+
+@admin.register(HashChain)
+class HashChainAdmin(admin.ModelAdmin):
+    list_display = ['id', 'game', 'commitment', 'rounds_played', 'length', 'created_at']
+    list_filter = ['game', 'created_at']
+    search_fields = ['commitment']
+    readonly_fields = ['commitment', 'length', 'rounds_played', 'created_at']
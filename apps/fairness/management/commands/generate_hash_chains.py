@@ -0,0 +1,52 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from apps.fairness.models import HashChain
+from apps.fairness.services import ProvablyFairService
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute provably-fair hash chains so every game keeps HASH_CHAINS_AHEAD "
+        "unplayed chains with published commitments. Use --every to keep running as "
+        "a background job"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--game',
+            choices=list(HashChain.SIDES),
+            action='append',
+            help="Game to generate chains for; repeat for several (default: all)"
+        )
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=None,
+            help="Unplayed chains to keep per game (default: HASH_CHAINS_AHEAD)"
+        )
+        parser.add_argument(
+            '--length',
+            type=int,
+            default=None,
+            help="Rounds per new chain (default: HASH_CHAIN_LENGTH)"
+        )
+        parser.add_argument(
+            '--every',
+            type=float,
+            default=None,
+            help="Check again every this many seconds instead of exiting"
+        )
+
+    def handle(self, *args, **options):
+        games = options['game'] or list(HashChain.SIDES)
+        while True:
+            for game in games:
+                generated = ProvablyFairService.top_up(game, options['ahead'], options['length'])
+                if generated:
+                    self.stdout.write(f"{game}: generated {generated} chains")
+            if options['every'] is None:
+                break
+            close_old_connections()
+            time.sleep(options['every'])
+        self.stdout.write(self.style.SUCCESS("Hash chains are topped up"))
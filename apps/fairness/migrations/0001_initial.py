@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HashChain',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game', models.CharField(choices=[('dice', 'Dice'), ('coin', 'Coin Flip')], max_length=10)),
+                ('length', models.PositiveIntegerField()),
+                ('commitment', models.CharField(max_length=64, unique=True)),
+                ('seeds', models.BinaryField()),
+                ('rounds_played', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'hash_chains',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['game', 'rounds_played'], name='hash_chains_game_89db14_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import models
+
+
+class HashChain(models.Model):
+    """
+    Precomputed reverse hash chain of server seeds for one game
+    seeds holds the seed of round 1, 2, ... length, 32 bytes each; every seed
+    is the SHA-256 of the next one, and commitment is the SHA-256 of round 1's
+    seed, published before the first round is played
+    """
+    GAMES = [
+        ('dice', 'Dice'),
+        ('coin', 'Coin Flip'),
+    ]
+    
+    # Outcomes per round of each game
+    SIDES = {
+        'dice': 6,
+        'coin': 2,
+    }
+    
+    SEED_BYTES = 32
+    
+    game = models.CharField(max_length=10, choices=GAMES)
+    length = models.PositiveIntegerField()
+    commitment = models.CharField(max_length=64, unique=True)
+    seeds = models.BinaryField(editable=False)
+    rounds_played = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'hash_chains'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['game', 'rounds_played']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_game_display()} chain #{self.pk} ({self.rounds_played}/{self.length})"
+    
+    @property
+    def is_exhausted(self):
+        return self.rounds_played >= self.length
@@ -0,0 +1,221 @@
+import hashlib
+import hmac
+import os
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from apps.metrics import registry
+from .models import HashChain
+
+chains_generated = registry.counter(
+    'hash_chains_generated', "Hash chains generated, ahead of time or inline when none was left", ('game', 'mode')
+)
+
+
+def hash_seed(seed):
+    """The seed of the round before: SHA-256 of this round's seed"""
+    return hashlib.sha256(seed).digest()
+
+
+def fair_outcome(server_seed, client_seed, sides):
+    """
+    Outcome in range(sides) of one round
+    HMAC-SHA256 keyed with the round's server seed over the client seed, read
+    as 32-bit big-endian words; words at or above the largest multiple of
+    sides are skipped, so there is no modulo bias
+    """
+    limit = 2 ** 32 - 2 ** 32 % sides
+    digest = hmac.new(server_seed, client_seed.encode(), hashlib.sha256).digest()
+    while True:
+        for offset in range(0, len(digest), 4):
+            value = int.from_bytes(digest[offset:offset + 4], 'big')
+            if value < limit:
+                return value % sides
+        digest = hashlib.sha256(digest).digest()
+
+
+class ProvablyFairService:
+    """
+    Provably-fair outcomes from precomputed hash chains
+    A chain's commitment is published before its first round. Round n reveals
+    its server seed, whose SHA-256 is round n-1's seed (or the commitment), so
+    every outcome was fixed before the player chose their client seed and bet,
+    and any round can be checked with one hash and one HMAC
+    """
+
+    # Chains whose seeds are kept in memory per process
+    CACHED_CHAINS = 8
+
+    _seeds = OrderedDict()
+    _active = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def enabled():
+        return getattr(settings, 'PROVABLY_FAIR', False)
+
+    @staticmethod
+    def generate_chains(game, count=1, length=None):
+        """
+        Precompute count chains for game, e.g. from the generate_hash_chains job
+        Returns: list of HashChain objects
+        """
+        length = length or getattr(settings, 'HASH_CHAIN_LENGTH', 10000)
+        chains = []
+        for _ in range(count):
+            seed = os.urandom(HashChain.SEED_BYTES)
+            seeds = [seed]
+            for _ in range(length - 1):
+                seed = hash_seed(seed)
+                seeds.append(seed)
+            # Generated from the last round back, so round 1's seed comes last
+            seeds.reverse()
+            chains.append(HashChain(
+                game=game,
+                length=length,
+                commitment=hash_seed(seeds[0]).hex(),
+                seeds=b''.join(seeds),
+            ))
+        return HashChain.objects.using(DEFAULT_DB_ALIAS).bulk_create(chains)
+
+    @staticmethod
+    def top_up(game, ahead=None, length=None):
+        """
+        Generate chains until game has ahead chains nobody has played yet
+        Returns: number of chains generated
+        """
+        ahead = getattr(settings, 'HASH_CHAINS_AHEAD', 2) if ahead is None else ahead
+        unused = HashChain.objects.using(DEFAULT_DB_ALIAS).filter(game=game, rounds_played=0).count()
+        missing = max(ahead - unused, 0)
+        if missing:
+            ProvablyFairService.generate_chains(game, missing, length)
+            chains_generated.inc(missing, game=game, mode='ahead')
+        return missing
+
+    @staticmethod
+    def draw(game, client_seed=''):
+        """
+        Play one round of game
+        Returns: (outcome in range(HashChain.SIDES[game]), proof dict for the player)
+        """
+        outcomes, proof = ProvablyFairService.draw_many(game, 1, client_seed)
+        proof['round'] = proof.pop('first_round')
+        proof['server_seed'] = proof.pop('server_seeds')[0]
+        del proof['last_round']
+        return outcomes[0], proof
+
+    @staticmethod
+    def draw_many(game, count, client_seed=''):
+        """
+        Play count consecutive rounds of game from one chain
+        Call inside the game's transaction, so the rounds are released again if it rolls back
+        Returns: (list of outcomes, proof dict covering the rounds)
+        """
+        chain_id, commitment, first = ProvablyFairService._claim(game, count)
+        seeds = ProvablyFairService._chain_seeds(chain_id, commitment)
+        sides = HashChain.SIDES[game]
+
+        outcomes = []
+        server_seeds = []
+        for number in range(first, first + count):
+            seed = seeds[(number - 1) * HashChain.SEED_BYTES:number * HashChain.SEED_BYTES]
+            outcomes.append(fair_outcome(seed, client_seed, sides))
+            server_seeds.append(seed.hex())
+
+        return outcomes, {
+            'game': game,
+            'chain': chain_id,
+            'commitment': commitment,
+            'first_round': first,
+            'last_round': first + count - 1,
+            'client_seed': client_seed,
+            'server_seeds': server_seeds,
+        }
+
+    @staticmethod
+    def _claim(game, count):
+        """
+        Take the next count round numbers of the oldest chain with room for them
+        Returns: (chain id, commitment, first round number)
+        """
+        if game not in HashChain.SIDES:
+            raise ValueError(f"Unknown game: {game}")
+
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            chain_id = ProvablyFairService._active.get(game)
+            for attempt in range(3):
+                if chain_id is not None:
+                    claimed = HashChain.objects.using(DEFAULT_DB_ALIAS).filter(
+                        pk=chain_id, game=game, rounds_played__lte=F('length') - count
+                    ).update(rounds_played=F('rounds_played') + count)
+                    if claimed:
+                        ProvablyFairService._active[game] = chain_id
+                        played, commitment = HashChain.objects.using(DEFAULT_DB_ALIAS).filter(
+                            pk=chain_id
+                        ).values_list('rounds_played', 'commitment').get()
+                        return chain_id, commitment, played - count + 1
+
+                chain_id = HashChain.objects.using(DEFAULT_DB_ALIAS).filter(
+                    game=game, rounds_played__lte=F('length') - count
+                ).order_by('pk').values_list('pk', flat=True).first()
+                if chain_id is None:
+                    # The generate_hash_chains job has fallen behind
+                    chain_id = ProvablyFairService.generate_chains(
+                        game, length=max(count, getattr(settings, 'HASH_CHAIN_LENGTH', 10000))
+                    )[0].pk
+                    chains_generated.inc(game=game, mode='inline')
+
+        raise RuntimeError(f"Could not claim {count} {game} rounds")
+
+    @staticmethod
+    def _chain_seeds(chain_id, commitment):
+        """A chain's seeds, loaded once per process"""
+        # Keyed by commitment too: an inline chain rolled back with its game may leave its id to another
+        key = (chain_id, commitment)
+        cache = ProvablyFairService._seeds
+        with ProvablyFairService._lock:
+            seeds = cache.get(key)
+            if seeds is not None:
+                cache.move_to_end(key)
+                return seeds
+
+        seeds = bytes(HashChain.objects.using(DEFAULT_DB_ALIAS).values_list('seeds', flat=True).get(pk=chain_id))
+        with ProvablyFairService._lock:
+            cache[key] = seeds
+            while len(cache) > ProvablyFairService.CACHED_CHAINS:
+                cache.popitem(last=False)
+        return seeds
+
+    @staticmethod
+    def verify(chain_id, round_number, client_seed=''):
+        """
+        Check one played round: its server seed must hash to the seed of the
+        round before (or the commitment), and must give this outcome
+        Returns: dict with valid, outcome, server_seed, previous_seed and commitment;
+        raises HashChain.DoesNotExist, or ValueError for a round not played yet
+        """
+        game, commitment, played = HashChain.objects.using(DEFAULT_DB_ALIAS).values_list(
+            'game', 'commitment', 'rounds_played'
+        ).get(pk=chain_id)
+        if not 1 <= round_number <= played:
+            # Seeds of unplayed rounds would reveal future outcomes
+            raise ValueError("Round has not been played yet")
+
+        seeds = ProvablyFairService._chain_seeds(chain_id, commitment)
+        size = HashChain.SEED_BYTES
+        seed = seeds[(round_number - 1) * size:round_number * size]
+        previous = seeds[(round_number - 2) * size:(round_number - 1) * size] if round_number > 1 else bytes.fromhex(commitment)
+
+        return {
+            'valid': hmac.compare_digest(hash_seed(seed), previous),
+            'game': game,
+            'chain': chain_id,
+            'round': round_number,
+            'outcome': fair_outcome(seed, client_seed, HashChain.SIDES[game]),
+            'client_seed': client_seed,
+            'server_seed': seed.hex(),
+            'previous_seed': previous.hex(),
+            'commitment': commitment,
+        }
@@ -0,0 +1,118 @@
+from collections import Counter
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase, override_settings
+from apps.accounts.views import home_view
+from apps.wallet.models import Wallet
+from apps.metrics import registry
+from .models import HashChain
+from .services import ProvablyFairService, fair_outcome, hash_seed
+
+
+@override_settings(HASH_CHAIN_LENGTH=50, HASH_CHAINS_AHEAD=2)
+class HashChainTest(TestCase):
+    """Test cases for precomputed hash chains and round verification"""
+
+    def _inline_chains(self, game):
+        counters, histograms = registry.collect()
+        return counters.get(('hash_chains_generated', (game, 'inline')), 0)
+
+    def test_chain_links_to_commitment(self):
+        """Test every seed hashes to the one before it and round 1 to the commitment"""
+        chain, = ProvablyFairService.generate_chains('dice')
+        seeds = [bytes(chain.seeds)[i:i + 32] for i in range(0, 50 * 32, 32)]
+
+        self.assertEqual(chain.length, 50)
+        self.assertEqual(hash_seed(seeds[0]).hex(), chain.commitment)
+        for previous, seed in zip(seeds, seeds[1:]):
+            self.assertEqual(hash_seed(seed), previous)
+
+    def test_rounds_are_consecutive_and_verify(self):
+        """Test rounds are dealt in order and each verifies through the endpoint"""
+        ProvablyFairService.top_up('dice')
+        rounds = [ProvablyFairService.draw('dice', 'lucky') for _ in range(3)]
+        chain = HashChain.objects.get(pk=rounds[0][1]['chain'])
+
+        self.assertEqual([proof['round'] for outcome, proof in rounds], [1, 2, 3])
+        self.assertEqual(chain.rounds_played, 3)
+        for outcome, proof in rounds:
+            response = self.client.get('/fair/api/verify/', {
+                'chain': proof['chain'], 'round': proof['round'], 'client_seed': 'lucky'
+            })
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertTrue(data['valid'])
+            self.assertEqual(data['outcome'], outcome)
+            self.assertEqual(data['server_seed'], proof['server_seed'])
+        self.assertEqual(data['previous_seed'], rounds[1][1]['server_seed'])
+
+    def test_unplayed_round_is_not_revealed(self):
+        """Test the endpoint refuses rounds not played yet and unknown chains"""
+        chain, = ProvablyFairService.generate_chains('coin')
+        ProvablyFairService.draw('coin')
+
+        response = self.client.get('/fair/api/verify/', {'chain': chain.pk, 'round': 2})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('server_seed', response.json())
+        response = self.client.get('/fair/api/verify/', {'chain': chain.pk + 1, 'round': 1})
+        self.assertEqual(response.status_code, 404)
+
+    def test_draw_many_moves_to_next_chain(self):
+        """Test a run that does not fit the active chain is taken from the next one"""
+        first, second = ProvablyFairService.generate_chains('dice', 2)
+        ProvablyFairService.draw_many('dice', 40)
+        outcomes, proof = ProvablyFairService.draw_many('dice', 20)
+
+        self.assertEqual(proof['chain'], second.pk)
+        self.assertEqual((proof['first_round'], proof['last_round']), (1, 20))
+        self.assertEqual(len(outcomes), 20)
+        self.assertEqual(HashChain.objects.get(pk=first.pk).rounds_played, 40)
+
+    def test_top_up_and_inline_fallback(self):
+        """Test chains are generated ahead, and inline only when none is left"""
+        self.assertEqual(ProvablyFairService.top_up('coin'), 2)
+        self.assertEqual(ProvablyFairService.top_up('coin'), 0)
+
+        inline = self._inline_chains('dice')
+        outcome, proof = ProvablyFairService.draw('dice')
+        self.assertIn(outcome, range(6))
+        self.assertEqual(self._inline_chains('dice'), inline + 1)
+        self.assertEqual(HashChain.objects.filter(game='dice').count(), 1)
+
+    def test_chains_api_lists_commitments(self):
+        """Test published chains show commitments but never seeds"""
+        ProvablyFairService.top_up('dice', ahead=1)
+        ProvablyFairService.top_up('coin', ahead=1)
+
+        response = self.client.get('/fair/api/chains/', {'game': 'coin'})
+        chains = response.json()['chains']
+        self.assertEqual([chain['game'] for chain in chains], ['coin'])
+        self.assertNotIn('seeds', chains[0])
+
+    def test_outcomes_are_uniform(self):
+        """Test outcomes cover every side about equally often"""
+        counts = Counter(fair_outcome(hash_seed(bytes([i % 256, i // 256])), 'seed', 6) for i in range(6000))
+
+        self.assertEqual(set(counts), set(range(6)))
+        for count in counts.values():
+            self.assertLess(abs(count - 1000), 150)
+
+    @override_settings(PROVABLY_FAIR=True)
+    def test_failed_coin_flip_releases_round(self):
+        """Test a coin flip whose wallet entry fails does not use up its round"""
+        user = get_user_model().objects.create_user(email='flip@example.com', password='testpass123')
+        Wallet.objects.create(user=user, balance=Decimal('10.00'))
+        chain, = ProvablyFairService.generate_chains('coin')
+        request = RequestFactory().post('/', {'amount': '5', 'side': 'Heads'})
+        request.user = user
+
+        refused = mock.patch.multiple(Wallet, credit=mock.DEFAULT, deduct=mock.DEFAULT)
+        with refused as wallet, mock.patch('apps.accounts.views.render') as render:
+            wallet['credit'].side_effect = wallet['deduct'].side_effect = ValueError
+            home_view(request)
+
+        context = render.call_args.args[2]
+        self.assertEqual(context['result_msg'], "Invalid amount or insufficient funds.")
+        self.assertIsNone(context['proof'])
+        self.assertEqual(HashChain.objects.get(pk=chain.pk).rounds_played, 0)
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+app_name = 'fairness'
+
+urlpatterns = [
+    # Provably-fair API endpoints
+    path('api/chains/', views.chains_api, name='chains_api'),
+    path('api/verify/', views.verify_api, name='verify_api'),
+]
@@ -0,0 +1,55 @@
+from django.db.models import F
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+from .models import HashChain
+from .services import ProvablyFairService
+
+
+@require_http_methods(["GET"])
+def chains_api(request):
+    """
+    API endpoint listing the commitments of chains still being played or yet to be played
+    Players note a commitment before betting and check revealed seeds against it later
+    """
+    chains = HashChain.objects.filter(rounds_played__lt=F('length')).values(
+        'id', 'game', 'commitment', 'length', 'rounds_played', 'created_at'
+    )
+    game = request.GET.get('game')
+    if game:
+        chains = chains.filter(game=game)
+    
+    return JsonResponse({
+        'success': True,
+        'chains': list(chains[:50]),
+    })
+
+
+@require_http_methods(["GET"])
+def verify_api(request):
+    """
+    API endpoint to verify one played round: ?chain=<id>&round=<n>&client_seed=<seed>
+    Costs one SHA-256 and one HMAC whatever the round
+    """
+    try:
+        chain_id = int(request.GET.get('chain', ''))
+        round_number = int(request.GET.get('round', ''))
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'error': 'chain and round must be whole numbers'
+        }, status=400)
+    
+    try:
+        result = ProvablyFairService.verify(chain_id, round_number, request.GET.get('client_seed', ''))
+    except HashChain.DoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'error': 'Chain not found'
+        }, status=404)
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+    
+    return JsonResponse({'success': True, **result})
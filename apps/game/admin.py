@@ -0,0 +1,23 @@
+from django.contrib import admin
+from .models import DiceGame, GameStats, LeaderboardEntry
+
+
+@admin.register(DiceGame)
+class DiceGameAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'bet_type', 'bet_amount', 'dice_result', 'status', 'payout_amount', 'created_at']
+    list_filter = ['bet_type', 'status', 'created_at']
+    search_fields = ['user__email']
+    readonly_fields = ['id', 'created_at', 'hash_chain', 'chain_round', 'client_seed']
+
+
+@admin.register(GameStats)
+class GameStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'total_games', 'total_wins', 'total_wagered', 'total_won', 'win_streak']
+    search_fields = ['user__email']
+
+
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = ['user', 'window', 'period', 'net_profit', 'games', 'updated_at']
+    list_filter = ['window', 'period']
+    search_fields = ['user__email']
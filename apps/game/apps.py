@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_save
+
+
+class GameConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.game'
+
+    def ready(self):
+        from .signals import create_user_game_stats
+
+        post_save.connect(create_user_game_stats, sender=settings.AUTH_USER_MODEL, dispatch_uid='game_create_user_game_stats')
@@ -0,0 +1,257 @@
+import operator
+import random
+import threading
+import time
+from datetime import date, timedelta
+from functools import reduce
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import LeaderboardEntry
+
+
+class RankedSet:
+    """
+    Indexable skip list of sortable keys
+    insert, remove, bisect_left and positional access are all O(log n)
+    """
+
+    MAX_LEVELS = 32
+
+    class _Node:
+        __slots__ = ('key', 'next', 'width')
+
+        def __init__(self, key, levels):
+            self.key = key
+            self.next = [None] * levels
+            # Positions from this node to next[level], counting the end of the list as one past the last key
+            self.width = [1] * levels
+
+    def __init__(self):
+        self._head = self._Node(None, self.MAX_LEVELS)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _predecessors(self, key):
+        """Last node before key on every level, and the position of each"""
+        chain = [None] * self.MAX_LEVELS
+        positions = [0] * self.MAX_LEVELS
+        node, position = self._head, 0
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+        return chain, positions
+
+    def insert(self, key):
+        chain, positions = self._predecessors(key)
+        levels = 1
+        while levels < self.MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+        node = self._Node(key, levels)
+        for level in range(levels):
+            previous = chain[level]
+            skipped = positions[0] - positions[level]
+            node.next[level] = previous.next[level]
+            node.width[level] = previous.width[level] - skipped
+            previous.next[level] = node
+            previous.width[level] = skipped + 1
+        for level in range(levels, self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key):
+        """Raises: KeyError if key is not in the set"""
+        chain, positions = self._predecessors(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for level in range(len(node.next)):
+            chain[level].width[level] += node.width[level] - 1
+            chain[level].next[level] = node.next[level]
+        for level in range(len(node.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def bisect_left(self, key):
+        """Number of keys smaller than key"""
+        chain, positions = self._predecessors(key)
+        return positions[0]
+
+    def slice(self, start, stop):
+        """Keys at positions start..stop-1"""
+        stop = min(stop, self._size)
+        if start >= stop:
+            return []
+        node, remaining = self._head, start + 1
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        keys = []
+        while node is not None and len(keys) < stop - start:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class _Board:
+    """One window period of the leaderboard, ranked by net profit"""
+
+    def __init__(self, period):
+        self.period = period
+        self.ranked = RankedSet()
+        self.entries = {}
+        self.synced_at = None
+
+    def set(self, user_id, net_profit, games):
+        old = self.entries.get(user_id)
+        if old is not None:
+            self.ranked.remove((-old[0], user_id))
+        self.entries[user_id] = (net_profit, games)
+        self.ranked.insert((-net_profit, user_id))
+
+
+class Leaderboard:
+    """
+    Dice game rankings by net profit for today, this week and all time
+    LeaderboardEntry rows hold every user's running totals and are
+    incremented as games settle. Each process keeps the current period of
+    each window in a RankedSet, applies its own games as they commit and
+    pulls rows other workers changed at most every LEADERBOARD_REFRESH
+    seconds, so top-N and rank lookups never sort the table
+    """
+
+    WINDOWS = [window for window, label in LeaderboardEntry.WINDOWS]
+
+    # period stored for the all_time window
+    ALL_TIME = date(1970, 1, 1)
+
+    # Rows changed this long before the last sync are read again, for
+    # transactions that committed after it but stamped updated_at before it
+    SYNC_OVERLAP = 30
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards = {}
+        self._known = set()
+
+    @classmethod
+    def period(cls, window, day=None):
+        """First day of the window that contains day (default: today)"""
+        day = day or timezone.localdate()
+        if window == 'daily':
+            return day
+        if window == 'weekly':
+            return day - timedelta(days=day.weekday())
+        return cls.ALL_TIME
+
+    def record(self, user_id, net_profit, games=1):
+        """
+        Add settled games to the user's entry in every window
+        Call inside the games' transaction; the local boards follow on commit
+        """
+        now = timezone.now()
+        periods = {window: self.period(window, timezone.localdate(now)) for window in self.WINDOWS}
+        missing = [
+            LeaderboardEntry(user_id=user_id, window=window, period=period)
+            for window, period in periods.items()
+            if (window, period, user_id) not in self._known
+        ]
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            if missing:
+                LeaderboardEntry.objects.bulk_create(missing, ignore_conflicts=True)
+            rows = LeaderboardEntry.objects.filter(
+                reduce(operator.or_, (Q(window=window, period=period) for window, period in periods.items())),
+                user_id=user_id
+            )
+            rows.update(net_profit=F('net_profit') + net_profit, games=F('games') + games, updated_at=now)
+            totals = list(rows.values_list('window', 'period', 'net_profit', 'games'))
+
+        transaction.on_commit(lambda: self._apply(user_id, totals), using=DEFAULT_DB_ALIAS)
+
+    def _apply(self, user_id, totals):
+        with self._lock:
+            for window, period, net_profit, games in totals:
+                # Only committed rows may skip the insert next time
+                self._known.add((window, period, user_id))
+                board = self._boards.get(window)
+                if board is not None and board.period == period:
+                    board.set(user_id, net_profit, games)
+
+    def _board(self, window):
+        """The window's current board, loaded or brought up to date as needed"""
+        if window not in self.WINDOWS:
+            raise ValueError(f"Unknown leaderboard window: {window}")
+        period = self.period(window)
+        refresh = getattr(settings, 'LEADERBOARD_REFRESH', 5)
+        with self._lock:
+            board = self._boards.get(window)
+            now = time.time()
+            if board is None or board.period != period:
+                board = self._boards[window] = _Board(period)
+                rows = LeaderboardEntry.objects.filter(window=window, period=period)
+                self._known = {key for key in self._known if key[1] == self.period(key[0])}
+            elif now - board.synced_at > refresh:
+                since = timezone.now() - timedelta(seconds=now - board.synced_at + self.SYNC_OVERLAP)
+                rows = LeaderboardEntry.objects.filter(window=window, period=period, updated_at__gte=since)
+            else:
+                return board
+            for user_id, net_profit, games in rows.values_list('user_id', 'net_profit', 'games').iterator(chunk_size=2000):
+                board.set(user_id, net_profit, games)
+            board.synced_at = now
+            return board
+
+    def top(self, window='all_time', limit=10):
+        """
+        Best players of the window's current period
+        Returns: list of dicts with rank, user, net_profit and games; tied
+        players share a rank
+        """
+        board = self._board(window)
+        with self._lock:
+            rows = [(user_id, *board.entries[user_id]) for score, user_id in board.ranked.slice(0, limit)]
+        users = get_user_model().objects.in_bulk([user_id for user_id, net_profit, games in rows])
+
+        leaders = []
+        for position, (user_id, net_profit, games) in enumerate(rows):
+            if position and net_profit == leaders[-1]['net_profit']:
+                rank = leaders[-1]['rank']
+            else:
+                rank = position + 1
+            leaders.append({'rank': rank, 'user': users.get(user_id), 'net_profit': net_profit, 'games': games})
+        return leaders
+
+    def rank(self, user, window='all_time'):
+        """
+        The user's standing in the window's current period
+        Returns: dict with rank, net_profit, games and players, or None if the
+        user has not played in the period
+        """
+        board = self._board(window)
+        with self._lock:
+            entry = board.entries.get(user.pk)
+            if entry is None:
+                return None
+            net_profit, games = entry
+            return {
+                'rank': board.ranked.bisect_left((-net_profit, 0)) + 1,
+                'net_profit': net_profit,
+                'games': games,
+                'players': len(board.ranked),
+            }
+
+    def reset(self):
+        """Drop every loaded board, e.g. after the entries were rebuilt"""
+        with self._lock:
+            self._boards.clear()
+            self._known.clear()
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,58 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from apps.db.sharding import shard_aliases
+from apps.game.leaderboard import Leaderboard, leaderboard
+from apps.game.models import DiceGame, LeaderboardEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the current dice leaderboards from the games table, e.g. after "
+        "enabling them on a site with existing games, and drop past daily/weekly entries. "
+        "Games settled while it runs may be missed, so run it while play is paused"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=35,
+            help="Keep daily and weekly entries for periods that started this many days ago"
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        totals = {window: {} for window in Leaderboard.WINDOWS}
+        for alias in shard_aliases():
+            for window in Leaderboard.WINDOWS:
+                games = DiceGame.objects.using(alias).exclude(status='ACTIVE')
+                if window != 'all_time':
+                    games = games.filter(created_at__date__gte=Leaderboard.period(window, today))
+                rows = games.order_by().values('user_id').annotate(
+                    net_profit=Sum(F('payout_amount') - F('bet_amount')),
+                    games=Count('pk'),
+                )
+                for row in rows:
+                    net_profit, count = totals[window].get(row['user_id'], (0, 0))
+                    totals[window][row['user_id']] = (net_profit + row['net_profit'], count + row['games'])
+
+        with transaction.atomic():
+            for window, users in totals.items():
+                period = Leaderboard.period(window, today)
+                LeaderboardEntry.objects.filter(window=window, period=period).delete()
+                LeaderboardEntry.objects.bulk_create([
+                    LeaderboardEntry(user_id=user_id, window=window, period=period, net_profit=net_profit, games=count)
+                    for user_id, (net_profit, count) in users.items()
+                ], batch_size=2000)
+                self.stdout.write(f"{window}: {len(users)} players")
+
+            pruned, _ = LeaderboardEntry.objects.filter(
+                window__in=['daily', 'weekly'],
+                period__lt=today - timedelta(days=options['keep_days'])
+            ).delete()
+
+        leaderboard.reset()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt leaderboards; dropped {pruned} old entries"))
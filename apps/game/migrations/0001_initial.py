@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:56
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('fairness', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiceGame',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('bet_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('bet_type', models.CharField(choices=[('SINGLE', 'Single Number'), ('EVEN', 'Even Numbers'), ('ODD', 'Odd Numbers'), ('HIGH', 'High (4-6)'), ('LOW', 'Low (1-3)')], max_length=20)),
+                ('bet_value', models.IntegerField(blank=True, null=True)),
+                ('dice_result', models.IntegerField(blank=True, null=True)),
+                ('payout_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('WON', 'Won'), ('LOST', 'Lost')], default='ACTIVE', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('chain_round', models.PositiveIntegerField(blank=True, null=True)),
+                ('client_seed', models.CharField(blank=True, max_length=64)),
+                ('hash_chain', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='fairness.hashchain')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='games', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'dice_games',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='GameStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_games', models.IntegerField(default=0)),
+                ('total_wins', models.IntegerField(default=0)),
+                ('total_losses', models.IntegerField(default=0)),
+                ('total_wagered', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_won', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('biggest_win', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('win_streak', models.IntegerField(default=0)),
+                ('current_streak', models.IntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='game_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Game Stats',
+                'db_table': 'game_stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(choices=[('daily', 'Today'), ('weekly', 'This Week'), ('all_time', 'All Time')], max_length=10)),
+                ('period', models.DateField()),
+                ('net_profit', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('games', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'leaderboard_entries',
+                'indexes': [models.Index(fields=['window', 'period', 'updated_at'], name='leaderboard_window_8efee2_idx')],
+                'constraints': [models.UniqueConstraint(fields=('window', 'period', 'user'), name='unique_leaderboard_entry')],
+            },
+        ),
+    ]
@@ -1,7 +1,8 @@
-# game/models.py
+from django.conf import settings
 from django.db import models
-from django.contrib.auth.models import User
+from django.utils import timezone
 from decimal import Decimal
+from apps.db.sharding import ShardedManager
 import uuid
 
 
@@ -22,7 +23,7 @@ class DiceGame(models.Model):
     ]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='games')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='games')
     bet_amount = models.DecimalField(max_digits=10, decimal_places=2)
     bet_type = models.CharField(max_length=20, choices=BET_TYPES)
     bet_value = models.IntegerField(null=True, blank=True)  # For SINGLE bets
@@ -30,15 +31,25 @@ class DiceGame(models.Model):
     dice_result = models.IntegerField(null=True, blank=True)  # The rolled number (1-6)
     payout_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     
-    status = models.CharField(max_choices=20, choices=STATUS_CHOICES, default='ACTIVE')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ACTIVE')
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Provably-fair rounds only: where the roll came from, for the verify endpoint.
+    # Chains live on default only, so games on other shards can't have a constraint
+    hash_chain = models.ForeignKey(
+        'fairness.HashChain', on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_constraint=False
+    )
+    chain_round = models.PositiveIntegerField(null=True, blank=True)
+    client_seed = models.CharField(max_length=64, blank=True)
+    
+    objects = ShardedManager()
+    
     class Meta:
         db_table = 'dice_games'
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"Game {self.id} - {self.user.username} - ${self.bet_amount}"
+        return f"Game {self.id} - {self.user.email} - ${self.bet_amount}"
     
     @property
     def profit(self):
@@ -52,7 +63,7 @@ class DiceGame(models.Model):
 
 class GameStats(models.Model):
     """User gaming statistics"""
-    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='game_stats')
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='game_stats')
     total_games = models.IntegerField(default=0)
     total_wins = models.IntegerField(default=0)
     total_losses = models.IntegerField(default=0)
@@ -62,12 +73,14 @@ class GameStats(models.Model):
     win_streak = models.IntegerField(default=0)
     current_streak = models.IntegerField(default=0)
     
+    objects = ShardedManager()
+    
     class Meta:
         db_table = 'game_stats'
         verbose_name_plural = 'Game Stats'
     
     def __str__(self):
-        return f"{self.user.username}'s Stats"
+        return f"{self.user.email}'s Stats"
     
     @property
     def win_rate(self):
@@ -79,4 +92,31 @@ class GameStats(models.Model):
     @property
     def net_profit(self):
         """Calculate net profit/loss"""
-        return self.total_won - self.total_wagered
\ No newline at end of file
+        return self.total_won - self.total_wagered
+
+class LeaderboardEntry(models.Model):
+    """Net profit of one user over one leaderboard window"""
+    WINDOWS = [
+        ('daily', 'Today'),
+        ('weekly', 'This Week'),
+        ('all_time', 'All Time'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    window = models.CharField(max_length=10, choices=WINDOWS)
+    period = models.DateField()  # First day of the window; a fixed date for all_time
+    net_profit = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    games = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'leaderboard_entries'
+        constraints = [
+            models.UniqueConstraint(fields=['window', 'period', 'user'], name='unique_leaderboard_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['window', 'period', 'updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.email} - {self.window} {self.period}: {self.net_profit}"
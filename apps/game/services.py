@@ -0,0 +1,375 @@
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from decimal import Decimal
+from .leaderboard import leaderboard
+from .models import DiceGame, GameStats
+from apps.db.sharding import on_shard, shard_for_user
+from apps.wallet.models import Wallet, Transaction
+from apps.metrics import instrument
+from apps.rng import outcome_pool
+from apps.fairness.services import ProvablyFairService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DiceGameService:
+    """Service for handling dice game logic"""
+    
+    # Payout multipliers
+    PAYOUTS = {
+        'SINGLE': Decimal('6.00'),   # Bet on single number: 6x
+        'EVEN': Decimal('2.00'),      # Bet on even: 2x
+        'ODD': Decimal('2.00'),       # Bet on odd: 2x
+        'HIGH': Decimal('2.00'),      # Bet on 4-6: 2x
+        'LOW': Decimal('2.00'),       # Bet on 1-3: 2x
+    }
+    
+    @staticmethod
+    def roll_dice():
+        """Roll a dice and return result (1-6)"""
+        return outcome_pool(6).draw() + 1
+    
+    @staticmethod
+    def check_win(bet_type, bet_value, dice_result):
+        """Check if the bet won"""
+        if bet_type == 'SINGLE':
+            return dice_result == bet_value
+        elif bet_type == 'EVEN':
+            return dice_result % 2 == 0
+        elif bet_type == 'ODD':
+            return dice_result % 2 != 0
+        elif bet_type == 'HIGH':
+            return dice_result >= 4
+        elif bet_type == 'LOW':
+            return dice_result <= 3
+        return False
+    
+    # Most rounds one auto-play request may play
+    AUTO_PLAY_MAX_ROUNDS = 1000
+    
+    @staticmethod
+    def validate_bet(bet_amount, bet_type, bet_value=None, client_seed=''):
+        """Raise ValueError for a bet that can't be played"""
+        
+        # Validate client seed (stored with provably-fair games)
+        if len(client_seed) > DiceGame._meta.get_field('client_seed').max_length:
+            raise ValueError("Client seed must be at most 64 characters")
+        
+        # Validate bet amount
+        if bet_amount <= 0:
+            raise ValueError("Bet amount must be positive")
+        
+        # Validate bet type
+        if bet_type not in dict(DiceGame.BET_TYPES):
+            raise ValueError("Invalid bet type")
+        
+        # Validate single number bet
+        if bet_type == 'SINGLE':
+            if not bet_value or bet_value < 1 or bet_value > 6:
+                raise ValueError("For single number bet, choose a number between 1 and 6")
+    
+    @staticmethod
+    @instrument('dice_place_bet')
+    def place_bet(user, bet_amount, bet_type, bet_value=None, client_seed=''):
+        """
+        Place a bet and play the game
+        With settings.PROVABLY_FAIR the roll comes from a hash chain and the
+        returned game carries its proof in game.proof (None otherwise)
+        """
+        DiceGameService.validate_bet(bet_amount, bet_type, bet_value, client_seed)
+        
+        # Wallet, game and stats rows live on the user's shard; hash chains and
+        # leaderboards on default, which rolls back too if the game fails
+        using = shard_for_user(user)
+        with on_shard(using), transaction.atomic(using=using), transaction.atomic(using=DEFAULT_DB_ALIAS):
+            return DiceGameService._play(user, bet_amount, bet_type, bet_value, client_seed)
+    
+    @staticmethod
+    def _play(user, bet_amount, bet_type, bet_value, client_seed):
+        # Deduct bet amount from wallet; the balance check is part of the same UPDATE
+        Wallet.apply_debit(bet_amount, f"{bet_type} bet", Transaction.GAME_STAKE, user=user)
+        
+        # Create game record
+        game = DiceGame.objects.create(
+            user=user,
+            bet_amount=bet_amount,
+            bet_type=bet_type,
+            bet_value=bet_value,
+            status='ACTIVE'
+        )
+        
+        # Roll the dice
+        game.proof = None
+        if ProvablyFairService.enabled():
+            outcome, game.proof = ProvablyFairService.draw('dice', client_seed)
+            dice_result = outcome + 1
+            game.hash_chain_id = game.proof['chain']
+            game.chain_round = game.proof['round']
+            game.client_seed = client_seed
+        else:
+            dice_result = DiceGameService.roll_dice()
+        game.dice_result = dice_result
+        
+        # Check if won
+        is_win = DiceGameService.check_win(bet_type, bet_value, dice_result)
+        
+        if is_win:
+            # Calculate payout
+            multiplier = DiceGameService.PAYOUTS[bet_type]
+            payout = bet_amount * multiplier
+            game.payout_amount = payout
+            game.status = 'WON'
+            
+            # Credit winnings
+            Wallet.apply_credit(
+                payout,
+                f"Won {bet_type} bet (Game #{game.id})",
+                Transaction.GAME_PAYOUT,
+                user=user
+            )
+            
+            logger.info(f"{user.email} WON ${payout} on {bet_type} bet")
+        else:
+            game.payout_amount = Decimal('0.00')
+            game.status = 'LOST'
+            logger.info(f"{user.email} LOST ${bet_amount} on {bet_type} bet")
+        
+        game.save()
+        
+        # Update stats
+        DiceGameService.update_stats(user, game)
+        
+        return game
+    
+    @staticmethod
+    @instrument('dice_auto_play')
+    def auto_play(user, bet_amount, bet_type, bet_value=None, rounds=10, stop_loss=None, take_profit=None,
+                  client_seed=''):
+        """
+        Play up to `rounds` identical bets in one call
+        All rolls are taken from the outcome pool at once and scored with
+        NumPy; play stops early once the running net reaches -stop_loss or
+        +take_profit, or when the balance can no longer cover the next stake.
+        The wallet moves once by the net result with a stake row per round and
+        a payout row per win, the games are bulk inserted and stats are
+        updated once. With settings.PROVABLY_FAIR the rolls are
+        consecutive rounds of one hash chain; rounds left unplayed after a stop
+        are skipped, never reused
+        Returns: dict with games, rounds, wins, net, stopped ('stop_loss',
+        'take_profit', 'balance' or None), balance and proof (None unless
+        provably fair)
+        """
+        DiceGameService.validate_bet(bet_amount, bet_type, bet_value, client_seed)
+        if rounds < 1 or rounds > DiceGameService.AUTO_PLAY_MAX_ROUNDS:
+            raise ValueError(f"Rounds must be between 1 and {DiceGameService.AUTO_PLAY_MAX_ROUNDS}")
+        for limit in (stop_loss, take_profit):
+            if limit is not None and limit <= 0:
+                raise ValueError("Stop-loss and take-profit must be positive")
+        
+        using = shard_for_user(user)
+        with on_shard(using), transaction.atomic(using=using), transaction.atomic(using=DEFAULT_DB_ALIAS):
+            return DiceGameService._auto_play(
+                user, bet_amount, bet_type, bet_value, rounds, stop_loss, take_profit, client_seed
+            )
+    
+    @staticmethod
+    def _auto_play(user, bet_amount, bet_type, bet_value, rounds, stop_loss, take_profit, client_seed):
+        import numpy as np
+        
+        # Work in cents so the prefix sums are exact
+        cent = Decimal('0.01')
+        stake = int(Decimal(bet_amount).quantize(cent) * 100)
+        payout = int((Decimal(bet_amount) * DiceGameService.PAYOUTS[bet_type]).quantize(cent) * 100)
+        
+        proof = None
+        if ProvablyFairService.enabled():
+            outcomes, proof = ProvablyFairService.draw_many('dice', rounds, client_seed)
+            rolls = np.array(outcomes, dtype=np.uint8) + 1
+        else:
+            rolls = np.frombuffer(outcome_pool(6).draw_many(rounds), dtype=np.uint8) + 1
+        wins = DiceGameService.check_win(bet_type, bet_value, rolls)
+        net = np.cumsum(np.where(wins, payout - stake, -stake))
+        # Net result before each round, for the balance check
+        before = np.concatenate(([0], net[:-1]))
+        
+        stops = np.zeros(rounds, dtype=bool)
+        if stop_loss is not None:
+            stops |= net <= -int(Decimal(stop_loss).quantize(cent) * 100)
+        if take_profit is not None:
+            stops |= net >= int(Decimal(take_profit).quantize(cent) * 100)
+        played = int(np.argmax(stops)) + 1 if stops.any() else rounds
+        
+        # The balance may move between reading it and the update, so retry
+        # with the fresh balance if the update is refused
+        for attempt in range(3):
+            balance = Wallet.objects.filter(user=user).values_list('balance', flat=True).first()
+            if balance is None:
+                raise Wallet.DoesNotExist("Wallet not found")
+            balance = int(Decimal(balance).quantize(cent) * 100)
+            short = np.flatnonzero(balance + before[:played] < stake)
+            count = int(short[0]) if short.size else played
+            if count == 0:
+                raise ValueError(f"Insufficient balance. Available: {Decimal(balance) / 100}, Required: {bet_amount}")
+            try:
+                new_balance = DiceGameService._settle_auto_play(user, bet_type, stake, payout, wins[:count])
+                break
+            except ValueError:
+                if attempt == 2:
+                    raise
+        
+        if short.size and count == short[0]:
+            stopped = 'balance'
+        elif count < rounds:
+            stopped = 'stop_loss' if stop_loss is not None and net[count - 1] < 0 else 'take_profit'
+        else:
+            stopped = None
+        
+        fair = {}
+        if proof is not None:
+            # Only the seeds of rounds actually played are revealed
+            proof['last_round'] = proof['first_round'] + count - 1
+            proof['server_seeds'] = proof['server_seeds'][:count]
+            fair = {'hash_chain_id': proof['chain'], 'client_seed': client_seed}
+        
+        won = wins[:count]
+        games = DiceGame.objects.bulk_create([
+            DiceGame(
+                user=user,
+                bet_amount=bet_amount,
+                bet_type=bet_type,
+                bet_value=bet_value,
+                dice_result=int(roll),
+                payout_amount=Decimal(payout) / 100 if is_win else Decimal('0.00'),
+                status='WON' if is_win else 'LOST',
+                chain_round=proof['first_round'] + index if proof is not None else None,
+                **fair,
+            )
+            for index, (roll, is_win) in enumerate(zip(rolls[:count], won))
+        ], batch_size=500)
+        
+        # Lengths of the runs of wins, for the streak stats
+        edges = np.diff(np.concatenate(([0], won.astype(np.int8), [0])))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        runs = ends - starts
+        wins_count = int(won.sum())
+        DiceGameService.record_stats(
+            user,
+            games=count,
+            wins=wins_count,
+            wagered=Decimal(bet_amount) * count,
+            won=Decimal(payout) / 100 * wins_count,
+            best_profit=Decimal(payout - stake) / 100 if wins_count else Decimal('0.00'),
+            leading_wins=int(runs[0]) if runs.size and starts[0] == 0 else 0,
+            longest_run=int(runs.max()) if runs.size else 0,
+            trailing_wins=int(runs[-1]) if runs.size and ends[-1] == count else 0,
+        )
+        
+        logger.info(f"{user.email} auto-played {count} {bet_type} bets, net ${Decimal(int(net[count - 1])) / 100}")
+        
+        return {
+            'games': games,
+            'rounds': count,
+            'wins': wins_count,
+            'net': Decimal(int(net[count - 1])) / 100,
+            'stopped': stopped,
+            'balance': new_balance,
+            'proof': proof,
+        }
+    
+    @staticmethod
+    def _settle_auto_play(user, bet_type, stake, payout, wins):
+        """
+        Record the stake of every auto-play round and the payout of every win
+        (amounts in cents) with one wallet update, so the betting stats count
+        each round like a single bet; the update is refused if the balance
+        could not cover every stake in turn
+        Returns: the new balance
+        """
+        lines = []
+        for index, is_win in enumerate(wins, 1):
+            lines.append((
+                Transaction.DEBIT, Transaction.GAME_STAKE, Decimal(stake) / 100,
+                f"Auto-play {bet_type} bet {index}"
+            ))
+            if is_win:
+                lines.append((
+                    Transaction.CREDIT, Transaction.GAME_PAYOUT, Decimal(payout) / 100,
+                    f"Won auto-play {bet_type} bet {index}"
+                ))
+        return Wallet.apply_batch(lines, user=user)[-1].balance_after
+    
+    @staticmethod
+    def update_stats(user, game):
+        """Update user's game statistics"""
+        won = game.status == 'WON'
+        DiceGameService.record_stats(
+            user,
+            games=1,
+            wins=int(won),
+            wagered=game.bet_amount,
+            won=game.payout_amount if won else Decimal('0.00'),
+            best_profit=game.payout_amount - game.bet_amount if won else Decimal('0.00'),
+            leading_wins=int(won),
+            longest_run=int(won),
+            trailing_wins=int(won),
+        )
+    
+    @staticmethod
+    def record_stats(user, games, wins, wagered, won, best_profit, leading_wins, longest_run, trailing_wins):
+        """
+        Add a run of consecutive games to the user's statistics
+        One UPDATE computed from the row's current values, so concurrent
+        rounds never lose each other's updates
+        leading_wins / trailing_wins: wins at the start / end of the run;
+        longest_run: longest run of wins within it
+        """
+        # A streak in progress continues into the leading wins; the SET
+        # expressions all read the row as it was before the UPDATE
+        if leading_wins == games:
+            current_streak = F('current_streak') + games
+        else:
+            current_streak = Value(trailing_wins)
+        
+        changes = {
+            'total_games': F('total_games') + games,
+            'total_wins': F('total_wins') + wins,
+            'total_losses': F('total_losses') + (games - wins),
+            'total_wagered': F('total_wagered') + wagered,
+            'total_won': F('total_won') + won,
+            'biggest_win': Case(
+                When(biggest_win__lt=best_profit, then=Value(best_profit)),
+                default=F('biggest_win'),
+            ),
+            'current_streak': current_streak,
+            'win_streak': Greatest(F('win_streak'), F('current_streak') + leading_wins, Value(longest_run)),
+        }
+        
+        if not GameStats.objects.for_user(user).update(**changes):
+            # Players from before stats were created at signup
+            GameStats.objects.using(shard_for_user(user)).get_or_create(user=user)
+            GameStats.objects.for_user(user).update(**changes)
+        
+        leaderboard.record(user.pk, won - wagered, games)
+    
+    @staticmethod
+    def get_game_history(user, limit=20):
+        """Get user's recent games"""
+        return DiceGame.objects.for_user(user)[:limit]
+    
+    @staticmethod
+    def get_leaderboard(limit=10, window='all_time'):
+        """
+        Get top players by net profit for 'daily', 'weekly' or 'all_time'
+        Returns: list of dicts with rank, user, net_profit and games
+        """
+        return leaderboard.top(window, limit)
+    
+    @staticmethod
+    def get_rank(user, window='all_time'):
+        """
+        Get the user's leaderboard position
+        Returns: dict with rank, net_profit, games and players, or None if the user hasn't played
+        """
+        return leaderboard.rank(user, window)
\ No newline at end of file
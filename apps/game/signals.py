@@ -0,0 +1,9 @@
+from apps.db.sharding import shard_for_user
+from .models import GameStats
+
+
+def create_user_game_stats(sender, instance, created, raw=False, **kwargs):
+    """Create the stats row at signup, so each round only has to UPDATE it"""
+    # raw: fixtures, and the copies apps.db mirrors to each shard
+    if created and not raw:
+        GameStats.objects.using(shard_for_user(instance)).create(user=instance)
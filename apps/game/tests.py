@@ -0,0 +1,360 @@
+import random
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from apps.fairness.services import ProvablyFairService
+from apps.wallet.models import Wallet, WalletManager
+from .leaderboard import RankedSet, leaderboard
+from .models import DiceGame, GameStats, LeaderboardEntry
+from .services import DiceGameService
+
+
+class GameStatsTest(TestCase):
+    """Test cases for the single-UPDATE stats bookkeeping"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.user = get_user_model().objects.create_user(email='stats@example.com', password='testpass123')
+    
+    def _game(self, won):
+        return DiceGame(
+            user=self.user,
+            bet_amount=Decimal('10.00'),
+            bet_type='HIGH',
+            payout_amount=Decimal('20.00') if won else Decimal('0.00'),
+            status='WON' if won else 'LOST'
+        )
+    
+    def test_row_created_at_signup(self):
+        """Test every new user starts with a stats row"""
+        self.assertTrue(GameStats.objects.filter(user=self.user).exists())
+    
+    def test_streaks_and_biggest_win(self):
+        """Test streaks, biggest win and totals follow the sequence of games"""
+        for won in [True, True, False, True]:
+            DiceGameService.update_stats(self.user, self._game(won))
+        
+        stats = GameStats.objects.get(user=self.user)
+        self.assertEqual(stats.total_games, 4)
+        self.assertEqual(stats.total_wins, 3)
+        self.assertEqual(stats.total_losses, 1)
+        self.assertEqual(stats.total_wagered, Decimal('40.00'))
+        self.assertEqual(stats.total_won, Decimal('60.00'))
+        self.assertEqual(stats.biggest_win, Decimal('10.00'))
+        self.assertEqual(stats.win_streak, 2)
+        self.assertEqual(stats.current_streak, 1)
+    
+    def test_missing_row_created(self):
+        """Test players from before signup-created stats still get a row"""
+        GameStats.objects.filter(user=self.user).delete()
+        
+        DiceGameService.update_stats(self.user, self._game(True))
+        
+        self.assertEqual(GameStats.objects.get(user=self.user).total_games, 1)
+
+
+class GameStatsConcurrencyTest(TransactionTestCase):
+    """Test parallel rounds don't lose each other's stats updates"""
+    
+    def setUp(self):
+        """Threads need their own connections to one database"""
+        if connection.is_in_memory_db():
+            self.skipTest("SQLite's shared in-memory test database locks whole tables")
+    
+    def test_parallel_rounds(self):
+        """Test every round from every thread is counted"""
+        user = get_user_model().objects.create_user(email='parallel@example.com', password='testpass123')
+        threads, rounds = 8, 25
+        errors = []
+        
+        def play(won):
+            try:
+                game = DiceGame(
+                    user=user,
+                    bet_amount=Decimal('1.00'),
+                    bet_type='HIGH',
+                    payout_amount=Decimal('2.00') if won else Decimal('0.00'),
+                    status='WON' if won else 'LOST'
+                )
+                for _ in range(rounds):
+                    DiceGameService.update_stats(user, game)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+        
+        workers = [threading.Thread(target=play, args=(i % 2 == 0,)) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        
+        self.assertEqual(errors, [])
+        stats = GameStats.objects.get(user=user)
+        self.assertEqual(stats.total_games, threads * rounds)
+        self.assertEqual(stats.total_wins, threads * rounds // 2)
+        self.assertEqual(stats.total_losses, threads * rounds // 2)
+        self.assertEqual(stats.total_wagered, Decimal(threads * rounds))
+        self.assertEqual(stats.total_won, Decimal(threads * rounds))
+
+
+class DiceApiTest(TestCase):
+    """Test cases for the dice API endpoints"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.user = get_user_model().objects.create_user(email='dice@example.com', password='testpass123')
+        Wallet.objects.create(user=self.user, balance=Decimal('100.00'))
+        self.client.force_login(self.user)
+    
+    def test_place_bet(self):
+        """Test a single round moves the wallet by its result and is recorded"""
+        data = self.client.post('/game/api/bet/', {'bet_amount': '10', 'bet_type': 'EVEN'}).json()
+        
+        self.assertTrue(data['success'])
+        game = DiceGame.objects.get(pk=data['game']['id'])
+        self.assertEqual(game.dice_result % 2 == 0, game.status == 'WON')
+        self.assertEqual(Decimal(str(data['balance'])), Decimal('100.00') + game.profit)
+        self.assertEqual(GameStats.objects.get(user=self.user).total_games, 1)
+    
+    def test_auto_play(self):
+        """Test auto-play settles every round with one wallet movement and a ledger row per stake and payout"""
+        data = self.client.post('/game/api/auto-play/', {
+            'bet_amount': '1', 'bet_type': 'SINGLE', 'bet_value': '3', 'rounds': '40'
+        }).json()
+        
+        self.assertTrue(data['success'])
+        self.assertEqual(data['rounds'], 40)
+        self.assertIsNone(data['stopped'])
+        self.assertEqual(data['wins'], data['dice_results'].count(3))
+        self.assertEqual(data['net'], data['wins'] * 6 - 40)
+        self.assertEqual(data['balance'], 100 + data['net'])
+        self.assertEqual(DiceGame.objects.filter(user=self.user).count(), 40)
+        self.assertEqual(self.user.wallet.transactions.count(), 40 + data['wins'])
+        self.assertEqual(GameStats.objects.get(user=self.user).total_wins, data['wins'])
+    
+    def test_auto_play_wallet_stats(self):
+        """Test the wallet betting stats count every auto-play round as a bet"""
+        with mock.patch('apps.game.services.outcome_pool') as pool:
+            # Rolls alternate 6 and 1, so every other HIGH bet wins
+            pool.return_value.draw_many.return_value = bytes([5, 0] * 5)
+            data = self.client.post('/game/api/auto-play/', {
+                'bet_amount': '1', 'bet_type': 'HIGH', 'rounds': '10'
+            }).json()
+        
+        stats = WalletManager.get_betting_stats(Wallet.objects.get(user=self.user))
+        self.assertEqual((data['rounds'], data['wins']), (10, 5))
+        self.assertEqual(stats['total_bets'], 10)
+        self.assertEqual(stats['total_wins'], 5)
+        self.assertEqual(Decimal(str(stats['total_winnings'])), Decimal('10.00'))
+        self.assertEqual(stats['win_rate'], 50)
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('100.00'))
+    
+    def test_auto_play_stops_at_balance(self):
+        """Test auto-play stops once the balance can't cover the next stake"""
+        Wallet.objects.filter(user=self.user).update(balance=Decimal('3.00'))
+        
+        with mock.patch('apps.game.services.outcome_pool') as pool:
+            # Every roll is a 1, so each HIGH bet loses
+            pool.return_value.draw_many.return_value = bytes(1000)
+            data = self.client.post('/game/api/auto-play/', {
+                'bet_amount': '1', 'bet_type': 'HIGH', 'rounds': '1000'
+            }).json()
+        
+        self.assertEqual((data['rounds'], data['stopped'], data['balance']), (3, 'balance', 0.0))
+        self.assertEqual(DiceGame.objects.filter(user=self.user, status='LOST').count(), 3)
+    
+    def test_auto_play_rejects_invalid_rounds(self):
+        """Test out-of-range round counts are refused without touching the wallet"""
+        response = self.client.post('/game/api/auto-play/', {
+            'bet_amount': '1', 'bet_type': 'HIGH', 'rounds': '1001'
+        })
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('100.00'))
+        self.assertFalse(DiceGame.objects.exists())
+
+
+class RankedSetTest(TestCase):
+    """Test cases for the skip list behind the leaderboards"""
+    
+    def test_matches_sorted_list(self):
+        """Test inserts, removals, ranks and slices against a sorted list"""
+        rng = random.Random(7)
+        ranked, expected = RankedSet(), []
+        for step in range(2000):
+            if expected and rng.random() < 0.4:
+                key = rng.choice(expected)
+                ranked.remove(key)
+                expected.remove(key)
+            else:
+                key = (rng.randint(-50, 50), step)
+                ranked.insert(key)
+                expected.append(key)
+            expected.sort()
+            
+            probe = (rng.randint(-50, 50), rng.randint(0, step))
+            start = rng.randint(0, len(expected))
+            self.assertEqual(len(ranked), len(expected))
+            self.assertEqual(ranked.bisect_left(probe), sum(1 for key in expected if key < probe))
+            self.assertEqual(ranked.slice(start, start + 5), expected[start:start + 5])
+    
+    def test_remove_missing(self):
+        """Test removing an absent key raises KeyError"""
+        with self.assertRaises(KeyError):
+            RankedSet().remove((1, 1))
+
+
+class LeaderboardTest(TestCase):
+    """Test cases for the windowed net-profit leaderboards"""
+    
+    def setUp(self):
+        """Set up test data"""
+        leaderboard.reset()
+        self.alice = get_user_model().objects.create_user(email='alice@example.com', password='testpass123')
+        self.bob = get_user_model().objects.create_user(email='bob@example.com', password='testpass123')
+        self.carol = get_user_model().objects.create_user(email='carol@example.com', password='testpass123')
+    
+    def _record(self, user, won, games=1):
+        DiceGameService.record_stats(
+            user, games=games, wins=0, wagered=Decimal('10.00') * games, won=won,
+            best_profit=Decimal('0.00'), leading_wins=0, longest_run=0, trailing_wins=0
+        )
+    
+    def _play(self, user, won, games=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._record(user, won, games)
+    
+    def test_ranked_by_net_profit(self):
+        """Test players are ranked by net profit, not gross winnings, with ties sharing a rank"""
+        self._play(self.alice, Decimal('100.00'), games=10)
+        self._play(self.bob, Decimal('30.00'))
+        self._play(self.carol, Decimal('30.00'))
+        
+        top = DiceGameService.get_leaderboard(10)
+        
+        self.assertEqual({top[0]['user'], top[1]['user']}, {self.bob, self.carol})
+        self.assertEqual([entry['rank'] for entry in top], [1, 1, 3])
+        self.assertEqual([entry['net_profit'] for entry in top], [Decimal('20.00'), Decimal('20.00'), Decimal('0.00')])
+        self.assertEqual(DiceGameService.get_rank(self.alice)['rank'], 3)
+    
+    def test_loaded_board_follows_new_games(self):
+        """Test games settled after the board is loaded move players up"""
+        self._play(self.alice, Decimal('50.00'))
+        self._play(self.bob, Decimal('20.00'))
+        self.assertEqual(DiceGameService.get_rank(self.bob)['rank'], 2)
+        
+        self._play(self.bob, Decimal('100.00'))
+        
+        self.assertEqual(DiceGameService.get_rank(self.bob), {
+            'rank': 1, 'net_profit': Decimal('100.00'), 'games': 2, 'players': 2
+        })
+        self.assertEqual(DiceGameService.get_leaderboard(1)[0]['user'], self.bob)
+    
+    def test_windows(self):
+        """Test past days count toward all-time only"""
+        yesterday = timezone.localdate() - timedelta(days=1)
+        LeaderboardEntry.objects.create(
+            user=self.alice, window='daily', period=yesterday, net_profit=Decimal('500.00'), games=5
+        )
+        LeaderboardEntry.objects.create(
+            user=self.alice, window='all_time', period=leaderboard.ALL_TIME, net_profit=Decimal('500.00'), games=5
+        )
+        self._play(self.bob, Decimal('20.00'))
+        
+        self.assertEqual(DiceGameService.get_leaderboard(1, 'daily')[0]['user'], self.bob)
+        self.assertEqual(DiceGameService.get_leaderboard(1, 'all_time')[0]['user'], self.alice)
+        self.assertIsNone(DiceGameService.get_rank(self.alice, 'daily'))
+    
+    def test_rolled_back_game_not_counted(self):
+        """Test a rolled-back game leaves no trace and doesn't stop later games being recorded"""
+        from django.db import transaction
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self._record(self.alice, Decimal('50.00'))
+                raise RuntimeError
+        self._play(self.alice, Decimal('20.00'))
+        
+        self.assertEqual(DiceGameService.get_rank(self.alice, 'weekly')['net_profit'], Decimal('10.00'))
+    
+    def test_leaderboard_page(self):
+        """Test the page lists the window's leaders and the viewer's own rank"""
+        self._play(self.alice, Decimal('50.00'))
+        self._play(self.bob, Decimal('5.00'))
+        self.client.force_login(self.bob)
+        
+        response = self.client.get('/game/leaderboard/', {'window': 'weekly'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['window'], 'weekly')
+        self.assertEqual([entry['user'] for entry in response.context['top_players']], [self.alice, self.bob])
+        self.assertEqual(response.context['my_rank']['rank'], 2)
+        self.assertContains(response, 'alice@example.com')
+        self.assertEqual(self.client.get('/game/leaderboard/', {'window': 'yearly'}).context['window'], 'all_time')
+    
+    def test_rebuild_from_games(self):
+        """Test rebuild_leaderboards recomputes entries from settled games and drops old ones"""
+        from io import StringIO
+        from django.core.management import call_command
+        for user, payout in [(self.alice, Decimal('0.00')), (self.bob, Decimal('20.00')), (self.bob, Decimal('20.00'))]:
+            DiceGame.objects.create(
+                user=user, bet_amount=Decimal('10.00'), bet_type='HIGH', payout_amount=payout,
+                status='WON' if payout else 'LOST'
+            )
+        DiceGame.objects.create(user=self.carol, bet_amount=Decimal('10.00'), bet_type='HIGH')
+        old = timezone.localdate() - timedelta(days=60)
+        LeaderboardEntry.objects.create(user=self.alice, window='daily', period=old, net_profit=Decimal('5.00'))
+        
+        out = StringIO()
+        call_command('rebuild_leaderboards', stdout=out)
+        
+        self.assertIn('Rebuilt leaderboards; dropped 1 old entries', out.getvalue())
+        self.assertFalse(LeaderboardEntry.objects.filter(period=old).exists())
+        self.assertEqual(DiceGameService.get_rank(self.bob, 'daily'), {
+            'rank': 1, 'net_profit': Decimal('20.00'), 'games': 2, 'players': 2
+        })
+        self.assertEqual(DiceGameService.get_rank(self.alice)['net_profit'], Decimal('-10.00'))
+        self.assertIsNone(DiceGameService.get_rank(self.carol))
+
+
+@override_settings(PROVABLY_FAIR=True, HASH_CHAIN_LENGTH=100)
+class ProvablyFairDiceTest(TestCase):
+    """Test cases for dice rolls drawn from hash chains"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.user = get_user_model().objects.create_user(email='fair@example.com', password='testpass123')
+        Wallet.objects.update_or_create(user=self.user, defaults={'balance': Decimal('1000.00')})
+        ProvablyFairService.top_up('dice', ahead=1)
+    
+    def test_place_bet_records_round(self):
+        """Test a fair roll is stored with its round and matches verification"""
+        game = DiceGameService.place_bet(self.user, Decimal('10.00'), 'HIGH', client_seed='abc')
+        game.refresh_from_db()
+        
+        self.assertEqual((game.hash_chain_id, game.chain_round, game.client_seed), (game.proof['chain'], 1, 'abc'))
+        result = ProvablyFairService.verify(game.hash_chain_id, game.chain_round, 'abc')
+        self.assertTrue(result['valid'])
+        self.assertEqual(result['outcome'] + 1, game.dice_result)
+    
+    def test_auto_play_reveals_played_rounds_only(self):
+        """Test auto-play stopped early skips its unplayed rounds and only reveals played seeds"""
+        result = DiceGameService.auto_play(
+            self.user, Decimal('10.00'), 'SINGLE', bet_value=6, rounds=50, take_profit=Decimal('1.00')
+        )
+        proof = result['proof']
+        games = sorted(result['games'], key=lambda game: game.chain_round)
+        
+        self.assertEqual(len(proof['server_seeds']), result['rounds'])
+        self.assertEqual([game.chain_round for game in games], list(range(1, result['rounds'] + 1)))
+        for game in games:
+            self.assertEqual(ProvablyFairService.verify(proof['chain'], game.chain_round)['outcome'] + 1, game.dice_result)
+        
+        game = DiceGameService.place_bet(self.user, Decimal('10.00'), 'LOW')
+        self.assertEqual(game.proof['round'], 51)
@@ -0,0 +1,13 @@
+from django.urls import path
+from . import views
+
+app_name = 'game'
+
+urlpatterns = [
+    # Dice API endpoints
+    path('api/bet/', views.place_bet_api, name='place_bet_api'),
+    path('api/auto-play/', views.auto_play_api, name='auto_play_api'),
+    
+    # Leaderboard
+    path('leaderboard/', views.leaderboard, name='leaderboard'),
+]
@@ -1,12 +1,11 @@
-# game/views.py
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from decimal import Decimal
-from .models import DiceGame, GameStats
+from .models import DiceGame, GameStats, LeaderboardEntry
 from .services import DiceGameService
-from wallet.models import Wallet
+from apps.wallet.models import Wallet
 
 
 @login_required
@@ -41,7 +40,8 @@ def place_bet_api(request):
                 user=request.user,
                 bet_amount=bet_amount,
                 bet_type=bet_type,
-                bet_value=bet_value
+                bet_value=bet_value,
+                client_seed=request.POST.get('client_seed', '')
             )
             
             # Get updated wallet balance
@@ -56,6 +56,7 @@ def place_bet_api(request):
                     'payout': float(game.payout_amount),
                     'profit': float(game.profit),
                 },
+                'proof': game.proof,
                 'balance': float(wallet.balance)
             })
             
@@ -73,6 +74,58 @@ def place_bet_api(request):
     return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
 
 
+@login_required
+def auto_play_api(request):
+    """API endpoint to play several rounds of the same bet"""
+    if request.method == 'POST':
+        try:
+            bet_amount = Decimal(request.POST.get('bet_amount'))
+            bet_type = request.POST.get('bet_type')
+            bet_value = request.POST.get('bet_value')
+            rounds = int(request.POST.get('rounds', 10))
+            stop_loss = request.POST.get('stop_loss')
+            take_profit = request.POST.get('take_profit')
+            
+            if bet_value:
+                bet_value = int(bet_value)
+            
+            # Play the rounds
+            result = DiceGameService.auto_play(
+                user=request.user,
+                bet_amount=bet_amount,
+                bet_type=bet_type,
+                bet_value=bet_value,
+                rounds=rounds,
+                stop_loss=Decimal(stop_loss) if stop_loss else None,
+                take_profit=Decimal(take_profit) if take_profit else None,
+                client_seed=request.POST.get('client_seed', '')
+            )
+            
+            return JsonResponse({
+                'success': True,
+                'rounds': result['rounds'],
+                'wins': result['wins'],
+                'net': float(result['net']),
+                'stopped': result['stopped'],
+                'dice_results': [game.dice_result for game in result['games']],
+                'proof': result['proof'],
+                'balance': float(result['balance'])
+            })
+            
+        except (ValueError, ArithmeticError) as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': 'An error occurred'
+            }, status=500)
+    
+    return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+
+
 @login_required
 def game_history(request):
     """View game history"""
@@ -89,10 +142,18 @@ def game_history(request):
 @login_required
 def leaderboard(request):
     """View leaderboard"""
-    top_players = DiceGameService.get_leaderboard(20)
+    window = request.GET.get('window', 'all_time')
+    if window not in dict(LeaderboardEntry.WINDOWS):
+        window = 'all_time'
+    
+    top_players = DiceGameService.get_leaderboard(20, window)
+    my_rank = DiceGameService.get_rank(request.user, window)
     
     context = {
         'top_players': top_players,
+        'my_rank': my_rank,
+        'window': window,
+        'windows': LeaderboardEntry.WINDOWS,
     }
     return render(request, 'game/leaderboard.html', context)
 
@@ -0,0 +1,309 @@
+import atexit
+import functools
+import hmac
+import json
+import os
+import re
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Upper bounds in seconds; wide enough for both in-memory work and lock waits
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Registry:
+    """
+    Process-local counters and histograms with Prometheus text exposition
+    With settings.METRICS_DIR set, each worker process periodically writes its
+    totals to <METRICS_DIR>/<pid>.json and a scrape sums every file, so
+    /metrics reports the whole server rather than whichever worker answered.
+    Files of exited workers are kept so counters never go backwards
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._counters = {}
+        self._histograms = {}
+        self._last_flush = 0.0
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def _register(self, kind, name, documentation, labelnames, *args):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = kind(self, name, documentation, tuple(labelnames), *args)
+            return self._metrics[name]
+
+    def _inc(self, key, amount):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + amount
+        self._maybe_flush()
+
+    def _observe(self, key, buckets, value):
+        with self._lock:
+            counts = self._histograms.get(key)
+            if counts is None:
+                counts = self._histograms[key] = [0] * len(buckets) + [0, 0.0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+        self._maybe_flush()
+
+    # Cross-process aggregation
+
+    def _directory(self):
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def _maybe_flush(self):
+        if not self._directory():
+            return
+        if time.monotonic() - self._last_flush >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+            self.flush()
+
+    def _snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), list(counts)] for (name, labels), counts in self._histograms.items()],
+            }
+
+    def flush(self):
+        """Write this process's totals for other workers' scrapes to pick up"""
+        directory = self._directory()
+        if not directory:
+            return
+        self._last_flush = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self._snapshot(), f)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """
+        Sum samples across worker processes (or just this one without METRICS_DIR)
+        Returns: (counters, histograms) keyed by (name, label values)
+        """
+        directory = self._directory()
+        if not directory:
+            snapshots = [self._snapshot()]
+        else:
+            self.flush()
+            snapshots = []
+            for filename in os.listdir(directory):
+                if not filename.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(directory, filename)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+
+        counters = {}
+        histograms = {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(labels))
+                counters[key] = counters.get(key, 0.0) + value
+            for name, labels, counts in snapshot['histograms']:
+                key = (name, tuple(labels))
+                if key in histograms:
+                    histograms[key] = [a + b for a, b in zip(histograms[key], counts)]
+                else:
+                    histograms[key] = list(counts)
+        return counters, histograms
+
+    def render(self):
+        """Text exposition format for every registered metric"""
+        counters, histograms = self.collect()
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            if metric.kind == 'counter':
+                for (sample, labels), value in sorted(counters.items()):
+                    if sample == name:
+                        lines.append(f"{name}_total{_labels(metric.labelnames, labels)} {_number(value)}")
+            else:
+                for (sample, labels), counts in sorted(histograms.items()):
+                    if sample != name:
+                        continue
+                    for bound, count in zip(metric.buckets, counts):
+                        bucket_labels = _labels(metric.labelnames + ('le',), labels + (_number(bound),))
+                        lines.append(f"{name}_bucket{bucket_labels} {count}")
+                    label_text = _labels(metric.labelnames, labels)
+                    inf_labels = _labels(metric.labelnames + ('le',), labels + ('+Inf',))
+                    lines.append(f"{name}_bucket{inf_labels} {counts[-2]}")
+                    lines.append(f"{name}_count{label_text} {counts[-2]}")
+                    lines.append(f"{name}_sum{label_text} {_number(counts[-1])}")
+        return '\n'.join(lines) + '\n'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def inc(self, amount=1, **labels):
+        self.registry._inc((self.name, _label_values(self.labelnames, labels)), amount)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        self.registry._observe((self.name, _label_values(self.labelnames, labels)), self.buckets, value)
+
+
+def _label_values(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    escaped = (
+        str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        for value in values
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+def _number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+http_requests = registry.counter(
+    'http_requests', "HTTP requests by view, method and status", ('view', 'method', 'status')
+)
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', "View latency including middleware below metrics", ('view',)
+)
+operations = registry.counter(
+    'app_operations', "Hot-path operation calls by outcome", ('operation', 'outcome')
+)
+operation_duration = registry.histogram(
+    'app_operation_duration_seconds', "Hot-path operation latency", ('operation',)
+)
+operation_failures = registry.counter(
+    'app_operation_failures', "Failed hot-path operations by reason", ('operation', 'reason')
+)
+coin_flips = registry.counter(
+    'coin_flips', "Coin flip plays on the home page by outcome", ('outcome',)
+)
+lock_wait = registry.histogram(
+    'db_lock_wait_seconds',
+    "Time spent in balance-changing UPDATEs, dominated by row/database lock waits under contention",
+    ('operation',)
+)
+
+
+def failure_reason(error):
+    """Short label for an exception or error message, e.g. 'insufficient_balance'"""
+    message = str(error) if str(error) else type(error).__name__
+    message = message.split('.')[0].split(':')[0]
+    return re.sub(r'[^a-z0-9]+', '_', message.lower()).strip('_')[:40] or 'unknown'
+
+
+def instrument(operation):
+    """
+    Record latency, outcome and failure reason for every call
+    A call fails if it raises, or returns a (False, message, ...) tuple like
+    the WalletManager.process_* helpers
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                _record(operation, started, failure_reason(e))
+                raise
+            if isinstance(result, tuple) and result and result[0] is False:
+                _record(operation, started, failure_reason(result[1] if len(result) > 1 else 'failed'))
+            else:
+                _record(operation, started, None)
+            return result
+        return wrapper
+    return decorator
+
+
+def _record(operation, started, reason):
+    operation_duration.observe(time.perf_counter() - started, operation=operation)
+    operations.inc(operation=operation, outcome='failure' if reason else 'success')
+    if reason:
+        operation_failures.inc(operation=operation, reason=reason)
+
+
+class MetricsMiddleware:
+    """Count and time every request by resolved view name"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, started)
+        return response
+
+    def _record(self, request, response, started):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        http_request_duration.observe(time.perf_counter() - started, view=view)
+        http_requests.inc(view=view, method=request.method, status=response.status_code)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint
+    Open to staff users, or to scrapers sending "Authorization: Bearer <METRICS_TOKEN>"
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    header = request.headers.get('Authorization', '')
+    scraper = bool(token) and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode())
+    if not (scraper or request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,88 @@
+import base64
+import json
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated queryset
+    """
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(timestamp, pk):
+    """Encode a (timestamp, id) position as an opaque URL-safe token"""
+    raw = json.dumps([timestamp.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a token from encode_cursor
+    Returns: (timestamp, pk), raises ValueError for malformed tokens
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        timestamp = parse_datetime(timestamp)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if timestamp is None or not isinstance(pk, int):
+        raise ValueError("Invalid cursor")
+    return timestamp, pk
+
+
+def paginate_keyset(queryset, field, cursor=None, page_size=25):
+    """
+    Return the page after `cursor`, newest first, ordered by (-field, -id)
+    Seeks past the cursor with a WHERE clause instead of OFFSET, so every
+    page costs the same as the first one on a (owner, -field) index
+    """
+    queryset = queryset.order_by(f'-{field}', '-id')
+
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'id__lt': pk})
+        )
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+
+    return KeysetPage(items, next_cursor)
+
+
+def get_page_size(request, default=25, maximum=100):
+    """Read ?limit= from the request, clamped to 1..maximum"""
+    try:
+        limit = int(request.GET.get('limit', default))
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, maximum))
+
+
+def next_page_url(request, page):
+    """Current URL with the cursor moved to the next page, or None on the last page"""
+    if not page.has_next:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = page.next_cursor
+    return f"{request.path}?{params.urlencode()}"
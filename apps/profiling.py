@@ -0,0 +1,157 @@
+import contextvars
+import json
+import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('apps.sql')
+
+# Recorder of the request being profiled; sync_to_async copies it into the
+# executor thread, so queries an async view runs through the ORM are counted
+_active_recorder = contextvars.ContextVar('sql_profiling_recorder', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view issued more queries than its declared budget (raised in strict mode)"""
+
+
+def query_budget(max_queries):
+    """
+    Declare the most queries a view may issue per request
+    Place it above other decorators so SQLProfilingMiddleware sees it on the
+    resolved view; going over logs a warning, or raises QueryBudgetExceeded
+    when settings.QUERY_BUDGET_STRICT is on (as it is under `manage.py test`)
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+class QueryRecorder:
+    """Times every statement run while it is the active recorder"""
+
+    def __init__(self, keep_slowest=5):
+        self.keep_slowest = keep_slowest
+        self.count = 0
+        self.total = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.perf_counter() - started)
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.total += duration
+        if len(self.slowest) < self.keep_slowest or duration > self.slowest[-1][0]:
+            self.slowest.append((duration, sql))
+            self.slowest.sort(key=lambda entry: entry[0], reverse=True)
+            del self.slowest[self.keep_slowest:]
+
+    def as_dict(self):
+        return {
+            'queries': self.count,
+            'sql_ms': round(self.total * 1000, 3),
+            'slowest': [
+                {'ms': round(duration * 1000, 3), 'sql': sql[:500]}
+                for duration, sql in self.slowest
+            ],
+        }
+
+
+def record_queries(execute, sql, params, many, context):
+    """execute_wrapper on every connection; times statements while a request is profiled"""
+    recorder = _active_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    """
+    connection_created receiver (connected in apps.db): wrap each connection
+    in whichever thread opens it, since connections are per thread
+    """
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_queries)
+
+
+class SQLProfilingMiddleware:
+    """
+    Record query count, total SQL time and the slowest statements per request
+    Emits them as X-SQL-* response headers (when SQL_PROFILING_HEADERS is on,
+    by default only with DEBUG) and as one JSON log line on the apps.sql logger,
+    and enforces budgets declared with @query_budget. Queries a streaming
+    response runs while it is being sent are not counted
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder, token = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _active_recorder.reset(token)
+        return self._finish(request, response, recorder)
+
+    async def __acall__(self, request):
+        recorder, token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _active_recorder.reset(token)
+        return self._finish(request, response, recorder)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, 'query_budget', None)
+        request._view_name = f"{view_func.__module__}.{view_func.__name__}"
+
+    def _start(self, request):
+        recorder = QueryRecorder(getattr(settings, 'SQL_PROFILING_SLOWEST', 5))
+        # Connections opened before apps.db connected install_query_recorder
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection=connection)
+        return recorder, _active_recorder.set(recorder)
+
+    def _finish(self, request, response, recorder):
+        stats = recorder.as_dict()
+        view_name = getattr(request, '_view_name', None)
+
+        if getattr(settings, 'SQL_PROFILING_HEADERS', settings.DEBUG):
+            response['X-SQL-Queries'] = str(stats['queries'])
+            response['X-SQL-Time-Ms'] = f"{stats['sql_ms']:.3f}"
+            if stats['slowest']:
+                response['X-SQL-Slowest-Ms'] = f"{stats['slowest'][0]['ms']:.3f}"
+
+        logger.info(json.dumps({
+            'event': 'sql_profile',
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            **stats,
+        }))
+
+        budget = getattr(request, '_query_budget', None)
+        if budget is not None and stats['queries'] > budget:
+            message = f"{view_name} issued {stats['queries']} queries (budget {budget}) for {request.path}"
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
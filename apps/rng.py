@@ -0,0 +1,135 @@
+"""
+Game outcomes from operating-system entropy
+
+Every game round needs one uniform outcome, e.g. a die face or a coin side.
+Calling os.urandom per round costs a system call, and the random module is a
+predictable Mersenne Twister. An OutcomePool reads os.urandom in large blocks
+and turns each block into outcomes in one C-level bytes.translate call:
+bytes at or above the largest multiple of `sides` are dropped (rejection
+sampling, so there is no modulo bias) and the rest are reduced modulo
+`sides`. A round then costs taking the next byte of the buffer, and a
+background thread prepares the next buffer as soon as one goes into use.
+"""
+import itertools
+import os
+import threading
+from django.conf import settings
+from apps.metrics import registry
+
+rng_refills = registry.counter(
+    'rng_refills', "Outcome buffer refills: background, or inline when a round had to wait for one", ('mode',)
+)
+
+
+class OutcomePool:
+    """Per-process buffer of uniform outcomes in range(sides), for sides up to 256"""
+
+    def __init__(self, sides, size=None):
+        if not 2 <= sides <= 256:
+            raise ValueError("An outcome pool needs between 2 and 256 sides")
+        self.sides = sides
+        self._size = size
+        # Bytes below limit map onto every outcome equally often
+        limit = 256 - 256 % sides
+        self._table = bytes(value % sides for value in range(256))
+        self._rejected = bytes(range(limit, 256))
+        self._lock = threading.Lock()
+        self._refilled = threading.Condition(self._lock)
+        self._reset()
+
+    def _reset(self):
+        self._outcomes = iter(b'')
+        self._next = None
+        self._refilling = False
+
+    @property
+    def size(self):
+        return self._size or getattr(settings, 'RNG_POOL_SIZE', 65536)
+
+    def _generate(self):
+        """At least size outcomes from fresh entropy"""
+        chunks = []
+        count = 0
+        while count < self.size:
+            # Oversample by the rejection rate so one read is nearly always enough
+            wanted = (self.size - count) * 256 // (256 - len(self._rejected)) + 64
+            chunk = os.urandom(wanted).translate(self._table, self._rejected)
+            chunks.append(chunk)
+            count += len(chunk)
+        return b''.join(chunks)
+
+    def draw(self):
+        """One outcome in range(sides)"""
+        # next() on a bytes iterator is a single C call, so concurrent threads
+        # never get the same outcome and the common case takes no lock
+        outcomes = self._outcomes
+        for outcome in outcomes:
+            return outcome
+        self._swap(outcomes)
+        return self.draw()
+
+    def draw_many(self, count):
+        """
+        count outcomes in range(sides)
+        Returns: bytes, one outcome per byte
+        """
+        parts = []
+        while count > 0:
+            outcomes = self._outcomes
+            part = bytes(itertools.islice(outcomes, count))
+            parts.append(part)
+            count -= len(part)
+            if count:
+                self._swap(outcomes)
+        return b''.join(parts)
+
+    def _swap(self, exhausted):
+        """Replace an exhausted buffer with the prepared one and start preparing the next"""
+        with self._lock:
+            if self._outcomes is not exhausted:
+                # Another thread already swapped
+                return
+            if self._next is None and self._refilling:
+                self._refilled.wait_for(lambda: not self._refilling)
+            if self._next is None:
+                self._next = self._generate()
+                rng_refills.inc(mode='inline')
+            self._outcomes, self._next = iter(self._next), None
+            self._refilling = True
+            threading.Thread(target=self._refill, name=f'rng-refill-{self.sides}', daemon=True).start()
+
+    def _refill(self):
+        try:
+            outcomes = self._generate()
+        except Exception:
+            outcomes = None
+        with self._lock:
+            if self._refilling:
+                self._next = outcomes
+                self._refilling = False
+                self._refilled.notify_all()
+                rng_refills.inc(mode='background')
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def outcome_pool(sides):
+    """This process's shared pool for sides outcomes"""
+    pool = _pools.get(sides)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(sides, OutcomePool(sides))
+    return pool
+
+
+def _reset_after_fork():
+    # A forked worker must never replay outcomes its parent or siblings also hold
+    for pool in _pools.values():
+        pool._lock = threading.Lock()
+        pool._refilled = threading.Condition(pool._lock)
+        pool._reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,105 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from apps.wallet.models import Wallet, WalletManager
+
+
+class MetricsTest(TestCase):
+    """Test cases for hot-path instrumentation and the /metrics endpoint"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.user = get_user_model().objects.create_user(
+            email='metrics@example.com',
+            password='testpass123'
+        )
+        self.wallet = Wallet.objects.create(
+            user=self.user,
+            balance=Decimal('50.00')
+        )
+    
+    def _counter(self, name, *labels):
+        from apps.metrics import registry
+        counters, histograms = registry.collect()
+        return counters.get((name, labels), 0)
+    
+    def test_failure_reasons_recorded(self):
+        """Test deduct outcomes and failure reasons are counted"""
+        successes = self._counter('app_operations', 'wallet_deduct', 'success')
+        failures = self._counter('app_operation_failures', 'wallet_deduct', 'insufficient_balance')
+        
+        self.wallet.deduct(Decimal('20.00'), "Stake")
+        with self.assertRaises(ValueError):
+            self.wallet.deduct(Decimal('500.00'), "Too much")
+        
+        self.assertEqual(self._counter('app_operations', 'wallet_deduct', 'success'), successes + 1)
+        self.assertEqual(
+            self._counter('app_operation_failures', 'wallet_deduct', 'insufficient_balance'),
+            failures + 1
+        )
+    
+    def test_process_helpers_failures_counted(self):
+        """Test (False, message, None) results from WalletManager count as failures"""
+        failures = self._counter('app_operation_failures', 'process_bet_placement', 'insufficient_balance')
+        
+        success, message, transaction = WalletManager.process_bet_placement(self.user, Decimal('99.00'))
+        
+        self.assertFalse(success)
+        self.assertEqual(
+            self._counter('app_operation_failures', 'process_bet_placement', 'insufficient_balance'),
+            failures + 1
+        )
+    
+    def test_metrics_endpoint(self):
+        """Test the scrape endpoint renders text exposition format"""
+        self.client.force_login(self.user)
+        self.client.post('/wallet/add-funds/', {'amount': '10'})
+        self.user.is_staff = True
+        self.user.save()
+        
+        response = self.client.get('/metrics')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_requests_total{view="wallet:add_funds",method="POST",status="200"}', body)
+        self.assertIn('db_lock_wait_seconds_bucket{operation="deposit",le="+Inf"}', body)
+    
+    def test_metrics_endpoint_requires_staff_or_token(self):
+        """Test anonymous and regular users are refused, and the scrape token is accepted"""
+        from django.test import override_settings
+        
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.logout()
+        
+        with override_settings(METRICS_TOKEN='scrape-secret'):
+            self.assertEqual(
+                self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403
+            )
+            self.assertEqual(
+                self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret').status_code, 200
+            )
+    
+    def test_metrics_summed_across_processes(self):
+        """Test files written by other worker processes are added in"""
+        import json
+        import os
+        import tempfile
+        from django.test import override_settings
+        from apps.metrics import registry
+        
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, '999999.json'), 'w') as f:
+                json.dump({
+                    'counters': [['coin_flips', ['win'], 5.0]],
+                    'histograms': [],
+                }, f)
+            local = self._counter('coin_flips', 'win')
+            
+            with override_settings(METRICS_DIR=directory):
+                counters, histograms = registry.collect()
+        
+        self.assertEqual(counters[('coin_flips', ('win',))], local + 5)
@@ -0,0 +1,107 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from apps.wallet.models import Wallet
+
+
+class SQLProfilingMiddlewareTest(TestCase):
+    """Test cases for per-request SQL profiling and query budgets"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.user = get_user_model().objects.create_user(
+            email='profiling@example.com',
+            password='testpass123'
+        )
+        self.wallet = Wallet.objects.create(
+            user=self.user,
+            balance=Decimal('100.00')
+        )
+        self.client.force_login(self.user)
+    
+    def _run(self, budget):
+        """Run a three-query view with the given budget through the middleware"""
+        from django.test import RequestFactory
+        from django.http import HttpResponse
+        from apps.profiling import SQLProfilingMiddleware, query_budget
+        
+        @query_budget(budget)
+        def view(request):
+            for _ in range(3):
+                Wallet.objects.filter(pk=self.wallet.pk).exists()
+            return HttpResponse('ok')
+        
+        request = RequestFactory().get('/budgeted/')
+        middleware = SQLProfilingMiddleware(lambda request: view(request))
+        middleware.process_view(request, view, (), {})
+        return middleware(request)
+    
+    def test_headers_and_log(self):
+        """Test query count and SQL time are reported per request"""
+        from django.test import override_settings
+        
+        with override_settings(SQL_PROFILING_HEADERS=True):
+            with self.assertLogs('apps.sql', level='INFO') as logs:
+                response = self.client.post('/wallet/add-funds/', {'amount': '10'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-SQL-Queries']), 0)
+        self.assertIn('X-SQL-Time-Ms', response)
+        self.assertIn('"view": "apps.wallet.views.add_funds"', logs.output[-1])
+    
+    def test_budget_warns(self):
+        """Test going over budget only logs outside strict mode"""
+        from django.test import override_settings
+        
+        with override_settings(QUERY_BUDGET_STRICT=False):
+            with self.assertLogs('apps.sql', level='WARNING') as logs:
+                response = self._run(budget=2)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('issued 3 queries (budget 2)', logs.output[0])
+    
+    def test_budget_raises_in_strict_mode(self):
+        """Test going over budget raises in strict (test) mode"""
+        from django.test import override_settings
+        from apps.profiling import QueryBudgetExceeded
+        
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            self._run(budget=3)
+            with self.assertRaises(QueryBudgetExceeded):
+                self._run(budget=2)
+    
+    async def test_async_requests_profiled(self):
+        """Test queries run in the sync_to_async executor are counted for async and sync views"""
+        from django.test import override_settings
+        
+        await self.async_client.aforce_login(self.user)
+        with override_settings(SQL_PROFILING_HEADERS=True):
+            async_view = await self.async_client.get('/wallet/api/balance/')
+            sync_view = await self.async_client.post('/wallet/add-funds/', {'amount': '10'})
+        
+        self.assertEqual(async_view.status_code, 200)
+        self.assertGreater(int(async_view['X-SQL-Queries']), 0)
+        self.assertEqual(sync_view.status_code, 200)
+        self.assertGreater(int(sync_view['X-SQL-Queries']), 0)
+    
+    async def test_async_budget_raises(self):
+        """Test an async view going over budget raises in strict mode"""
+        from django.test import RequestFactory, override_settings
+        from django.http import HttpResponse
+        from apps.profiling import QueryBudgetExceeded, SQLProfilingMiddleware, query_budget
+        
+        @query_budget(2)
+        async def view(request):
+            for _ in range(3):
+                await Wallet.objects.filter(pk=self.wallet.pk).aexists()
+            return HttpResponse('ok')
+        
+        async def get_response(request):
+            return await view(request)
+        
+        request = RequestFactory().get('/budgeted/')
+        middleware = SQLProfilingMiddleware(get_response)
+        middleware.process_view(request, view, (), {})
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            with self.assertRaisesMessage(QueryBudgetExceeded, 'issued 3 queries (budget 2)'):
+                await middleware(request)
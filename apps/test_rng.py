@@ -0,0 +1,67 @@
+from django.test import TestCase
+
+
+class OutcomePoolTest(TestCase):
+    """Test cases for the buffered OS-entropy game outcomes"""
+    
+    def _chi_square(self, counts, expected):
+        """Chi-square statistic and a critical value with about a one-in-a-million false alarm rate"""
+        statistic = sum((count - expected) ** 2 / expected for count in counts)
+        # Wilson-Hilferty approximation of the chi-square quantile at z = 4.75
+        k = len(counts) - 1
+        critical = k * (1 - 2 / (9 * k) + 4.75 * (2 / (9 * k)) ** 0.5) ** 3
+        return statistic, critical
+    
+    def test_no_modulo_bias(self):
+        """Test every byte value maps onto the outcomes evenly, with the remainder rejected"""
+        from collections import Counter
+        from unittest import mock
+        from apps.rng import OutcomePool
+        
+        with mock.patch('apps.rng.os.urandom', side_effect=lambda n: bytes(range(256)) * (n // 256 + 1)):
+            outcomes = OutcomePool(6, size=2520).draw_many(2520)
+        
+        self.assertEqual(Counter(outcomes), {outcome: 420 for outcome in range(6)})
+    
+    def test_uniform(self):
+        """Test outcome frequencies for several game sizes pass a chi-square test"""
+        from collections import Counter
+        from apps.rng import OutcomePool
+        
+        for sides in (2, 6, 37):
+            pool = OutcomePool(sides, size=4096)
+            counts = Counter(pool.draw_many(sides * 10000))
+            self.assertEqual(set(counts), set(range(sides)))
+            statistic, critical = self._chi_square([counts[outcome] for outcome in range(sides)], 10000)
+            self.assertLess(statistic, critical, f"{sides} sides")
+    
+    def test_consecutive_rounds_independent(self):
+        """Test pairs of consecutive single draws are uniform over all 36 combinations"""
+        from collections import Counter
+        from apps.rng import OutcomePool
+        
+        pool = OutcomePool(6, size=1000)
+        counts = Counter((pool.draw(), pool.draw()) for _ in range(72000))
+        
+        statistic, critical = self._chi_square([counts[(a, b)] for a in range(6) for b in range(6)], 2000)
+        self.assertLess(statistic, critical)
+    
+    def test_forked_worker_gets_fresh_outcomes(self):
+        """Test a forked process does not replay the outcomes buffered in its parent"""
+        import os
+        from apps.rng import outcome_pool
+        
+        pool = outcome_pool(6)
+        pool.draw()
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(write, pool.draw_many(32))
+            os._exit(0)
+        os.close(write)
+        os.waitpid(pid, 0)
+        child = os.read(read, 32)
+        os.close(read)
+        
+        self.assertEqual(len(child), 32)
+        self.assertNotEqual(child, pool.draw_many(32))
@@ -1,10 +1,11 @@
 # wallet/admin.py
 from django.contrib import admin
+from apps.db.routers import ReplicaChangeListMixin
 from .models import Wallet, Transaction
 
 
 @admin.register(Wallet)
-class WalletAdmin(admin.ModelAdmin):
+class WalletAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ['user', 'balance', 'created_at', 'updated_at']
     search_fields = ['user__username', 'user__email']
     readonly_fields = ['created_at', 'updated_at']
@@ -12,9 +13,9 @@ class WalletAdmin(admin.ModelAdmin):
 
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
-    list_display = ['reference_id', 'wallet', 'transaction_type', 'amount', 'status', 'created_at']
-    list_filter = ['transaction_type', 'status', 'created_at']
+class TransactionAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ['reference_id', 'wallet', 'transaction_type', 'category', 'amount', 'status', 'created_at']
+    list_filter = ['transaction_type', 'category', 'status', 'created_at']
     search_fields = ['reference_id', 'wallet__user__username', 'description']
     readonly_fields = ['id', 'reference_id', 'created_at']
     date_hierarchy = 'created_at'
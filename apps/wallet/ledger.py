@@ -0,0 +1,268 @@
+import atexit
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+from django.conf import settings
+from django.db import OperationalError, connections, transaction as db_transaction
+from django.utils import timezone
+from apps.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ledger_rows = registry.counter(
+    'ledger_rows', "Ledger rows by how they were written", ('mode',)
+)
+
+_STOP = object()
+
+
+class LedgerWriter:
+    """
+    Write-behind ledger for settings.LEDGER_WRITE_BEHIND
+    Balance updates still commit synchronously; once they have, their ledger
+    rows are put on a bounded in-process queue and a background thread
+    bulk-inserts them every LEDGER_FLUSH_INTERVAL seconds or LEDGER_BATCH_SIZE
+    rows. A full queue falls back to inserting in the caller, so memory stays
+    bounded and nothing is dropped. close() drains the queue and runs at
+    interpreter exit; rows lost to a crash show up in `manage.py check_ledger`
+    """
+
+    # Attempts per batch while the database stays locked
+    RETRIES = 5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'LEDGER_WRITE_BEHIND', False)
+
+    def submit(self, entries, using):
+        """Queue unsaved ledger rows to be written after the surrounding transaction commits"""
+        # Streams and callers see the id and time of the money movement, not of the flush
+        reserve_ids(entries, using)
+        now = timezone.now()
+        for entry in entries:
+            entry.created_at = now
+        db_transaction.on_commit(lambda: self._enqueue(entries, using), using=using)
+
+    def _enqueue(self, entries, using):
+        self._ensure_started()
+        for index, entry in enumerate(entries):
+            try:
+                self._queue.put_nowait((using, entry))
+            except queue.Full:
+                self._insert(using, entries[index:])
+                ledger_rows.inc(len(entries) - index, mode='overflow')
+                return
+
+    def _ensure_started(self):
+        # A forked worker inherits the queue but not the thread, so start afresh per process
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._queue = queue.Queue(maxsize=getattr(settings, 'LEDGER_QUEUE_SIZE', 10000))
+            self._thread = threading.Thread(target=self._run, name='ledger-writer', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        batch_size = getattr(settings, 'LEDGER_BATCH_SIZE', 500)
+        interval = getattr(settings, 'LEDGER_FLUSH_INTERVAL', 0.005)
+        stopping = False
+        try:
+            while not stopping:
+                item = self._queue.get()
+                batch = []
+                deadline = time.monotonic() + interval
+                while True:
+                    if item is _STOP:
+                        stopping = True
+                        self._queue.task_done()
+                        break
+                    batch.append(item)
+                    if len(batch) >= batch_size:
+                        break
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+        finally:
+            connections.close_all()
+
+    def _write(self, batch):
+        by_alias = {}
+        for using, entry in batch:
+            by_alias.setdefault(using, []).append(entry)
+        for using, entries in by_alias.items():
+            try:
+                self._insert(using, entries)
+                ledger_rows.inc(len(entries), mode='write_behind')
+            except Exception:
+                ledger_rows.inc(len(entries), mode='failed')
+                logger.exception(
+                    "Could not write %s ledger rows to %s; run `manage.py check_ledger --repair`",
+                    len(entries), using
+                )
+
+    def _insert(self, using, entries):
+        model = type(entries[0])
+        # A raw insert keeps the reserved ids and the created_at set in submit(),
+        # which bulk_create would replace through auto_now_add
+        fields = [
+            field for field in model._meta.concrete_fields
+            if not field.primary_key or entries[0].pk is not None
+        ]
+        batch_size = connections[using].ops.bulk_batch_size(fields, entries) or len(entries)
+        for attempt in range(self.RETRIES):
+            try:
+                with db_transaction.atomic(using=using):
+                    for start in range(0, len(entries), batch_size):
+                        model._base_manager.using(using)._insert(
+                            entries[start:start + batch_size], fields=fields, raw=True
+                        )
+                return
+            except OperationalError as e:
+                if 'locked' not in str(e) or attempt == self.RETRIES - 1:
+                    raise
+                time.sleep(0.01 * 2 ** attempt)
+
+    def flush(self):
+        """Block until every queued row has been written"""
+        if self._pid == os.getpid() and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Drain the queue and stop the thread; safe to call more than once"""
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+
+
+ledger_writer = LedgerWriter()
+atexit.register(ledger_writer.close)
+
+
+def reserve_ids(entries, using):
+    """
+    Give unsaved rows primary keys by advancing their table's AUTOINCREMENT
+    counter, inside the caller's write transaction so no other writer can
+    claim the same ids. SQLite only; elsewhere the rows keep pk None
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    model = type(entries[0])
+    table = model._meta.db_table
+    pk_column = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO sqlite_sequence (name, seq) "
+            f"SELECT %s, COALESCE(MAX({pk_column}), 0) FROM {connection.ops.quote_name(table)} "
+            f"WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)",
+            [table, table]
+        )
+        cursor.execute(
+            "UPDATE sqlite_sequence SET seq = seq + %s WHERE name = %s RETURNING seq",
+            [len(entries), table]
+        )
+        last, = cursor.fetchone()
+    for offset, entry in enumerate(entries, last - len(entries) + 1):
+        entry.pk = offset
+
+
+def write_ledger(entries, using):
+    """
+    Insert ledger rows, or hand them to the write-behind writer when it is on
+    Returns: the rows; write-behind rows get their ids at once but are only
+    inserted after commit
+    """
+    if not entries:
+        return entries
+    if ledger_writer.enabled:
+        ledger_writer.submit(entries, using)
+        return entries
+    ledger_rows.inc(len(entries), mode='sync')
+    if len(entries) == 1:
+        entries[0].save(using=using)
+        return entries
+    return type(entries[0]).objects.using(using).bulk_create(entries)
+
+
+def find_ledger_gaps(using, chunk_size=2000):
+    """
+    Wallets whose completed ledger rows do not account for their balance
+    Order-independent, so it works on rows inserted out of order by several
+    writers: each row's opening balance (balance_after minus its own amount)
+    must be another row's balance_after, except for the wallet's first row,
+    and the balance_after no row continues from must be the wallet's balance.
+    Wallets without rows must still hold the default balance
+    Yields: dicts with wallet_id, user_id, balance, chain_end and breaks
+    (missing rows in the middle of the chain; 0 means only the tail is missing)
+    """
+    from .models import Wallet, Transaction
+
+    cent = Decimal('0.01')
+    default_balance = Decimal(str(Wallet._meta.get_field('balance').default)).quantize(cent)
+    wallets = Wallet.objects.using(using).order_by('pk').values_list('pk', 'user_id', 'balance')
+    rows = (
+        Transaction.objects.using(using)
+        .filter(status=Transaction.COMPLETED)
+        .order_by('wallet_id')
+        .values_list('wallet_id', 'transaction_type', 'amount', 'balance_after')
+        .iterator(chunk_size=chunk_size)
+    )
+    grouped = itertools.groupby(rows, key=lambda row: row[0])
+    pending = next(grouped, None)
+
+    for wallet_id, user_id, balance in wallets.iterator(chunk_size=chunk_size):
+        while pending is not None and pending[0] < wallet_id:
+            pending = next(grouped, None)
+        ledger = []
+        if pending is not None and pending[0] == wallet_id:
+            ledger = list(pending[1])
+            pending = next(grouped, None)
+
+        balance = Decimal(balance).quantize(cent)
+        if not ledger:
+            if balance != default_balance:
+                yield {'wallet_id': wallet_id, 'user_id': user_id, 'balance': balance,
+                       'chain_end': default_balance, 'breaks': 0}
+            continue
+
+        afters = Counter()
+        befores = Counter()
+        for _, transaction_type, amount, balance_after in ledger:
+            after = Decimal(balance_after).quantize(cent)
+            signed = amount if transaction_type == Transaction.CREDIT else -amount
+            afters[after] += 1
+            befores[(after - signed).quantize(cent)] += 1
+
+        starts = befores - afters
+        ends = afters - befores
+        breaks = max(sum(starts.values()) - 1, 0)
+        if len(ends) == 1:
+            chain_end = next(iter(ends))
+        else:
+            # The chain returns to its opening balance, so any balance it passed through is a valid end
+            chain_end = balance if balance in afters else None
+        if breaks or chain_end != balance:
+            yield {'wallet_id': wallet_id, 'user_id': user_id, 'balance': balance,
+                   'chain_end': chain_end, 'breaks': breaks}
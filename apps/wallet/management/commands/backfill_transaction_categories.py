@@ -0,0 +1,80 @@
+import re
+from django.core.management.base import BaseCommand
+from apps.db.sharding import on_shard, shard_aliases
+from apps.wallet.models import Transaction
+
+
+BET_ID_PATTERN = re.compile(r'\(Bet #(\d+)\)')
+
+
+class Command(BaseCommand):
+    help = "Classify uncategorized transactions in primary-key chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Report what would be classified without writing"
+        )
+
+    def handle(self, *args, **options):
+        from apps.bets.models import Bet
+
+        chunk_size = options['chunk_size']
+        counts = {}
+        unclassified = 0
+        for alias in shard_aliases():
+            last_id = 0
+            with on_shard(alias):
+                while True:
+                    rows = list(
+                        Transaction.objects.filter(category='', pk__gt=last_id)
+                        .order_by('pk')
+                        .values_list('pk', 'transaction_type', 'description')[:chunk_size]
+                    )
+                    if not rows:
+                        break
+                    last_id = rows[-1][0]
+
+                    by_category = {}
+                    payout_bets = {}
+                    for pk, transaction_type, description in rows:
+                        category = Transaction.classify(transaction_type, description)
+                        if not category:
+                            unclassified += 1
+                            continue
+                        if category == Transaction.BET_PAYOUT:
+                            # Cancel refunds used to be written as bet winnings
+                            match = BET_ID_PATTERN.search(description)
+                            if match:
+                                payout_bets[pk] = int(match.group(1))
+                        by_category.setdefault(category, []).append(pk)
+
+                    if payout_bets:
+                        cancelled = set(Bet.objects.filter(
+                            pk__in=set(payout_bets.values()),
+                            status=Bet.CANCELLED
+                        ).values_list('pk', flat=True))
+                        refunds = [pk for pk, bet_id in payout_bets.items() if bet_id in cancelled]
+                        if refunds:
+                            refund_set = set(refunds)
+                            by_category[Transaction.BET_PAYOUT] = [
+                                pk for pk in by_category[Transaction.BET_PAYOUT] if pk not in refund_set
+                            ]
+                            by_category.setdefault(Transaction.REFUND, []).extend(refunds)
+
+                    for category, pks in by_category.items():
+                        if not options['dry_run'] and pks:
+                            Transaction.objects.filter(pk__in=pks).update(category=category)
+                        counts[category] = counts.get(category, 0) + len(pks)
+
+                    self.stdout.write(f"{alias}: processed up to transaction #{last_id}")
+
+        for category, count in sorted(counts.items()):
+            self.stdout.write(f"{category}: {count}")
+        if unclassified:
+            self.stdout.write(self.style.WARNING(f"{unclassified} transactions left unclassified"))
+
+        action = "Would classify" if options['dry_run'] else "Classified"
+        self.stdout.write(self.style.SUCCESS(f"{action} {sum(counts.values())} transactions"))
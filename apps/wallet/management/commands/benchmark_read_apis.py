@@ -0,0 +1,178 @@
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from apps.benchmarking import summarize_latencies
+from apps.events.models import Event
+from apps.wallet.models import Wallet
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the read-only wallet/bet APIs served through config/wsgi.py "
+        "(thread pool) and config/asgi.py (one event loop), in-process"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requests per endpoint per server")
+        parser.add_argument('--concurrency', type=int, default=16, help="WSGI threads / in-flight ASGI requests")
+        parser.add_argument('--users', type=int, default=16, help="Benchmark users to spread requests over")
+        parser.add_argument('--event', type=int, help="Event id for check-eligibility (defaults to the newest event)")
+        parser.add_argument('--host', default='127.0.0.1', help="Host header; must pass ALLOWED_HOSTS")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        from config.asgi import application as asgi_application
+        from config.wsgi import application as wsgi_application
+
+        if options['requests'] < 1 or options['concurrency'] < 1 or options['users'] < 1:
+            raise CommandError("--requests, --concurrency and --users must be positive")
+
+        cookies = self._session_cookies(options['users'])
+        endpoints = self._endpoints(options['event'])
+        host = options['host']
+
+        results = {}
+        for name, path, query in endpoints:
+            requests = [(path, query, cookies[i % len(cookies)]) for i in range(options['requests'])]
+            results[name] = {
+                'wsgi': self._run_wsgi(wsgi_application, requests, host, options['concurrency']),
+                'asgi': asyncio.run(self._run_asgi(asgi_application, requests, host, options['concurrency'])),
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{'endpoint':<20} {'server':<6} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for name, servers in results.items():
+            for server, summary in servers.items():
+                self.stdout.write(
+                    f"{name:<20} {server:<6} {summary['requests_per_second']:>10.1f} "
+                    f"{summary['p50_ms']:>9.2f} {summary['p99_ms']:>9.2f} {summary['errors']:>7}"
+                )
+
+    def _session_cookies(self, count):
+        """Log in `count` benchmark users (created with wallets if missing) and return Cookie headers"""
+        User = get_user_model()
+        cookies = []
+        for i in range(count):
+            user, created = User.objects.get_or_create(email=f'readbench{i}@example.com')
+            if created:
+                user.set_unusable_password()
+                user.save()
+            Wallet.objects.get_or_create(user=user, defaults={'balance': Decimal('1000.00')})
+
+            client = Client()
+            client.force_login(user)
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+            cookies.append(f"{settings.SESSION_COOKIE_NAME}={session}")
+        return cookies
+
+    def _endpoints(self, event_id):
+        endpoints = [
+            ('wallet balance', '/wallet/api/balance/', ''),
+            ('check balance', '/wallet/api/check-balance/', 'amount=10'),
+            ('wallet stats', '/wallet/api/stats/', ''),
+            ('bet stats', '/bets/api/stats/', ''),
+        ]
+        if event_id is None:
+            event_id = Event.objects.order_by('-id').values_list('id', flat=True).first()
+        if event_id is not None:
+            endpoints.append(('bet eligibility', f'/bets/api/check-eligibility/{event_id}/', ''))
+        else:
+            self.stderr.write("No events found; skipping check-eligibility")
+        return endpoints
+
+    def _run_wsgi(self, application, requests, host, concurrency):
+        def call(request):
+            path, query, cookie = request
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'SCRIPT_NAME': '',
+                'PATH_INFO': path,
+                'QUERY_STRING': query,
+                'SERVER_NAME': host,
+                'SERVER_PORT': '80',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': host,
+                'HTTP_COOKIE': cookie,
+                'REMOTE_ADDR': '127.0.0.1',
+                'wsgi.version': (1, 0),
+                'wsgi.url_scheme': 'http',
+                'wsgi.input': io.BytesIO(b''),
+                'wsgi.errors': io.StringIO(),
+                'wsgi.multithread': True,
+                'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            statuses = []
+            started = time.perf_counter()
+            body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+            try:
+                for chunk in body:
+                    pass
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+            return time.perf_counter() - started, int(statuses[0].split()[0])
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(call, requests))
+        return self._summarize(outcomes, time.perf_counter() - started)
+
+    async def _run_asgi(self, application, requests, host, concurrency):
+        limit = asyncio.Semaphore(concurrency)
+
+        async def call(request):
+            path, query, cookie = request
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': path,
+                'raw_path': path.encode(),
+                'query_string': query.encode(),
+                'root_path': '',
+                'headers': [(b'host', host.encode()), (b'cookie', cookie.encode())],
+                'client': ('127.0.0.1', 0),
+                'server': (host, 80),
+            }
+            sent_request = False
+            statuses = []
+
+            async def receive():
+                nonlocal sent_request
+                if not sent_request:
+                    sent_request = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # Nothing more to read; Django cancels this wait once the response is sent
+                await asyncio.Event().wait()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+
+            async with limit:
+                started = time.perf_counter()
+                await application(scope, receive, send)
+                return time.perf_counter() - started, statuses[0]
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(call(request) for request in requests))
+        return self._summarize(outcomes, time.perf_counter() - started)
+
+    @staticmethod
+    def _summarize(outcomes, elapsed):
+        latencies = [latency for latency, status in outcomes]
+        errors = sum(1 for latency, status in outcomes if status >= 400)
+        return summarize_latencies(latencies, elapsed, errors)
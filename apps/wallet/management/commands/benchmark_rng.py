@@ -0,0 +1,51 @@
+import json
+import random
+import secrets
+import time
+from django.core.management.base import BaseCommand, CommandError
+from apps.rng import OutcomePool
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare game-outcome draws per second: the random module, secrets.randbelow, "
+        "and the apps.rng outcome pool one round and one auto-play batch at a time"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=1000000, help="Outcomes drawn per method")
+        parser.add_argument('--sides', type=int, default=6)
+        parser.add_argument('--batch', type=int, default=1000, help="Outcomes per draw_many call")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        rounds, sides, batch = options['rounds'], options['sides'], options['batch']
+        if rounds < 1 or batch < 1 or not 2 <= sides <= 256:
+            raise CommandError("--rounds and --batch must be positive and --sides between 2 and 256")
+
+        pool = OutcomePool(sides)
+        pool.draw()
+        methods = {
+            'random.randrange': lambda: [random.randrange(sides) for _ in range(rounds)],
+            'secrets.randbelow': lambda: [secrets.randbelow(sides) for _ in range(rounds)],
+            'pool.draw': lambda: [pool.draw() for _ in range(rounds)],
+            'pool.draw_many': lambda: [pool.draw_many(batch) for _ in range(-(-rounds // batch))],
+        }
+
+        results = {}
+        for name, method in methods.items():
+            started = time.perf_counter()
+            method()
+            elapsed = time.perf_counter() - started
+            results[name] = {
+                'outcomes_per_second': round(rounds / elapsed),
+                'ns_per_outcome': round(elapsed / rounds * 1e9, 1),
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{'method':<20} {'outcomes/s':>14} {'ns/outcome':>11}")
+        for name, summary in results.items():
+            self.stdout.write(f"{name:<20} {summary['outcomes_per_second']:>14,} {summary['ns_per_outcome']:>11}")
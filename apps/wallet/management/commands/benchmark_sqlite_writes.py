@@ -0,0 +1,166 @@
+import copy
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction, OperationalError
+from apps.benchmarking import summarize_latencies
+
+
+CONFIGURATIONS = {
+    'stock': ('django.db.backends.sqlite3', {}),
+    'tuned': ('apps.db.sqlite3', {'serialize_writes': False}),
+    'serialized': ('apps.db.sqlite3', {'serialize_writes': True}),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent wallet-style write throughput on a scratch SQLite file "
+        "with the stock backend, apps.db.sqlite3 (WAL, BEGIN IMMEDIATE, retries) and "
+        "apps.db.sqlite3 with serialize_writes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds per configuration")
+        parser.add_argument('--wallets', type=int, default=100)
+        parser.add_argument('--read-ratio', type=float, default=0.5, help="Share of operations that only read")
+        parser.add_argument(
+            '--configs',
+            default=','.join(CONFIGURATIONS),
+            help=f"Comma-separated subset of: {', '.join(CONFIGURATIONS)}"
+        )
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['configs'].split(',')]
+        unknown = set(names) - set(CONFIGURATIONS)
+        if unknown:
+            raise CommandError(f"Unknown configurations: {', '.join(sorted(unknown))}")
+        if options['threads'] < 1 or options['duration'] <= 0 or options['wallets'] < 1:
+            raise CommandError("--threads, --duration and --wallets must be positive")
+
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for name in names:
+                engine, extra = CONFIGURATIONS[name]
+                alias = f'sqlite_bench_{name}'
+                self._configure(alias, engine, extra, os.path.join(directory, f'{name}.sqlite3'))
+                try:
+                    self._create_schema(alias, options['wallets'])
+                    results[name] = self._run(alias, options)
+                finally:
+                    connections[alias].close()
+                    del connections[alias]
+                    del connections.settings[alias]
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'config':<12} {'writes/s':>9} {'ops/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'locked':>7}"
+        )
+        for name, summary in results.items():
+            self.stdout.write(
+                f"{name:<12} {summary['writes_per_second']:>9.1f} {summary['requests_per_second']:>9.1f} "
+                f"{summary['p50_ms']:>8.2f} {summary['p99_ms']:>8.2f} {summary['errors']:>7} {summary['locked']:>7}"
+            )
+
+    def _configure(self, alias, engine, extra_options, path):
+        settings_dict = copy.deepcopy(connections.settings['default'])
+        settings_dict.update({
+            'ENGINE': engine,
+            'NAME': path,
+            'OPTIONS': dict(extra_options),
+            'TEST': {'NAME': path},
+        })
+        connections.settings[alias] = settings_dict
+
+    def _create_schema(self, alias, wallets):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE bench_wallets (id INTEGER PRIMARY KEY, balance INTEGER NOT NULL)"
+            )
+            cursor.execute(
+                "CREATE TABLE bench_ledger (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "wallet_id INTEGER NOT NULL, amount INTEGER NOT NULL, balance_after INTEGER NOT NULL)"
+            )
+            cursor.execute("CREATE INDEX bench_ledger_wallet ON bench_ledger (wallet_id)")
+            cursor.executemany(
+                "INSERT INTO bench_wallets (id, balance) VALUES (%s, %s)",
+                [(i, 10 ** 9) for i in range(1, wallets + 1)]
+            )
+
+    def _run(self, alias, options):
+        deadline = time.monotonic() + options['duration']
+        lock = threading.Lock()
+        latencies = []
+        counts = {'writes': 0, 'errors': 0, 'locked': 0}
+
+        def worker(seed):
+            rng = random.Random(seed)
+            connection = connections[alias]
+            try:
+                while time.monotonic() < deadline:
+                    wallet_id = rng.randint(1, options['wallets'])
+                    write = rng.random() >= options['read_ratio']
+                    started = time.perf_counter()
+                    error = None
+                    try:
+                        if write:
+                            self._place_bet(alias, connection, wallet_id)
+                        else:
+                            self._read_history(connection, wallet_id)
+                    except OperationalError as e:
+                        error = e
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        if error is not None:
+                            counts['errors'] += 1
+                            counts['locked'] += 'locked' in str(error)
+                        elif write:
+                            counts['writes'] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        summary = summarize_latencies(latencies, elapsed, counts['errors'])
+        summary['writes'] = counts['writes']
+        summary['writes_per_second'] = round(counts['writes'] / elapsed, 2)
+        summary['locked'] = counts['locked']
+        return summary
+
+    @staticmethod
+    def _place_bet(alias, connection, wallet_id):
+        """Read the balance, then debit it and write a ledger row, like a get-then-update view"""
+        with transaction.atomic(using=alias):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT balance FROM bench_wallets WHERE id = %s", [wallet_id])
+                balance = cursor.fetchone()[0] - 1
+                cursor.execute("UPDATE bench_wallets SET balance = %s WHERE id = %s", [balance, wallet_id])
+                cursor.execute(
+                    "INSERT INTO bench_ledger (wallet_id, amount, balance_after) VALUES (%s, %s, %s)",
+                    [wallet_id, 1, balance]
+                )
+
+    @staticmethod
+    def _read_history(connection, wallet_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, amount, balance_after FROM bench_ledger WHERE wallet_id = %s ORDER BY id DESC LIMIT 20",
+                [wallet_id]
+            )
+            cursor.fetchall()
@@ -0,0 +1,49 @@
+import sys
+from django.core.management.base import BaseCommand
+from apps.exports import EXPORT_FORMATS, TRANSACTION_EXPORT_FIELDS, export_sharded_lines
+from apps.wallet.models import Transaction
+
+
+class Command(BaseCommand):
+    help = "Stream wallet transactions to CSV or NDJSON, optionally for one user"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Email of the user to export (default: all users)")
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', help="File to write (default: stdout)")
+        parser.add_argument('--type', choices=[choice for choice, label in Transaction.TRANSACTION_TYPES])
+        parser.add_argument('--status', choices=[choice for choice, label in Transaction.STATUS_CHOICES])
+        parser.add_argument('--category', choices=[choice for choice, label in Transaction.CATEGORY_CHOICES])
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        transactions = Transaction.objects.all()
+        if options['user']:
+            transactions = transactions.filter(wallet__user__email=options['user'])
+        if options['type']:
+            transactions = transactions.filter(transaction_type=options['type'])
+        if options['status']:
+            transactions = transactions.filter(status=options['status'])
+        if options['category']:
+            transactions = transactions.filter(category=options['category'])
+
+        lines = export_sharded_lines(
+            transactions.order_by('-created_at', '-id').on_each_shard(),
+            TRANSACTION_EXPORT_FIELDS,
+            options['format'],
+            options['chunk_size']
+        )
+
+        output = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            count = 0
+            for line in lines:
+                output.write(line)
+                count += 1
+        finally:
+            if options['output']:
+                output.close()
+
+        if options['output']:
+            rows = count - 1 if options['format'] == 'csv' else count
+            self.stderr.write(self.style.SUCCESS(f"Exported {rows} transactions to {options['output']}"))
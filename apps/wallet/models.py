@@ -1,9 +1,15 @@
-from django.db import models
+import time
+from django.db import models, connections, router, transaction as db_transaction
 from apps.accounts.models import CustomUser
+from apps.db.sharding import ShardedManager
 from django.core.validators import MinValueValidator
 from django.db.models import F
 from decimal import Decimal
 from django.utils import timezone
+from apps.metrics import instrument, lock_wait
+from apps.pagination import paginate_keyset
+from .ledger import write_ledger
+from .notifications import publish_on_commit
 
 
 class Wallet(models.Model):
@@ -22,6 +28,8 @@ class Wallet(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     
+    objects = ShardedManager()
+    
     class Meta:
         db_table = 'wallets'
         ordering = ['-created_at']
@@ -37,49 +45,213 @@ class Wallet(models.Model):
         """Check if wallet has enough balance for a transaction"""
         return self.balance >= Decimal(str(amount))
     
-    def deduct(self, amount, description=""):
+    @instrument('wallet_deduct')
+    def deduct(self, amount, description="", category=None):
         """
         Deduct amount from wallet (for placing bets)
-        Returns: Transaction object if successful, None otherwise
+        Returns: Transaction object if successful, raises ValueError otherwise
         """
-        amount = Decimal(str(amount))
-        if not self.has_sufficient_balance(amount):
-            raise ValueError(f"Insufficient balance. Available: {self.balance}, Required: {amount}")
-        
-        self.balance = F('balance') - amount
-        self.save(update_fields=['balance', 'updated_at'])
-        self.refresh_from_db()
-        
-        # Create transaction record
-        transaction = Transaction.objects.create(
-            wallet=self,
-            transaction_type=Transaction.DEBIT,
-            amount=amount,
-            balance_after=self.balance,
-            description=description or "Bet placed"
+        transaction = Wallet.apply_debit(
+            amount,
+            description or "Bet placed",
+            category or Transaction.BET_STAKE,
+            using=router.db_for_write(Wallet, instance=self),
+            pk=self.pk
         )
+        self.balance = transaction.balance_after
         return transaction
     
-    def credit(self, amount, description=""):
+    @instrument('wallet_credit')
+    def credit(self, amount, description, category):
         """
         Add amount to wallet (for winnings or deposits)
+        category: required, so refunds and payouts are never recorded as deposits
         Returns: Transaction object
         """
-        amount = Decimal(str(amount))
-        self.balance = F('balance') + amount
-        self.save(update_fields=['balance', 'updated_at'])
-        self.refresh_from_db()
-        
-        # Create transaction record
-        transaction = Transaction.objects.create(
-            wallet=self,
-            transaction_type=Transaction.CREDIT,
-            amount=amount,
-            balance_after=self.balance,
-            description=description or "Amount credited"
+        transaction = Wallet.apply_credit(
+            amount,
+            description or "Amount credited",
+            category,
+            using=router.db_for_write(Wallet, instance=self),
+            pk=self.pk
         )
+        self.balance = transaction.balance_after
         return transaction
     
+    @classmethod
+    def apply_debit(cls, amount, description, category, using=None, minimum_balance=None, **lookup):
+        """
+        Debit a wallet with a single conditional UPDATE and write the ledger row
+        The balance check happens in the WHERE clause, so concurrent debits
+        can never overdraw the wallet
+        minimum_balance: refuse unless the balance before the debit is at least this
+        lookup: one wallet field, e.g. pk=... or user=...
+        Returns: Transaction object, raises ValueError if the debit is refused
+        """
+        return cls._apply_balance_change(
+            [(amount, description)], Transaction.DEBIT, category, using, lookup, minimum_balance
+        )[0]
+    
+    @classmethod
+    def apply_credit(cls, amount, description, category, using=None, minimum_balance=None, **lookup):
+        """
+        Credit a wallet with a single UPDATE and write the ledger row
+        minimum_balance: refuse unless the balance before the credit is at least this
+        lookup: one wallet field, e.g. pk=... or user=...
+        Returns: Transaction object, raises ValueError if the wallet is inactive
+        or below minimum_balance
+        """
+        return cls._apply_balance_change(
+            [(amount, description)], Transaction.CREDIT, category, using, lookup, minimum_balance
+        )[0]
+    
+    @classmethod
+    def apply_batch_debit(cls, lines, category, using=None, **lookup):
+        """
+        Debit the total of several (amount, description) lines in one conditional
+        UPDATE and bulk insert one ledger row per line
+        Returns: list of Transaction objects, raises ValueError if the debit is refused
+        """
+        return cls._apply_balance_change(lines, Transaction.DEBIT, category, using, lookup)
+    
+    @classmethod
+    def apply_batch(cls, lines, using=None, minimum_balance=None, **lookup):
+        """
+        Apply debit and credit lines in order with one conditional UPDATE and
+        bulk insert one ledger row per line, e.g. the stake and payout of every
+        round of a dice auto-play run
+        lines: (transaction_type, category, amount, description) tuples
+        Returns: list of Transaction objects, raises ValueError if the update is
+        refused because the balance would go negative between lines
+        """
+        return cls._apply_lines(lines, using, lookup, minimum_balance)
+    
+    @classmethod
+    def _apply_balance_change(cls, lines, transaction_type, category, using, lookup, minimum_balance=None):
+        """Move the total of (amount, description) lines and record each line"""
+        return cls._apply_lines(
+            [(transaction_type, category, amount, description) for amount, description in lines],
+            using, lookup, minimum_balance
+        )
+    
+    @classmethod
+    def _apply_lines(cls, lines, using, lookup, minimum_balance=None):
+        """Move the net of (transaction_type, category, amount, description) lines and record each line"""
+        (name, value), = lookup.items()
+        field = cls._meta.get_field('id' if name == 'pk' else name)
+        if field.is_relation:
+            value = getattr(value, 'pk', value)
+        
+        lines = [
+            (transaction_type, category, Decimal(str(amount)), description)
+            for transaction_type, category, amount, description in lines
+        ]
+        if not lines or any(amount <= 0 for _, _, amount, _ in lines):
+            raise ValueError("Amount must be greater than zero")
+        
+        # The balance must cover the deepest point the lines reach, not just their net
+        delta = lowest = Decimal('0.00')
+        for transaction_type, category, amount, description in lines:
+            delta += amount if transaction_type == Transaction.CREDIT else -amount
+            lowest = min(lowest, delta)
+        floor = -lowest
+        if minimum_balance is not None:
+            floor = max(floor, Decimal(str(minimum_balance)))
+        
+        using = using or router.db_for_write(cls)
+        with db_transaction.atomic(using=using):
+            started = time.perf_counter()
+            row = cls._update_balance(field.column, value, delta, using, floor)
+            lock_wait.observe(time.perf_counter() - started, operation=lines[0][1] or lines[0][0])
+            if row is None:
+                cls._raise_refused(name, value, floor, using)
+            
+            wallet_id, user_id, balance = row
+            
+            # Walk back from the new balance so each row carries its own balance_after
+            running = balance - delta
+            ledger = []
+            for transaction_type, category, amount, description in lines:
+                running += amount if transaction_type == Transaction.CREDIT else -amount
+                ledger.append(Transaction(
+                    wallet_id=wallet_id,
+                    transaction_type=transaction_type,
+                    category=category,
+                    amount=amount,
+                    balance_after=running,
+                    description=description,
+                ))
+            
+            ledger = write_ledger(ledger, using)
+            
+            publish_on_commit(user_id, balance, ledger, using)
+            return ledger
+    
+    @classmethod
+    def _update_balance(cls, column, value, delta, using, floor=Decimal('0.00')):
+        """
+        UPDATE ... SET balance = balance + delta WHERE ... [AND balance >= floor]
+        Returns: (wallet_id, user_id, new_balance) or None if no row matched
+        """
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        
+        sql = (
+            f"UPDATE {qn(cls._meta.db_table)} "
+            f"SET {qn('balance')} = {qn('balance')} + %s, {qn('updated_at')} = %s "
+            f"WHERE {qn(column)} = %s AND {qn('is_active')} = %s"
+        )
+        params = [
+            connection.ops.adapt_decimalfield_value(delta, 10, 2),
+            connection.ops.adapt_datetimefield_value(timezone.now()),
+            value,
+            True,
+        ]
+        if floor > 0:
+            sql += f" AND {qn('balance')} >= %s"
+            params.append(connection.ops.adapt_decimalfield_value(floor, 10, 2))
+        
+        returning = cls._supports_update_returning(connection)
+        if returning:
+            sql += f" RETURNING {qn('id')}, {qn('user_id')}, {qn('balance')}"
+        
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            if returning:
+                row = cursor.fetchone()
+            elif cursor.rowcount:
+                cursor.execute(
+                    f"SELECT {qn('id')}, {qn('user_id')}, {qn('balance')} "
+                    f"FROM {qn(cls._meta.db_table)} WHERE {qn(column)} = %s",
+                    [value]
+                )
+                row = cursor.fetchone()
+            else:
+                row = None
+        
+        if row is None:
+            return None
+        return row[0], row[1], Decimal(str(row[2])).quantize(Decimal('0.01'))
+    
+    @staticmethod
+    def _supports_update_returning(connection):
+        """UPDATE ... RETURNING is available on PostgreSQL and SQLite 3.35+"""
+        if connection.vendor == 'postgresql':
+            return True
+        if connection.vendor == 'sqlite':
+            return connection.Database.sqlite_version_info >= (3, 35, 0)
+        return False
+    
+    @classmethod
+    def _raise_refused(cls, name, value, amount, using):
+        """Explain why a balance update matched no row (only runs on failure)"""
+        wallet = cls.objects.using(using).filter(**{name: value}).values('balance', 'is_active').first()
+        if wallet is None:
+            raise cls.DoesNotExist("Wallet not found")
+        if not wallet['is_active']:
+            raise ValueError("Wallet is not active")
+        raise ValueError(f"Insufficient balance. Available: {wallet['balance']}, Required: {amount}")
+    
     def get_total_deposited(self):
         """Calculate total amount deposited"""
         return self.transactions.filter(
@@ -117,8 +289,29 @@ class Transaction(models.Model):
         (CANCELLED, 'Cancelled'),
     ]
     
+    # What the money moved for; set by every writer so reports never parse descriptions
+    DEPOSIT = 'deposit'
+    WITHDRAWAL = 'withdrawal'
+    BET_STAKE = 'bet_stake'
+    BET_PAYOUT = 'bet_payout'
+    REFUND = 'refund'
+    GAME_STAKE = 'game_stake'
+    GAME_PAYOUT = 'game_payout'
+    CATEGORY_CHOICES = [
+        (DEPOSIT, 'Deposit'),
+        (WITHDRAWAL, 'Withdrawal'),
+        (BET_STAKE, 'Bet Stake'),
+        (BET_PAYOUT, 'Bet Payout'),
+        (REFUND, 'Refund'),
+        (GAME_STAKE, 'Game Stake'),
+        (GAME_PAYOUT, 'Game Payout'),
+    ]
+    STAKE_CATEGORIES = [BET_STAKE, GAME_STAKE]
+    PAYOUT_CATEGORIES = [BET_PAYOUT, GAME_PAYOUT]
+    
     wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='transactions')
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, blank=True, default='')
     amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
     balance_after = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.CharField(max_length=255)
@@ -126,6 +319,8 @@ class Transaction(models.Model):
     reference_id = models.CharField(max_length=100, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = ShardedManager()
+    
     class Meta:
         db_table = 'transactions'
         ordering = ['-created_at']
@@ -133,6 +328,7 @@ class Transaction(models.Model):
             models.Index(fields=['wallet', '-created_at']),
             models.Index(fields=['transaction_type']),
             models.Index(fields=['status']),
+            models.Index(fields=['wallet', 'category']),
         ]
     
     def __str__(self):
@@ -145,6 +341,32 @@ class Transaction(models.Model):
     def get_transaction_class(self):
         """Return CSS class for styling"""
         return 'credit' if self.transaction_type == self.CREDIT else 'debit'
+    
+    @classmethod
+    def classify(cls, transaction_type, description):
+        """
+        Infer a category from a legacy row's type and description
+        Returns: category, or '' if the row cannot be classified
+        """
+        description = (description or '').lower()
+        
+        if transaction_type == cls.CREDIT:
+            if description.startswith(('deposit', 'initial deposit', 'amount credited')):
+                return cls.DEPOSIT
+            if description.startswith('bet refund'):
+                return cls.REFUND
+            if description.startswith('bet winning'):
+                return cls.BET_PAYOUT
+            if description.startswith(('won ', 'coin flip win')):
+                return cls.GAME_PAYOUT
+        else:
+            if description.startswith('withdrawal'):
+                return cls.WITHDRAWAL
+            if description.startswith('bet placed'):
+                return cls.BET_STAKE
+            if description.startswith('coin flip loss') or description.endswith(' bet'):
+                return cls.GAME_STAKE
+        return ''
 
 
 class WalletManager:
@@ -163,6 +385,7 @@ class WalletManager:
             Transaction.objects.create(
                 wallet=wallet,
                 transaction_type=Transaction.CREDIT,
+                category=Transaction.DEPOSIT,
                 amount=Decimal(str(initial_balance)),
                 balance_after=wallet.balance,
                 description="Initial deposit"
@@ -170,21 +393,19 @@ class WalletManager:
         return wallet, created
     
     @staticmethod
+    @instrument('process_bet_placement')
     def process_bet_placement(user, bet_amount):
         """
         Process wallet deduction for bet placement
         Returns: (success: bool, message: str, transaction: Transaction or None)
         """
         try:
-            wallet = Wallet.objects.select_for_update().get(user=user)
-            
-            if not wallet.is_active:
-                return False, "Wallet is not active", None
-            
-            if not wallet.has_sufficient_balance(bet_amount):
-                return False, f"Insufficient balance. Available: {wallet.balance}", None
-            
-            transaction = wallet.deduct(bet_amount, f"Bet placed - {bet_amount}")
+            transaction = Wallet.apply_debit(
+                bet_amount,
+                f"Bet placed - {bet_amount}",
+                Transaction.BET_STAKE,
+                user=user
+            )
             return True, "Bet placed successfully", transaction
             
         except Wallet.DoesNotExist:
@@ -193,22 +414,18 @@ class WalletManager:
             return False, str(e), None
     
     @staticmethod
+    @instrument('process_bet_winning')
     def process_bet_winning(user, winning_amount, bet_id=None):
         """
         Process wallet credit for bet winnings
         Returns: (success: bool, message: str, transaction: Transaction or None)
         """
         try:
-            wallet = Wallet.objects.select_for_update().get(user=user)
-            
-            if not wallet.is_active:
-                return False, "Wallet is not active", None
-            
             description = f"Bet winning - {winning_amount}"
             if bet_id:
                 description += f" (Bet #{bet_id})"
             
-            transaction = wallet.credit(winning_amount, description)
+            transaction = Wallet.apply_credit(winning_amount, description, Transaction.BET_PAYOUT, user=user)
             return True, "Winnings credited successfully", transaction
             
         except Wallet.DoesNotExist:
@@ -216,6 +433,25 @@ class WalletManager:
         except Exception as e:
             return False, str(e), None
     
+    @staticmethod
+    def process_bet_refund(user, refund_amount, bet_id=None):
+        """
+        Process wallet credit for a cancelled bet's stake
+        Returns: (success: bool, message: str, transaction: Transaction or None)
+        """
+        try:
+            description = f"Bet refund - {refund_amount}"
+            if bet_id:
+                description += f" (Bet #{bet_id})"
+            
+            transaction = Wallet.apply_credit(refund_amount, description, Transaction.REFUND, user=user)
+            return True, "Stake refunded successfully", transaction
+            
+        except Wallet.DoesNotExist:
+            return False, "Wallet not found", None
+        except Exception as e:
+            return False, str(e), None
+    
     @staticmethod
     def get_wallet_summary(user):
         """
@@ -236,6 +472,115 @@ class WalletManager:
         except Wallet.DoesNotExist:
             return None
     
+    @staticmethod
+    async def aget_wallet_overview(user, with_betting_stats=True):
+        """
+        Async wallet row, summary totals and betting stats for the read APIs
+        Django's async ORM runs each query through the same database thread,
+        so they are awaited in turn and the totals are skipped without a wallet
+        Returns: (wallet, summary, betting_stats); all None if there is no wallet,
+        betting_stats None when not requested
+        """
+        wallet = await Wallet.objects.filter(user_id=user.pk).afirst()
+        if wallet is None:
+            return None, None, None
+        type_rows = await WalletManager._type_totals_query(user.pk)
+        
+        summary = {
+            'balance': wallet.balance,
+            'currency': wallet.currency,
+            'total_deposited': Decimal('0.00'),
+            'total_withdrawn': Decimal('0.00'),
+            'is_active': wallet.is_active,
+            'created_at': wallet.created_at,
+            'transaction_count': 0,
+        }
+        for row in type_rows:
+            summary['transaction_count'] += row['count']
+            if row['status'] != Transaction.COMPLETED:
+                continue
+            if row['transaction_type'] == Transaction.CREDIT:
+                summary['total_deposited'] += row['total'] or Decimal('0.00')
+            elif row['transaction_type'] == Transaction.DEBIT:
+                summary['total_withdrawn'] += row['total'] or Decimal('0.00')
+        
+        betting_stats = None
+        if with_betting_stats:
+            category_rows = await WalletManager._category_totals_query(user.pk)
+            totals = WalletManager._category_totals_from_rows(category_rows)
+            betting_stats = WalletManager._betting_stats_from_totals(totals)
+        return wallet, summary, betting_stats
+    
+    @staticmethod
+    async def _type_totals_query(user_id):
+        """Count and sum the user's transactions per (type, status) in one grouped query"""
+        rows = Transaction.objects.filter(
+            wallet__user_id=user_id
+        ).order_by().values('transaction_type', 'status').annotate(
+            count=models.Count('id'),
+            total=models.Sum('amount'),
+        )
+        return [row async for row in rows]
+    
+    @staticmethod
+    async def _category_totals_query(user_id):
+        rows = Transaction.objects.filter(
+            wallet__user_id=user_id,
+            status=Transaction.COMPLETED
+        ).order_by().values('category').annotate(
+            count=models.Count('id'),
+            total=models.Sum('amount'),
+        )
+        return [row async for row in rows]
+    
+    @staticmethod
+    def get_category_totals(wallet):
+        """
+        Count and sum completed transactions per category in one grouped query
+        Returns: dict of category -> {'count': int, 'total': Decimal}
+        """
+        rows = wallet.transactions.filter(
+            status=Transaction.COMPLETED
+        ).order_by().values('category').annotate(
+            count=models.Count('id'),
+            total=models.Sum('amount'),
+        )
+        return WalletManager._category_totals_from_rows(rows)
+    
+    @staticmethod
+    def _category_totals_from_rows(rows):
+        totals = {
+            category: {'count': 0, 'total': Decimal('0.00')}
+            for category, label in Transaction.CATEGORY_CHOICES
+        }
+        for row in rows:
+            totals[row['category']] = {'count': row['count'], 'total': row['total'] or Decimal('0.00')}
+        return totals
+    
+    @staticmethod
+    def get_betting_stats(wallet):
+        """
+        Bet/game counts, wins and winnings for the wallet dashboard
+        Returns: dict with total_bets, total_wins, total_winnings and win_rate
+        """
+        return WalletManager._betting_stats_from_totals(WalletManager.get_category_totals(wallet))
+    
+    @staticmethod
+    def _betting_stats_from_totals(totals):
+        total_bets = sum(totals[category]['count'] for category in Transaction.STAKE_CATEGORIES)
+        total_wins = sum(totals[category]['count'] for category in Transaction.PAYOUT_CATEGORIES)
+        total_winnings = sum(
+            (totals[category]['total'] for category in Transaction.PAYOUT_CATEGORIES),
+            Decimal('0.00')
+        )
+        win_rate = (total_wins / total_bets * 100) if total_bets > 0 else 0
+        return {
+            'total_bets': total_bets,
+            'total_wins': total_wins,
+            'total_winnings': total_winnings,
+            'win_rate': round(win_rate, 1),
+        }
+    
     @staticmethod
     def get_transaction_history(user, limit=50):
         """Get user's transaction history"""
@@ -244,3 +589,16 @@ class WalletManager:
             return wallet.transactions.all()[:limit]
         except Wallet.DoesNotExist:
             return []
+    
+    @staticmethod
+    def get_transaction_page(user, cursor=None, limit=50, **filters):
+        """
+        Get one keyset page of the user's transactions, newest first
+        filters: optional transaction_type / status / category values
+        Returns: KeysetPage, raises ValueError for an invalid cursor
+        """
+        transactions = Transaction.objects.filter(wallet__user=user)
+        filters = {field: value for field, value in filters.items() if value}
+        if filters:
+            transactions = transactions.filter(**filters)
+        return paginate_keyset(transactions, 'created_at', cursor, limit)
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+
+
+class WalletEventBroker:
+    """
+    In-process fan-out of wallet balance changes to open event streams
+    Subscribers are asyncio queues owned by the ASGI event loop; publishers
+    are ordinary sync code (views, services) running in worker threads, so
+    delivery goes through loop.call_soon_threadsafe
+    """
+
+    # Events buffered per stream before the oldest are dropped for a slow client
+    MAX_QUEUED = 100
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Register a stream for the user; call from the event loop"""
+        queue = asyncio.Queue(maxsize=self.MAX_QUEUED)
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(user_id, []).append(entry)
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            entries = [entry for entry in self._subscribers.get(user_id, []) if entry[1] is not queue]
+            if entries:
+                self._subscribers[user_id] = entries
+            else:
+                self._subscribers.pop(user_id, None)
+
+    def has_subscribers(self, user_id):
+        """Cheap check so publishers skip building payloads nobody will read"""
+        return user_id in self._subscribers
+
+    def publish(self, user_id, payload):
+        """Deliver a payload to every stream the user has open; safe from any thread"""
+        with self._lock:
+            entries = list(self._subscribers.get(user_id, []))
+        for loop, queue in entries:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, payload)
+            except RuntimeError:
+                # The loop has closed; the stream's own cleanup will unsubscribe it
+                pass
+
+    @staticmethod
+    def _offer(queue, payload):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(payload)
+
+
+wallet_events = WalletEventBroker()
+
+
+def serialize_transaction(transaction):
+    """Compact JSON form of a ledger row for stream deltas"""
+    return {
+        'id': transaction.id,
+        'type': transaction.transaction_type,
+        'category': transaction.category,
+        'amount': float(transaction.amount),
+        'balance_after': float(transaction.balance_after),
+        'description': transaction.description,
+        'created_at': transaction.created_at.strftime('%b %d, %Y - %H:%M'),
+        'icon': transaction.get_transaction_icon(),
+        'css_class': transaction.get_transaction_class(),
+    }
+
+
+def publish_on_commit(user_id, balance, transactions, using):
+    """Queue a balance/transaction delta for the user once the DB transaction commits"""
+    from django.db import transaction as db_transaction
+
+    if not wallet_events.has_subscribers(user_id):
+        return
+
+    payload = {
+        'balance': float(balance),
+        'transactions': [serialize_transaction(transaction) for transaction in transactions],
+    }
+    db_transaction.on_commit(lambda: wallet_events.publish(user_id, payload), using=using)
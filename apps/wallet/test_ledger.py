@@ -0,0 +1,98 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from .models import Transaction, WalletManager
+
+
+class LedgerWriteBehindTest(TransactionTestCase):
+    """Test cases for the write-behind ledger and check_ledger"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.user = get_user_model().objects.create_user(
+            email='ledger@example.com',
+            password='testpass123'
+        )
+        self.wallet, created = WalletManager.create_wallet_for_user(self.user, 100)
+    
+    def _check_ledger(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('check_ledger', *args, stdout=out)
+        return out.getvalue()
+    
+    def test_rows_written_after_commit(self):
+        """Test balance moves at once and ledger rows land on flush"""
+        from apps.wallet.ledger import ledger_writer
+        
+        with override_settings(LEDGER_WRITE_BEHIND=True):
+            self.wallet.deduct(Decimal('30.00'), "Stake")
+            self.wallet.credit(Decimal('5.00'), "Refund", Transaction.REFUND)
+            ledger_writer.flush()
+        
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('75.00'))
+        self.assertEqual(
+            list(self.wallet.transactions.order_by('pk').values_list('balance_after', flat=True)),
+            [Decimal('100.00'), Decimal('70.00'), Decimal('75.00')]
+        )
+        self.assertIn("Every wallet balance matches its ledger", self._check_ledger())
+    
+    def test_rows_keep_id_and_time(self):
+        """Test queued rows are stored with the id and timestamp handed to callers"""
+        from datetime import timedelta
+        from unittest import mock
+        from django.utils import timezone
+        from apps.wallet.ledger import ledger_writer
+        
+        moved_at = timezone.now() - timedelta(minutes=5)
+        with override_settings(LEDGER_WRITE_BEHIND=True):
+            with mock.patch('apps.wallet.ledger.timezone.now', return_value=moved_at):
+                first = self.wallet.deduct(Decimal('30.00'), "Stake")
+                second = self.wallet.credit(Decimal('5.00'), "Refund", Transaction.REFUND)
+            ids = (first.pk, second.pk)
+            ledger_writer.flush()
+        
+        self.assertIsNotNone(ids[0])
+        self.assertEqual(ids[1], ids[0] + 1)
+        stored = Transaction.objects.get(pk=ids[1])
+        self.assertEqual((stored.description, stored.created_at), ("Refund", moved_at))
+        self.assertEqual(Transaction.objects.get(pk=ids[0]).created_at, moved_at)
+    
+    def test_rolled_back_rows_dropped(self):
+        """Test rows of a rolled-back transaction are never queued"""
+        from django.db import transaction as db_transaction
+        from apps.wallet.ledger import ledger_writer
+        
+        with override_settings(LEDGER_WRITE_BEHIND=True):
+            with self.assertRaises(RuntimeError):
+                with db_transaction.atomic():
+                    self.wallet.deduct(Decimal('30.00'), "Stake")
+                    raise RuntimeError
+            ledger_writer.flush()
+        
+        self.assertEqual(self.wallet.transactions.count(), 1)
+    
+    def test_lost_tail_reported_and_repaired(self):
+        """Test a ledger row lost after its balance update is found and reconciled"""
+        self.wallet.deduct(Decimal('30.00'), "Stake")
+        self.wallet.credit(Decimal('10.00'), "Winnings", Transaction.GAME_PAYOUT)
+        self.wallet.transactions.order_by('pk').last().delete()
+        
+        self.assertIn("ledger ends at 70.00", self._check_ledger())
+        self._check_ledger('--repair')
+        
+        reconciliation = self.wallet.transactions.order_by('pk').last()
+        self.assertEqual(reconciliation.transaction_type, Transaction.CREDIT)
+        self.assertEqual(reconciliation.amount, Decimal('10.00'))
+        self.assertIn("Every wallet balance matches its ledger", self._check_ledger())
+    
+    def test_missing_middle_row_not_repaired(self):
+        """Test a break inside the chain is reported but left for manual review"""
+        self.wallet.deduct(Decimal('30.00'), "Stake")
+        self.wallet.credit(Decimal('10.00'), "Winnings", Transaction.GAME_PAYOUT)
+        self.wallet.transactions.get(balance_after=Decimal('70.00')).delete()
+        
+        self.assertIn("1 breaks in the chain", self._check_ledger('--repair'))
+        self.assertEqual(self.wallet.transactions.count(), 2)
@@ -1,5 +1,6 @@
 from django.test import TestCase, Client
 from django.contrib.auth.models import User
+from django.contrib.auth import get_user_model
 from decimal import Decimal
 from .models import Wallet, Transaction, WalletManager
 
@@ -48,7 +49,7 @@ class WalletModelTest(TestCase):
         initial_balance = self.wallet.balance
         amount = Decimal('500.00')
         
-        transaction = self.wallet.credit(amount, "Test credit")
+        transaction = self.wallet.credit(amount, "Test credit", Transaction.DEPOSIT)
         
         self.wallet.refresh_from_db()
         self.assertEqual(self.wallet.balance, initial_balance + amount)
@@ -224,4 +225,270 @@ class WalletViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         data = response.json()
         self.assertTrue(data['success'])
-        self.assertEqual(data['balance'], 1000.00)
\ No newline at end of file
+        self.assertEqual(data['balance'], 1000.00)
+
+
+class WalletBalancePrimitivesTest(TestCase):
+    """Test cases for the single-statement debit/credit primitives"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.user = get_user_model().objects.create_user(
+            email='primitives@example.com',
+            password='testpass123'
+        )
+        self.wallet = Wallet.objects.create(
+            user=self.user,
+            balance=Decimal('100.00')
+        )
+    
+    def test_credit_requires_category(self):
+        """Test a credit can't silently be recorded as a deposit"""
+        with self.assertRaises(TypeError):
+            self.wallet.credit(Decimal('5.00'), "Refund")
+        
+        transaction = self.wallet.credit(Decimal('5.00'), "Refund", Transaction.REFUND)
+        self.assertEqual(transaction.category, Transaction.REFUND)
+    
+    def test_apply_debit(self):
+        """Test debit returns the new balance and writes the ledger row"""
+        transaction = Wallet.apply_debit(Decimal('40.00'), "Test debit", Transaction.WITHDRAWAL, user=self.user)
+        
+        self.assertEqual(transaction.balance_after, Decimal('60.00'))
+        self.assertEqual(transaction.transaction_type, Transaction.DEBIT)
+        self.assertEqual(transaction.amount, Decimal('40.00'))
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('60.00'))
+    
+    def test_apply_debit_insufficient_balance(self):
+        """Test an overdraft is refused without touching the balance or ledger"""
+        with self.assertRaises(ValueError) as ctx:
+            Wallet.apply_debit(Decimal('100.01'), "Too much", Transaction.WITHDRAWAL, pk=self.wallet.pk)
+        
+        self.assertIn("Insufficient balance", str(ctx.exception))
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('100.00'))
+        self.assertFalse(self.wallet.transactions.exists())
+    
+    def test_apply_credit(self):
+        """Test credit returns the new balance"""
+        transaction = Wallet.apply_credit(Decimal('25.50'), "Test credit", Transaction.DEPOSIT, pk=self.wallet.pk)
+        
+        self.assertEqual(transaction.balance_after, Decimal('125.50'))
+        self.assertEqual(transaction.transaction_type, Transaction.CREDIT)
+    
+    def test_inactive_wallet_refused(self):
+        """Test money cannot move through an inactive wallet"""
+        Wallet.objects.filter(pk=self.wallet.pk).update(is_active=False)
+        
+        with self.assertRaisesMessage(ValueError, "Wallet is not active"):
+            Wallet.apply_credit(Decimal('10.00'), "Test credit", Transaction.DEPOSIT, user=self.user)
+    
+    def test_missing_wallet(self):
+        """Test a missing wallet raises DoesNotExist"""
+        with self.assertRaises(Wallet.DoesNotExist):
+            Wallet.apply_debit(Decimal('10.00'), "Test debit", Transaction.WITHDRAWAL, pk=self.wallet.pk + 1)
+    
+    def test_minimum_balance(self):
+        """Test minimum_balance refuses a change the current balance can't back"""
+        with self.assertRaisesMessage(ValueError, "Required: 150.00"):
+            Wallet.apply_credit(
+                Decimal('5.00'), "Net win", Transaction.GAME_PAYOUT, minimum_balance=Decimal('150.00'), user=self.user
+            )
+        
+        transaction = Wallet.apply_debit(
+            Decimal('5.00'), "Net loss", Transaction.GAME_STAKE, minimum_balance=Decimal('80.00'), user=self.user
+        )
+        self.assertEqual(transaction.balance_after, Decimal('95.00'))
+    
+    def test_deduct_keeps_instance_in_sync(self):
+        """Test deduct updates the in-memory balance without refresh_from_db"""
+        self.wallet.deduct(Decimal('30.00'), "Test deduction")
+        
+        self.assertEqual(self.wallet.balance, Decimal('70.00'))
+
+
+class TransactionCategoryTest(TestCase):
+    """Test cases for typed transaction categories"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.user = get_user_model().objects.create_user(
+            email='categories@example.com',
+            password='testpass123'
+        )
+        self.wallet, created = WalletManager.create_wallet_for_user(self.user, 1000)
+    
+    def test_writers_set_category(self):
+        """Test bet placement, winnings and refunds are categorized"""
+        _, _, stake = WalletManager.process_bet_placement(self.user, Decimal('100.00'))
+        _, _, payout = WalletManager.process_bet_winning(self.user, Decimal('200.00'), bet_id=1)
+        _, _, refund = WalletManager.process_bet_refund(self.user, Decimal('50.00'), bet_id=2)
+        
+        self.assertEqual(stake.category, Transaction.BET_STAKE)
+        self.assertEqual(payout.category, Transaction.BET_PAYOUT)
+        self.assertEqual(refund.category, Transaction.REFUND)
+    
+    def test_betting_stats_ignore_refunds(self):
+        """Test win counts come from payouts only, not refunds"""
+        WalletManager.process_bet_placement(self.user, Decimal('100.00'))
+        WalletManager.process_bet_placement(self.user, Decimal('50.00'))
+        WalletManager.process_bet_winning(self.user, Decimal('200.00'), bet_id=1)
+        WalletManager.process_bet_refund(self.user, Decimal('50.00'), bet_id=2)
+        
+        with self.assertNumQueries(1):
+            stats = WalletManager.get_betting_stats(self.wallet)
+        
+        self.assertEqual(stats['total_bets'], 2)
+        self.assertEqual(stats['total_wins'], 1)
+        self.assertEqual(stats['total_winnings'], Decimal('200.00'))
+        self.assertEqual(stats['win_rate'], 50.0)
+    
+    def test_classify_legacy_descriptions(self):
+        """Test legacy descriptions map to categories"""
+        self.assertEqual(Transaction.classify(Transaction.CREDIT, "Deposit - Added $10"), Transaction.DEPOSIT)
+        self.assertEqual(Transaction.classify(Transaction.DEBIT, "Withdrawal - $10"), Transaction.WITHDRAWAL)
+        self.assertEqual(Transaction.classify(Transaction.DEBIT, "Bet placed - 10"), Transaction.BET_STAKE)
+        self.assertEqual(Transaction.classify(Transaction.CREDIT, "Bet winning - 20 (Bet #3)"), Transaction.BET_PAYOUT)
+        self.assertEqual(Transaction.classify(Transaction.DEBIT, "EVEN bet"), Transaction.GAME_STAKE)
+        self.assertEqual(Transaction.classify(Transaction.CREDIT, "Won EVEN bet"), Transaction.GAME_PAYOUT)
+        self.assertEqual(Transaction.classify(Transaction.CREDIT, "Manual adjustment"), '')
+
+
+class TransactionHistoryViewTest(TestCase):
+    """Test cases for the keyset-paginated transaction history page"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.user = get_user_model().objects.create_user(
+            email='history@example.com',
+            password='testpass123'
+        )
+        self.wallet = Wallet.objects.create(user=self.user, balance=Decimal('100.00'))
+        for amount in ('1.00', '2.00', '3.00'):
+            self.wallet.deduct(Decimal(amount), f"Stake {amount}")
+        self.client.force_login(self.user)
+    
+    def test_next_page_link(self):
+        """Test the page links to the next keyset page and the last page has no link"""
+        response = self.client.get('/wallet/transactions/', {'limit': 2, 'type': 'debit'})
+        
+        self.assertContains(response, "Stake 3.00")
+        self.assertContains(response, "Stake 2.00")
+        self.assertNotContains(response, "Stake 1.00")
+        next_url = response.context['next_page_url']
+        self.assertIn('cursor=', next_url)
+        self.assertIn('type=debit', next_url)
+        self.assertContains(response, f'href="{next_url.replace("&", "&amp;")}"')
+        
+        response = self.client.get(next_url)
+        self.assertContains(response, "Stake 1.00")
+        self.assertNotContains(response, "Stake 3.00")
+        self.assertIsNone(response.context['next_page_url'])
+        self.assertNotContains(response, "Older Transactions")
+
+
+class WalletStreamTest(TestCase):
+    """Test cases for the server-sent wallet event stream"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.user = get_user_model().objects.create_user(
+            email='stream@example.com',
+            password='testpass123'
+        )
+        self.wallet = Wallet.objects.create(
+            user=self.user,
+            balance=Decimal('100.00')
+        )
+    
+    def test_stream_requires_login(self):
+        """Test anonymous clients are refused"""
+        response = self.client.get('/wallet/api/stream/')
+        self.assertEqual(response.status_code, 401)
+    
+    async def test_stream_pushes_committed_changes(self):
+        """Test the stream sends a snapshot, then each published delta"""
+        import json
+        from .notifications import wallet_events
+        
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/wallet/api/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        
+        stream = aiter(response.streaming_content)
+        snapshot = await anext(stream)
+        # Subscription is registered by the time the snapshot is sent
+        self.assertTrue(wallet_events.has_subscribers(self.user.pk))
+        # Stand in for a worker thread committing a debit
+        wallet_events.publish(self.user.pk, {'balance': 60.0, 'transactions': []})
+        delta = await anext(stream)
+        await stream.aclose()
+        
+        self.assertEqual(json.loads(snapshot.decode().split('data: ')[1])['balance'], 100.0)
+        self.assertEqual(json.loads(delta.decode().split('data: ')[1])['balance'], 60.0)
+    
+    def test_debit_publishes_on_commit(self):
+        """Test balance changes are published only after the transaction commits"""
+        from .notifications import wallet_events
+        
+        published = []
+        original = wallet_events.publish
+        wallet_events.publish = lambda user_id, payload: published.append((user_id, payload))
+        wallet_events._subscribers[self.user.pk] = []
+        try:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                Wallet.apply_debit(Decimal('40.00'), "Test debit", Transaction.WITHDRAWAL, user=self.user)
+                self.assertEqual(published, [])
+        finally:
+            wallet_events.publish = original
+            wallet_events._subscribers.pop(self.user.pk, None)
+        
+        self.assertEqual(len(callbacks), 1)
+        user_id, payload = published[0]
+        self.assertEqual(user_id, self.user.pk)
+        self.assertEqual(payload['balance'], 60.0)
+        self.assertEqual(payload['transactions'][0]['category'], Transaction.WITHDRAWAL)
+
+
+class AsyncReadApiTest(TestCase):
+    """Test cases for the async wallet read endpoints"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.user = get_user_model().objects.create_user(
+            email='asyncapi@example.com',
+            password='testpass123'
+        )
+        self.wallet = Wallet.objects.create(
+            user=self.user,
+            balance=Decimal('0.00')
+        )
+        Wallet.apply_credit(Decimal('200.00'), "Deposit", Transaction.DEPOSIT, user=self.user)
+        Wallet.apply_debit(Decimal('50.00'), "Bet placed", Transaction.BET_STAKE, user=self.user)
+        Wallet.apply_credit(Decimal('90.00'), "Bet winning", Transaction.BET_PAYOUT, user=self.user)
+    
+    async def test_wallet_stats(self):
+        """Test the concurrent overview queries add up to the same stats as the sync path"""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/wallet/api/stats/')
+        
+        self.assertEqual(response.status_code, 200)
+        stats = response.json()['stats']
+        self.assertEqual(stats['balance'], 240.0)
+        self.assertEqual(stats['total_deposited'], 290.0)
+        self.assertEqual(stats['total_withdrawn'], 50.0)
+        self.assertEqual(stats['total_bets'], 1)
+        self.assertEqual(stats['total_wins'], 1)
+        self.assertEqual(stats['total_winnings'], 90.0)
+    
+    async def test_balance_and_check_balance(self):
+        """Test the balance endpoints under the async client"""
+        await self.async_client.aforce_login(self.user)
+        
+        response = await self.async_client.get('/wallet/api/balance/')
+        self.assertEqual(response.json()['balance'], 240.0)
+        self.assertEqual(response.json()['transaction_count'], 3)
+        
+        response = await self.async_client.get('/wallet/api/check-balance/', {'amount': '300'})
+        self.assertFalse(response.json()['has_sufficient_balance'])
@@ -10,6 +10,7 @@ urlpatterns = [
     # Transaction Management
     path('transactions/', views.transaction_history, name='transactions'),
     path('transactions/recent/', views.get_recent_transactions, name='recent_transactions'),
+    path('transactions/export/', views.export_transactions, name='export_transactions'),
     
     # Wallet Operations (POST requests)
     path('add-funds/', views.add_funds, name='add_funds'),
@@ -19,4 +20,5 @@ urlpatterns = [
     path('api/balance/', views.wallet_balance_api, name='balance_api'),
     path('api/check-balance/', views.check_balance, name='check_balance'),
     path('api/stats/', views.get_wallet_stats, name='stats_api'),
+    path('api/stream/', views.wallet_stream, name='stream_api'),
 ]
\ No newline at end of file
@@ -1,13 +1,20 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+import asyncio
+import json
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
-from django.db import transaction
 from decimal import Decimal
+from apps.pagination import get_page_size, next_page_url
+from apps.db.routers import use_replica
+from apps.profiling import query_budget
+from apps.exports import EXPORT_FORMATS, TRANSACTION_EXPORT_FIELDS, streaming_export_response
 from .models import Wallet, Transaction, WalletManager
+from .notifications import wallet_events
 
 
+@query_budget(10)
 @login_required
 def wallet_dashboard(request):
     """
@@ -22,75 +29,94 @@ def wallet_dashboard(request):
     # Get recent transactions (last 10)
     recent_transactions = WalletManager.get_transaction_history(request.user, limit=10)
     
-    # Calculate statistics for the dashboard
-    total_bets = Transaction.objects.filter(
-        wallet=wallet,
-        transaction_type=Transaction.DEBIT,
-        description__icontains='bet'
-    ).count()
+    # Calculate statistics for the dashboard (one grouped query by category)
+    betting_stats = WalletManager.get_betting_stats(wallet)
     
     active_bets_count = 3  # You'll replace this with actual logic from bets app
     
-    # Calculate win rate
-    total_wins = Transaction.objects.filter(
-        wallet=wallet,
-        transaction_type=Transaction.CREDIT,
-        description__icontains='winning'
-    ).count()
-    
-    win_rate = (total_wins / total_bets * 100) if total_bets > 0 else 0
-    
-    # Calculate total winnings
-    total_winnings = Transaction.objects.filter(
-        wallet=wallet,
-        transaction_type=Transaction.CREDIT,
-        description__icontains='winning',
-        status=Transaction.COMPLETED
-    ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-    
     context = {
         'wallet': wallet,
         'summary': summary,
         'transactions': recent_transactions,
-        'total_bets': total_bets,
+        'total_bets': betting_stats['total_bets'],
         'active_bets_count': active_bets_count,
-        'win_rate': round(win_rate, 1),
-        'total_winnings': total_winnings,
+        'win_rate': betting_stats['win_rate'],
+        'total_winnings': betting_stats['total_winnings'],
     }
     
     return render(request, 'wallet/dashboard.html', context)
 
 
 @login_required
+@use_replica
 def transaction_history(request):
     """
-    View all transactions with filtering
+    View transactions with filtering, one keyset page at a time
     """
     wallet = get_object_or_404(Wallet, user=request.user)
     
     # Get filter parameters
     transaction_type = request.GET.get('type', '')
     status = request.GET.get('status', '')
+    category = request.GET.get('category', '')
     
-    # Get all transactions
-    transactions = wallet.transactions.all()
-    
-    # Apply filters
-    if transaction_type:
-        transactions = transactions.filter(transaction_type=transaction_type)
-    if status:
-        transactions = transactions.filter(status=status)
+    # Get the requested page of transactions
+    filters = {
+        'transaction_type': transaction_type,
+        'status': status,
+        'category': category,
+    }
+    try:
+        page = WalletManager.get_transaction_page(
+            request.user, request.GET.get('cursor'), get_page_size(request), **filters
+        )
+    except ValueError:
+        page = WalletManager.get_transaction_page(request.user, None, get_page_size(request), **filters)
     
     context = {
         'wallet': wallet,
-        'transactions': transactions,
+        'transactions': page.items,
+        'page': page,
+        'next_page_url': next_page_url(request, page),
         'transaction_type': transaction_type,
         'status': status,
+        'category': category,
     }
     
     return render(request, 'wallet/transaction_history.html', context)
 
 
+@login_required
+def export_transactions(request):
+    """
+    Stream the user's full ledger as CSV or NDJSON (?format=csv|ndjson)
+    Accepts the same type/status/category filters as the history page
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({
+            'success': False,
+            'error': f'Unsupported export format: {export_format}'
+        }, status=400)
+    
+    # Read from the user's database: the rows are streamed after UserShardMiddleware has returned
+    transactions = Transaction.objects.for_user(request.user)
+    filters = {
+        'transaction_type': request.GET.get('type', ''),
+        'status': request.GET.get('status', ''),
+        'category': request.GET.get('category', ''),
+    }
+    transactions = transactions.filter(**{field: value for field, value in filters.items() if value})
+    
+    return streaming_export_response(
+        transactions.order_by('-created_at', '-id'),
+        TRANSACTION_EXPORT_FIELDS,
+        export_format,
+        'transactions'
+    )
+
+
+@query_budget(6)
 @login_required
 @require_http_methods(["POST"])
 def add_funds(request):
@@ -113,18 +139,25 @@ def add_funds(request):
                 'error': 'Maximum deposit amount is $10,000'
             }, status=400)
         
-        # Get wallet
-        wallet = get_object_or_404(Wallet, user=request.user)
-        
-        # Add funds using atomic transaction
-        with transaction.atomic():
-            trans = wallet.credit(amount, f"Deposit - Added ${amount}")
+        # Add funds with a single balance update
+        try:
+            trans = Wallet.apply_credit(
+                amount,
+                f"Deposit - Added ${amount}",
+                Transaction.DEPOSIT,
+                user=request.user
+            )
+        except Wallet.DoesNotExist:
+            return JsonResponse({
+                'success': False,
+                'error': 'Wallet not found'
+            }, status=404)
         
         # Return success response with updated data
         return JsonResponse({
             'success': True,
             'message': f'Successfully added ${amount} to your wallet',
-            'new_balance': float(wallet.balance),
+            'new_balance': float(trans.balance_after),
             'transaction': {
                 'id': trans.id,
                 'amount': float(trans.amount),
@@ -133,6 +166,11 @@ def add_funds(request):
             }
         })
         
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -140,6 +178,7 @@ def add_funds(request):
         }, status=500)
 
 
+@query_budget(6)
 @login_required
 @require_http_methods(["POST"])
 def withdraw_funds(request):
@@ -149,9 +188,6 @@ def withdraw_funds(request):
     try:
         amount = Decimal(request.POST.get('amount', '0'))
         
-        # Get wallet
-        wallet = get_object_or_404(Wallet, user=request.user)
-        
         # Validation
         if amount <= 0:
             return JsonResponse({
@@ -159,21 +195,25 @@ def withdraw_funds(request):
                 'error': 'Amount must be greater than zero'
             }, status=400)
         
-        if not wallet.has_sufficient_balance(amount):
+        # Withdraw funds; the balance check and the debit are one statement
+        try:
+            trans = Wallet.apply_debit(
+                amount,
+                f"Withdrawal - ${amount}",
+                Transaction.WITHDRAWAL,
+                user=request.user
+            )
+        except Wallet.DoesNotExist:
             return JsonResponse({
                 'success': False,
-                'error': f'Insufficient balance. Available: ${wallet.balance}'
-            }, status=400)
-        
-        # Withdraw funds using atomic transaction
-        with transaction.atomic():
-            trans = wallet.deduct(amount, f"Withdrawal - ${amount}")
+                'error': 'Wallet not found'
+            }, status=404)
         
         # Return success response
         return JsonResponse({
             'success': True,
             'message': f'Successfully withdrew ${amount} from your wallet',
-            'new_balance': float(wallet.balance),
+            'new_balance': float(trans.balance_after),
             'transaction': {
                 'id': trans.id,
                 'amount': float(trans.amount),
@@ -195,14 +235,17 @@ def withdraw_funds(request):
 
 
 @login_required
-def wallet_balance_api(request):
+async def wallet_balance_api(request):
     """
     API endpoint to get current wallet balance
     Used for real-time balance updates in the interface
+    Async view: reads the wallet row and totals without holding a worker thread
     """
     try:
-        wallet = Wallet.objects.get(user=request.user)
-        summary = WalletManager.get_wallet_summary(request.user)
+        user = await request.auser()
+        wallet, summary, _ = await WalletManager.aget_wallet_overview(user, with_betting_stats=False)
+        if wallet is None:
+            raise Wallet.DoesNotExist
         
         return JsonResponse({
             'success': True,
@@ -220,15 +263,75 @@ def wallet_balance_api(request):
         }, status=404)
 
 
+# Seconds between keepalive comments on an idle wallet stream
+WALLET_STREAM_KEEPALIVE = 15
+
+
+async def wallet_stream(request):
+    """
+    Server-sent event stream of balance and transaction updates
+    Replaces polling api/balance/ and transactions/recent/: the client opens
+    one EventSource and receives a delta after every committed wallet change.
+    Needs the ASGI application (config/asgi.py); under WSGI it would hold a
+    worker thread for the life of the connection
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({
+            'success': False,
+            'error': 'Authentication required'
+        }, status=401)
+    
+    wallet = await Wallet.objects.filter(user=user).afirst()
+    if wallet is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'Wallet not found'
+        }, status=404)
+    
+    response = StreamingHttpResponse(
+        _wallet_events(user.pk, wallet),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def _wallet_events(user_id, wallet):
+    """Yield an initial snapshot, then one `wallet` event per delta with periodic keepalives"""
+    queue = wallet_events.subscribe(user_id)
+    try:
+        snapshot = {
+            'balance': float(wallet.balance),
+            'currency': wallet.currency,
+            'is_active': wallet.is_active,
+            'transactions': [],
+        }
+        yield f"event: wallet\ndata: {json.dumps(snapshot)}\n\n"
+        
+        while True:
+            try:
+                payload = await asyncio.wait_for(queue.get(), timeout=WALLET_STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: wallet\ndata: {json.dumps(payload)}\n\n"
+    finally:
+        wallet_events.unsubscribe(user_id, queue)
+
+
 @login_required
-def check_balance(request):
+async def check_balance(request):
     """
     Check if user has sufficient balance for a bet
     Used before placing bets
     """
     try:
         amount = Decimal(request.GET.get('amount', '0'))
-        wallet = Wallet.objects.get(user=request.user)
+        user = await request.auser()
+        wallet = await Wallet.objects.aget(user_id=user.pk)
         
         has_balance = wallet.has_sufficient_balance(amount)
         
@@ -252,37 +355,17 @@ def check_balance(request):
 
 
 @login_required
-def get_wallet_stats(request):
+@use_replica
+async def get_wallet_stats(request):
     """
     Get comprehensive wallet statistics for the dashboard
+    Async view: reads the wallet row, type totals and category totals without holding a worker thread
     """
     try:
-        wallet = Wallet.objects.get(user=request.user)
-        summary = WalletManager.get_wallet_summary(request.user)
-        
-        # Calculate total winnings
-        total_winnings = Transaction.objects.filter(
-            wallet=wallet,
-            transaction_type=Transaction.CREDIT,
-            description__icontains='winning',
-            status=Transaction.COMPLETED
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-        
-        # Calculate total bets
-        total_bets = Transaction.objects.filter(
-            wallet=wallet,
-            transaction_type=Transaction.DEBIT,
-            description__icontains='bet'
-        ).count()
-        
-        # Calculate wins
-        total_wins = Transaction.objects.filter(
-            wallet=wallet,
-            transaction_type=Transaction.CREDIT,
-            description__icontains='winning'
-        ).count()
-        
-        win_rate = (total_wins / total_bets * 100) if total_bets > 0 else 0
+        user = await request.auser()
+        wallet, summary, betting_stats = await WalletManager.aget_wallet_overview(user)
+        if wallet is None:
+            raise Wallet.DoesNotExist
         
         return JsonResponse({
             'success': True,
@@ -290,10 +373,10 @@ def get_wallet_stats(request):
                 'balance': float(wallet.balance),
                 'total_deposited': float(summary['total_deposited']),
                 'total_withdrawn': float(summary['total_withdrawn']),
-                'total_winnings': float(total_winnings),
-                'total_bets': total_bets,
-                'total_wins': total_wins,
-                'win_rate': round(win_rate, 1),
+                'total_winnings': float(betting_stats['total_winnings']),
+                'total_bets': betting_stats['total_bets'],
+                'total_wins': betting_stats['total_wins'],
+                'win_rate': betting_stats['win_rate'],
                 'member_since': summary['created_at'].strftime('%b %d, %Y'),
             }
         })
@@ -308,16 +391,24 @@ def get_wallet_stats(request):
 def get_recent_transactions(request):
     """
     Get recent transactions for live updates
+    Also serves as the paginated JSON ledger: pass next_cursor back as ?cursor=
     """
     try:
-        limit = int(request.GET.get('limit', 10))
-        transactions = WalletManager.get_transaction_history(request.user, limit=limit)
+        page = WalletManager.get_transaction_page(
+            request.user,
+            request.GET.get('cursor'),
+            get_page_size(request, default=10),
+            transaction_type=request.GET.get('type', ''),
+            status=request.GET.get('status', ''),
+            category=request.GET.get('category', ''),
+        )
         
         transactions_data = []
-        for trans in transactions:
+        for trans in page:
             transactions_data.append({
                 'id': trans.id,
                 'type': trans.transaction_type,
+                'category': trans.category,
                 'amount': float(trans.amount),
                 'description': trans.description,
                 'status': trans.status,
@@ -329,8 +420,15 @@ def get_recent_transactions(request):
         
         return JsonResponse({
             'success': True,
-            'transactions': transactions_data
+            'transactions': transactions_data,
+            'next_cursor': page.next_cursor,
+            'has_next': page.has_next,
         })
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -0,0 +1,16 @@
+"""
+ASGI config for the project.
+
+Serves the regular sync views through Django's thread-sensitive adapter and
+the async ones (read APIs and the wallet event stream) on the event loop, e.g.:
+
+    uvicorn config.asgi:application
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+application = get_asgi_application()
@@ -1,3 +1,5 @@
+import os
+import sys
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -16,16 +18,23 @@ INSTALLED_APPS = [
     'apps.wallet',
     'apps.events',
     'apps.bets',
+    'apps.db',
+    'apps.fairness',
+    'apps.game',
 ]
 
 MIDDLEWARE = [
+    'apps.metrics.MetricsMiddleware',
+    'apps.profiling.SQLProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.db.routers.UserShardMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.db.routers.ReadAfterWriteMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -48,15 +57,93 @@ TEMPLATES = [
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'apps.db.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'OPTIONS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'lock_retries': 5,
+            # Also holds every atomic block, read-only ones included, on one
+            # in-process lock. Only worth turning on for a single multi-threaded
+            # server process whose writers still hit "database is locked"
+            'serialize_writes': False,
+        },
+        # On disk, so threaded tests see SQLite's file locking rather than the
+        # table locks of the shared in-memory cache, which busy_timeout can't wait out
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    },
+    # Read replica for reporting queries; locally, feed it with
+    # `manage.py simulate_replication` and set REPLICA_DATABASE = 'replica'
+    'replica': {
+        'ENGINE': 'apps.db.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+# User sharding: each alias in SHARD_DATABASES holds the wallets, ledger and bets
+# of a slice of users (users and events stay on default and are mirrored to every
+# shard). Empty keeps everything on default; SHARD_COUNT=N in the environment adds
+# N local SQLite shards. After changing shards run `migrate --database <alias>`
+# for each new one and `manage.py rebalance_shards`
+SHARD_COUNT = int(os.environ.get('SHARD_COUNT', '0'))
+for shard_index in range(SHARD_COUNT):
+    DATABASES[f'shard_{shard_index}'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db.shard_{shard_index}.sqlite3',
+    }
+SHARD_DATABASES = [f'shard_{shard_index}' for shard_index in range(SHARD_COUNT)]
+
+DATABASE_ROUTERS = ['apps.db.routers.ShardRouter', 'apps.db.routers.ReplicaRouter']
+
+# Alias that history/stats/admin list reads go to (None keeps them on the primary),
+# and how long a client's reads stay on the primary after it writes
+REPLICA_DATABASE = None
+REPLICA_PIN_SECONDS = 5
+
 AUTH_USER_MODEL = 'accounts.CustomUser'
 STATIC_URL = '/static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Seconds a worker may serve cached event odds saved by another process
+ODDS_CACHE_TTL = 5
+
+# Game outcomes each worker keeps buffered per game (apps.rng); refilled in the
+# background from os.urandom once half are used
+RNG_POOL_SIZE = 65536
+
+# Provably-fair mode: dice and coin outcomes come from precomputed hash chains
+# (apps.fairness) instead of the RNG pool. Keep HASH_CHAINS_AHEAD unplayed chains
+# of HASH_CHAIN_LENGTH rounds per game with `manage.py generate_hash_chains --every 60`
+PROVABLY_FAIR = False
+HASH_CHAIN_LENGTH = 10000
+HASH_CHAINS_AHEAD = 2
+
+# Seconds a worker may serve dice leaderboards without games settled by other processes
+LEADERBOARD_REFRESH = 5
+
+# SQL profiling: slowest statements logged per request, and whether going over
+# a view's @query_budget raises (always under `manage.py test`) or only warns
+SQL_PROFILING_SLOWEST = 5
+QUERY_BUDGET_STRICT = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
+# Directory where each worker process writes its metrics so /metrics can sum
+# them; leave unset for a single-process server
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+# Bearer token the Prometheus scraper sends to /metrics; without it only staff users can read it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Write-behind ledger: balances still update synchronously, but ledger rows are
+# bulk inserted by a background thread every LEDGER_FLUSH_INTERVAL seconds or
+# LEDGER_BATCH_SIZE rows, with at most LEDGER_QUEUE_SIZE rows waiting in memory.
+# Check for rows lost to a crash with `manage.py check_ledger`
+LEDGER_WRITE_BEHIND = False
+LEDGER_BATCH_SIZE = 500
+LEDGER_FLUSH_INTERVAL = 0.005
+LEDGER_QUEUE_SIZE = 10000
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'login'
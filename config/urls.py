@@ -1,9 +1,13 @@
 from django.contrib import admin
 from django.urls import path, include
+from apps.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     #path('', include('apps.accounts.urls')),
     path('wallet/', include('apps.wallet.urls')),     
     path('bets/', include('apps.bets.urls')),        
+    path('fair/', include('apps.fairness.urls')),
+    path('game/', include('apps.game.urls')),
 ]
@@ -0,0 +1,14 @@
+"""
+WSGI config for the project.
+
+Sync entry point, e.g. `gunicorn config.wsgi:application`. The async read
+APIs and the wallet event stream work best behind config/asgi.py instead.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+application = get_wsgi_application()